@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Agregador de los eventos de juego (events.py) de Ecos de Halcyon.
+
+Recorre los archivos NDJSON en streaming, línea a línea, con memoria
+constante: sólo guarda recuentos (acotados por el contenido del juego, no
+por el tamaño de los registros) y las sesiones abiertas del archivo que
+está leyendo. Cada archivo se agrega por separado (una sesión nunca se
+parte entre archivos), así que se reparten entre procesos y se suman.
+
+Produce:
+  - un embudo: cuántas sesiones llegan a cada paso, en orden
+  - la distribución de finales y las muertes por causa (p. ej. combat_core)
+  - un mapa de elecciones por escena: cuántas veces se eligió cada opción
+  - combates por enemigo y resultado, objetos conseguidos y usados
+
+Pasos del embudo: start, location:SALA, flag:NOMBRE, item:OBJETO,
+combat:ORIGEN, choice:OPCIÓN, ending[:FINAL], death[:CAUSA].
+
+Opcional: orjson para leer más rápido (si no, json de la biblioteca estándar).
+
+Ejecuta: python3 analytics.py eventos/ --workers 4
+         python3 analytics.py eventos/ --embudo start flag:nucleo_access death:combat_core
+"""
+
+import argparse
+import gzip
+import json
+import multiprocessing
+import os
+import time
+from collections import Counter
+
+try:
+    from orjson import loads
+except ImportError:
+    loads = json.loads
+
+DEFAULT_FUNNEL = ('start', 'flag:nucleo_access', 'location:nucleo', 'combat:combat_core', 'ending')
+
+# paso -> (tipo de evento, campo que se compara)
+STEPS = {
+    'start': ('start', None),
+    'location': ('location', 'to'),
+    'flag': ('flag', 'name'),
+    'item': ('item_gained', 'item'),
+    'combat': ('combat_end', 'origin'),
+    'choice': ('choice', 'option'),
+    'ending': ('ending', 'ending'),
+    'death': ('death', 'cause'),
+}
+
+# tras estos eventos la sesión no sigue
+CLOSING = ('ending', 'death')
+
+
+def parse_step(text):
+    """'flag:nucleo_access' -> ('flag', 'name', 'nucleo_access'); 'ending' -> ('ending', 'ending', None)."""
+    kind, _, value = text.partition(':')
+    if kind not in STEPS:
+        raise ValueError(f"Paso de embudo desconocido: {text!r} (válidos: {', '.join(STEPS)})")
+    event_type, field = STEPS[kind]
+    return (event_type, field, value or None)
+
+
+def _matches(step, event):
+    event_type, field, value = step
+    if event.get('type') != event_type:
+        return False
+    if event_type == 'flag' and not event.get('value'):
+        return False  # core_locked = False no es "llegar" a la flag
+    return value is None or event.get(field) == value
+
+
+def _new_totals(steps):
+    return {
+        'files': 0,
+        'events': 0,
+        'bad_lines': 0,
+        'sessions': 0,
+        'steps': list(steps),
+        'funnel': [0] * len(steps),
+        'types': Counter(),
+        'endings': Counter(),
+        'deaths': Counter(),       # causa
+        'death_scenes': Counter(),
+        'choices': Counter(),      # (escena, opción)
+        'fights': Counter(),       # (enemigo, resultado)
+        'rounds': Counter(),       # enemigo -> rondas
+        'items_gained': Counter(),
+        'items_used': Counter(),
+        'flags': Counter(),
+        'visits': Counter(),
+    }
+
+
+def _merge(total, part):
+    for key in ('files', 'events', 'bad_lines', 'sessions'):
+        total[key] += part[key]
+    for i, n in enumerate(part['funnel']):
+        total['funnel'][i] += n
+    for key in ('types', 'endings', 'deaths', 'death_scenes', 'choices', 'fights', 'rounds',
+                'items_gained', 'items_used', 'flags', 'visits'):
+        total[key].update(part[key])
+    return total
+
+
+def _open(path):
+    return gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+
+
+def aggregate_file(args):
+    """Trabajo de un proceso: agrega un archivo NDJSON (o .ndjson.gz)."""
+    path, step_texts = args
+    steps = [parse_step(s) for s in step_texts]
+    totals = _new_totals(step_texts)
+    funnel = totals['funnel']
+    types, choices = totals['types'], totals['choices']
+    stages = {}  # sesión abierta -> pasos del embudo cumplidos
+
+    def close(session):
+        for i in range(stages.pop(session)):
+            funnel[i] += 1
+
+    with _open(path) as f:
+        for line in f:
+            try:
+                event = loads(line)
+                kind = event['type']
+                session = event['session']
+            except (ValueError, KeyError, TypeError):
+                totals['bad_lines'] += 1
+                continue
+            totals['events'] += 1
+            types[kind] += 1
+            if kind == 'start':
+                if session in stages:
+                    close(session)
+                stages[session] = 0
+                totals['sessions'] += 1
+            stage = stages.setdefault(session, 0)
+            if stage < len(steps) and _matches(steps[stage], event):
+                stages[session] = stage + 1
+            if kind == 'choice':
+                choices[(event.get('scene'), event.get('option'))] += 1
+            elif kind == 'location':
+                totals['visits'][event.get('to')] += 1
+            elif kind == 'flag':
+                if event.get('value'):
+                    totals['flags'][event.get('name')] += 1
+            elif kind == 'item_gained':
+                totals['items_gained'][event.get('item')] += event.get('count', 1)
+            elif kind == 'item_used':
+                totals['items_used'][event.get('item')] += event.get('count', 1)
+            elif kind == 'combat_end':
+                enemy = event.get('enemy')
+                totals['fights'][(enemy, event.get('result'))] += 1
+                totals['rounds'][enemy] += event.get('rounds', 0)
+            elif kind == 'ending':
+                totals['endings'][event.get('ending')] += 1
+            elif kind == 'death':
+                totals['deaths'][event.get('cause')] += 1
+                totals['death_scenes'][event.get('scene')] += 1
+            if kind in CLOSING:
+                close(session)
+    for session in list(stages):
+        close(session)  # sesiones cortadas (sin final ni muerte)
+    totals['files'] = 1
+    return totals
+
+
+def event_files(paths):
+    """Archivos .ndjson/.ndjson.gz de las rutas dadas (directorios o archivos)."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith(('.ndjson', '.ndjson.gz')):
+                    found.append(os.path.join(path, name))
+        else:
+            found.append(path)
+    return found
+
+
+def aggregate(paths, steps=DEFAULT_FUNNEL, workers=None):
+    """Agrega todos los archivos de `paths`; con workers > 1, en un pool de procesos."""
+    for step in steps:
+        parse_step(step)  # falla antes de empezar si hay un paso mal escrito
+    files = event_files(paths)
+    jobs = [(path, list(steps)) for path in files]
+    total = _new_totals(steps)
+    workers = min(workers or os.cpu_count() or 1, max(1, len(jobs)))
+    if workers == 1:
+        for job in jobs:
+            _merge(total, aggregate_file(job))
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            for part in pool.imap_unordered(aggregate_file, jobs):
+                _merge(total, part)
+    return total
+
+
+# -------------------------
+# Informe
+# -------------------------
+def _pct(n, total):
+    return f"{100 * n / total:5.1f}%" if total else "    -"
+
+
+def _bar(n, top, width=24):
+    return "#" * max(1, round(width * n / top)) if n else ""
+
+
+def print_report(totals, top=8, elapsed=None):
+    n = totals['sessions']
+    line = f"Eventos: {totals['events']} en {totals['files']} archivos, sesiones: {n}"
+    if elapsed:
+        line += f" ({elapsed:.2f}s, {totals['events'] / elapsed:.0f} eventos/s)"
+    print(line)
+    if totals['bad_lines']:
+        print(f"Líneas ilegibles: {totals['bad_lines']}")
+
+    print("\nEmbudo:")
+    previous = None
+    for step, count in zip(totals['steps'], totals['funnel']):
+        step_rate = f"  (del paso anterior {_pct(count, previous).strip()})" if previous is not None else ""
+        print(f"  {step:<28} {count:>9} {_pct(count, n)}{step_rate}")
+        previous = count
+
+    print("\nFinales:")
+    ended = sum(totals['endings'].values())
+    for ending, count in totals['endings'].most_common():
+        print(f"  {ending:<28} {count:>9} {_pct(count, ended)}")
+    deaths = sum(totals['deaths'].values())
+    print(f"\nMuertes: {deaths} ({_pct(deaths, n).strip()} de las sesiones), por causa:")
+    for cause, count in totals['deaths'].most_common(top):
+        print(f"  {cause:<28} {count:>9} {_pct(count, deaths)}")
+
+    print("\nCombates (victoria / huida / derrota, rondas por combate):")
+    enemies = sorted({enemy for enemy, _ in totals['fights']})
+    for enemy in enemies:
+        won, fled, lost = (totals['fights'][(enemy, r)] for r in ('victoria', 'huida', 'derrota'))
+        fights = won + fled + lost
+        print(f"  {enemy:<30} {won:>7} / {fled:>7} / {lost:>7}  "
+              f"{totals['rounds'][enemy] / fights if fights else 0:5.1f}")
+
+    print("\nElecciones por escena:")
+    scenes = Counter()
+    for (scene, _), count in totals['choices'].items():
+        scenes[scene] += count
+    for scene, scene_total in scenes.most_common():
+        print(f"  {scene} ({scene_total})")
+        options = sorted(((count, option) for (s, option), count in totals['choices'].items()
+                          if s == scene), reverse=True)[:top]
+        best = options[0][0] if options else 0
+        for count, option in options:
+            print(f"    {str(option)[:40]:<40} {count:>9} {_pct(count, scene_total)} {_bar(count, best)}")
+
+
+def to_json(totals):
+    """Los totales con claves de texto, para json.dump."""
+    out = {}
+    for key, value in totals.items():
+        if isinstance(value, Counter):
+            value = {k if isinstance(k, str) else " | ".join(map(str, k)): v
+                     for k, v in value.most_common()}
+        out[key] = value
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agrega los eventos de juego (NDJSON)")
+    parser.add_argument("rutas", nargs="+", help="directorios o archivos .ndjson / .ndjson.gz")
+    parser.add_argument("--workers", type=int, default=None, help="procesos (por defecto, todos los núcleos)")
+    parser.add_argument("--embudo", nargs="+", default=list(DEFAULT_FUNNEL), metavar="PASO",
+                        help="pasos del embudo, en orden (p. ej. start flag:nucleo_access ending:paz)")
+    parser.add_argument("--top", type=int, default=8, help="opciones por escena y causas de muerte")
+    parser.add_argument("--json", metavar="ARCHIVO", help="guardar también los totales en JSON")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    try:
+        totals = aggregate(args.rutas, args.embudo, args.workers)
+    except ValueError as e:
+        parser.error(str(e))
+    print_report(totals, args.top, time.perf_counter() - start)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(to_json(totals), f, ensure_ascii=False, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,111 +6,2867 @@ Crea: nave_origen_mapa.py
 Ejecuta: python3 nave_origen_mapa.py
 """
 
+import argparse
+import atexit
+import contextlib
+import copy
+import functools
+import hashlib
+import itertools
 import json
+import logging
+import mmap
+import operator
 import random
 import os
+import shutil
+import struct
 import time
 import sys
+import threading
+import types
+import unicodedata
+from array import array
+from collections import OrderedDict, deque
+from collections.abc import MutableMapping, MutableSet
+
+logger = logging.getLogger(__name__)
+
+# -------------------------
+# Utilidades y colores ANSI
+# -------------------------
+RESET = "\033[0m"
+BOLD = "\033[1m"
+DIM = "\033[2m"
+RED = "\033[31m"
+GREEN = "\033[32m"
+YELLOW = "\033[33m"
+CYAN = "\033[36m"
+MAGENTA = "\033[35m"
+
+class _KeyPoll:
+    """
+    Detecta si se pulsó una tecla mientras se escribe texto, sin bloquear.
+    En POSIX pone la terminal en modo cbreak sólo durante el bloque.
+    Si stdin no es una terminal nunca detecta nada.
+    """
+    def __enter__(self):
+        self.fd = None
+        self.old = None
+        try:
+            if not sys.stdin.isatty():
+                return self
+        except (AttributeError, ValueError):
+            return self
+        if os.name == 'nt':
+            self.fd = 'nt'
+            return self
+        try:
+            import termios
+            import tty
+            self.fd = sys.stdin.fileno()
+            self.old = termios.tcgetattr(self.fd)
+            tty.setcbreak(self.fd)
+        except Exception:
+            self.fd = None
+        return self
+
+    def pressed(self):
+        if self.fd is None:
+            return False
+        if self.fd == 'nt':
+            import msvcrt
+            hit = False
+            while msvcrt.kbhit():
+                msvcrt.getwch()
+                hit = True
+            return hit
+        import select
+        if select.select([self.fd], [], [], 0)[0]:
+            os.read(self.fd, 1024)  # descartar la tecla
+            return True
+        return False
+
+    def __exit__(self, *exc):
+        if self.old is not None:
+            import termios
+            termios.tcsetattr(self.fd, termios.TCSADRAIN, self.old)
+        return False
+
+class Typewriter:
+    """
+    Efecto máquina de escribir con pocas llamadas al sistema: el texto se
+    escribe en trozos del tamaño de un fotograma (fps) en vez de carácter a
+    carácter, y una tecla salta al final del bloque.
+    speed: multiplicador global de velocidad (0 = instantáneo).
+    Si stdout no es una terminal se escribe todo de golpe, sin esperas.
+    """
+    def __init__(self, speed=1.0, fps=30):
+        self.speed = speed
+        self.fps = fps
+
+    def write(self, text, delay=0.01, newline=True):
+        out = sys.stdout
+        end = "\n" if newline else ""
+        try:
+            tty = out.isatty()
+        except (AttributeError, ValueError):
+            tty = False
+        if not tty or delay <= 0 or self.speed <= 0 or not text:
+            out.write(text + end)
+            if tty:
+                out.flush()
+            return
+        per_char = delay / self.speed
+        step = max(1, int(round(1.0 / (self.fps * per_char))))
+        start = time.perf_counter()
+        with _KeyPoll() as keys:
+            for i in range(0, len(text), step):
+                if keys.pressed():
+                    out.write(text[i:])
+                    break
+                out.write(text[i:i + step])
+                out.flush()
+                # esperar hasta la hora prevista del siguiente trozo (sin acumular deriva)
+                wait = start + per_char * (i + step) - time.perf_counter()
+                if wait > 0:
+                    time.sleep(wait)
+        out.write(end)
+        out.flush()
+
+typewriter = Typewriter(speed=float(os.environ.get("HALCYON_TEXT_SPEED", "1")))
+
+def set_text_speed(speed):
+    """Velocidad global del texto: 1 normal, 2 doble, 0 instantáneo."""
+    typewriter.speed = speed
+
+def slowprint(text, delay=0.01, newline=True):
+    """Imprime el texto como si fuera una persona escribiendo (puedes subir delay)."""
+    typewriter.write(text, delay, newline)
+
+def char_width(ch):
+    """Columnas que ocupa un carácter en la terminal (emoji y CJK ocupan 2)."""
+    if unicodedata.combining(ch) or ch in "\u200d\ufe0f":
+        return 0
+    return 2 if unicodedata.east_asian_width(ch) in ("W", "F") else 1
+
+def text_width(text):
+    return sum(char_width(ch) for ch in text)
+
+def fit_width(text, width):
+    """Centra `text` en `width` columnas, recortándolo si no cabe."""
+    used = 0
+    out = []
+    for ch in text:
+        w = char_width(ch)
+        if used + w > width:
+            break
+        out.append(ch)
+        used += w
+    pad_left = (width - used) // 2
+    return " " * pad_left + "".join(out) + " " * (width - used - pad_left)
+
+def cls():
+    if os.name == 'nt':
+        os.system('cls')
+    else:
+        # secuencia ANSI: sin lanzar un proceso 'clear' en cada pantalla
+        sys.stdout.write("\033[H\033[2J\033[3J")
+        sys.stdout.flush()
+
+def input_choice(prompt, choices):
+    """
+    Muestra prompt y espera una opción valida.
+    choices: lista de strings que son válidas (se compara en minúsculas)
+    """
+    while True:
+        res = input(prompt + " ").strip().lower()
+        if res == "":
+            continue
+        # permitir elegir por número si se muestran opciones numeradas
+        if res.isdigit():
+            return res
+        # si la respuesta es una de las opciones:
+        if res in choices:
+            return res
+        # permitir coincidencia por prefijo
+        for c in choices:
+            if c.startswith(res):
+                return c
+        print(YELLOW + "Opción no reconocida. Prueba otra vez." + RESET)
+
+def match_choice(res, choices):
+    """
+    Normaliza una respuesta igual que input_choice.
+    Devuelve la opción reconocida o None si no es válida.
+    """
+    res = res.strip().lower()
+    if res == "":
+        return None
+    if res.isdigit() or res in choices:
+        return res
+    for c in choices:
+        if c.startswith(res):
+            return c
+    return None
+
+# -------------------------
+# Entrada/salida intercambiable
+# -------------------------
+class GameIO:
+    """
+    Interfaz de entrada/salida que usa Game. Las escenas nunca llaman a
+    print/input/slowprint/cls directamente, sino a estos métodos, así el
+    mismo juego puede ir por terminal o sin cabeza (tests, bots, simulación).
+    """
+    def print(self, *args, sep=" ", end="\n"):
+        raise NotImplementedError
+
+    def slowprint(self, text, delay=0.01, newline=True):
+        self.print(text, end="\n" if newline else "")
+
+    def cls(self):
+        pass
+
+    def map_frame(self, frame):
+        """El mapa de la escena (un solo string ya renderizado)."""
+        self.print(frame, end="")
+
+    def menu(self, header, lines):
+        """Cabecera y opciones numeradas de un menú."""
+        if header is not None:
+            self.print(header)
+        for line in lines:
+            self.print(line)
+
+    def sleep(self, seconds):
+        pass
+
+    def input(self, prompt="", choices=None):
+        raise NotImplementedError
+
+    def input_choice(self, prompt, choices):
+        """Igual que input_choice() pero leyendo de self.input."""
+        while True:
+            res = match_choice(self.input(prompt + " ", choices), choices)
+            if res is not None:
+                return res
+            self.print(YELLOW + "Opción no reconocida. Prueba otra vez." + RESET)
+
+class TerminalIO(GameIO):
+    """Jugar en la terminal: máquina de escribir, clear y input() reales."""
+    def print(self, *args, sep=" ", end="\n"):
+        print(*args, sep=sep, end=end)
+
+    def slowprint(self, text, delay=0.01, newline=True):
+        slowprint(text, delay, newline)
+
+    def cls(self):
+        cls()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def input(self, prompt="", choices=None):
+        return input(prompt)
+
+    def input_choice(self, prompt, choices):
+        return input_choice(prompt, choices)
+
+# -------------------------
+# Escenas: preguntas al jugador
+# -------------------------
+# Las escenas que esperan algo (una respuesta del jugador, el disco) son
+# generadores: cada espera es un `yield` y el resultado vuelve como valor de
+# esa expresión:
+#     c = yield Choice(self.text("Elige 1 o 2:"), ["1", "2"])
+#     name = yield Input(" ")
+# Quien ejecuta la escena decide cómo atenderla. run_scene() contesta en el
+# acto con un GameIO (terminal, guion, repetición); el servidor deja la escena
+# suspendida hasta que llega la línea del jugador, sin un hilo por sesión.
+class Input:
+    """Pregunta libre (nombre, códigos, Enter...): la respuesta tal cual."""
+    __slots__ = ('prompt',)
+
+    def __init__(self, prompt=""):
+        self.prompt = prompt
+
+    def ask(self, io):
+        return io.input(self.prompt)
+
+    def accept(self, answer):
+        return answer
+
+class Choice:
+    """Pregunta de menú: la respuesta es siempre una opción reconocida (match_choice)."""
+    __slots__ = ('prompt', 'choices')
+
+    def __init__(self, prompt, choices):
+        self.prompt = prompt
+        self.choices = choices
+
+    def ask(self, io):
+        return io.input_choice(self.prompt, self.choices)
+
+    def accept(self, answer):
+        """La opción que corresponde a `answer`, o None si no es válida."""
+        return match_choice(answer, self.choices)
+
+class DiskWork:
+    """
+    Trabajo de disco o de base de datos que la escena espera (guardar,
+    cargar...): fn(*args). Sin cabeza se hace en el acto; el servidor lo
+    manda a un hilo para no parar el bucle de eventos mientras tanto.
+    """
+    __slots__ = ('fn', 'args')
+
+    def __init__(self, fn, *args):
+        self.fn = fn
+        self.args = args
+
+    def ask(self, io):
+        return self.fn(*self.args)
+
+def run_scene(scene, io):
+    """
+    Ejecuta una escena hasta el final contestando sus esperas con `io` y
+    devuelve lo que devuelva la escena. Si contestar falla (EOFError al
+    agotarse un guion, ValueError de una repetición...) el error se lanza
+    dentro de la escena, igual que si hubiera fallado allí mismo.
+    """
+    try:
+        wait = next(scene)
+        while True:
+            try:
+                answer = wait.ask(io)
+            except BaseException as e:
+                wait = scene.throw(e)
+            else:
+                wait = scene.send(answer)
+    except StopIteration as stop:
+        return stop.value
+
+def perform(fn, *args):
+    """
+    `yield from perform(fn, ...)`: llama a fn, que puede ser una función
+    normal o una escena, y en ese caso la ejecuta con sus esperas.
+    """
+    scene = fn(*args)
+    if type(scene) is types.GeneratorType:
+        yield from scene
+
+# -------------------------
+# Pantalla persistente (compositor ANSI)
+# -------------------------
+def to_cells(text):
+    """
+    Convierte texto con secuencias de color ANSI en celdas (carácter, estilo).
+    Los caracteres anchos ocupan dos celdas: la segunda lleva carácter "".
+    """
+    cells = []
+    style = ""
+    i = 0
+    n = len(text)
+    while i < n:
+        ch = text[i]
+        if ch == "\033" and i + 1 < n and text[i + 1] == "[":
+            j = i + 2
+            while j < n and not text[j].isalpha():
+                j += 1
+            seq = text[i:j + 1]
+            if seq.endswith("m"):
+                style = "" if seq in (RESET, "\033[m") else style + seq
+            i = j + 1
+            continue
+        w = char_width(ch)
+        if w == 0 and cells:
+            prev_ch, prev_style = cells[-1]
+            cells[-1] = (prev_ch + ch, prev_style)
+        elif w:
+            cells.append((ch, style))
+            if w == 2:
+                cells.append(("", style))
+        i += 1
+    return cells
+
+def wrap_cells(cells, width):
+    """Parte una línea de celdas en filas de `width` sin cortar caracteres anchos."""
+    rows = []
+    while len(cells) > width:
+        cut = width
+        if cells[cut][0] == "":
+            cut -= 1
+        rows.append(cells[:cut])
+        cells = cells[cut:]
+    rows.append(cells)
+    return rows
+
+class Screen:
+    """
+    Búfer de celdas con el último fotograma enviado. flush() sólo escribe las
+    celdas que cambiaron (posicionando el cursor), en una única escritura.
+    """
+    BLANK = (" ", "")
+
+    def __init__(self, out, width, height):
+        self.out = out
+        self.resize(width, height)
+
+    def resize(self, width, height):
+        self.width = width
+        self.height = height
+        self.rows = [[self.BLANK] * width for _ in range(height)]
+        self.shown = [None] * height  # None = fila desconocida en la terminal
+
+    def set_row(self, y, cells):
+        if 0 <= y < self.height:
+            row = cells[:self.width]
+            if row and row[-1][0] == "" and len(cells) > self.width:
+                row[-1] = self.BLANK
+            self.rows[y] = row + [self.BLANK] * (self.width - len(row))
+
+    def forget_row(self, y):
+        if 0 <= y < self.height:
+            self.shown[y] = None
+
+    def flush(self, cursor=None):
+        parts = []
+        for y, row in enumerate(self.rows):
+            old = self.shown[y]
+            if old == row:
+                continue
+            x = 0
+            while x < self.width:
+                if old is not None and old[x] == row[x]:
+                    x += 1
+                    continue
+                # tramo de celdas cambiadas; huecos iguales cortos se reescriben
+                # porque cuestan menos que otra secuencia de posición del cursor
+                end = x + 1
+                k = end
+                while k < self.width and k - end <= 6:
+                    if old is None or old[k] != row[k]:
+                        end = k + 1
+                    k += 1
+                if row[x][0] == "" and x > 0:
+                    x -= 1  # empezar en la mitad izquierda del carácter ancho
+                parts.append(f"\033[{y + 1};{x + 1}H")
+                style = None
+                for ch, st in row[x:end]:
+                    if ch == "":
+                        continue
+                    if st != style:
+                        parts.append(RESET + st)
+                        style = st
+                    parts.append(ch)
+                parts.append(RESET)
+                x = end
+            self.shown[y] = list(row)
+        if cursor is not None:
+            parts.append(f"\033[{cursor[1] + 1};{cursor[0] + 1}H")
+        if parts:
+            self.out.write("".join(parts))
+            self.out.flush()
+
+class ScreenIO(TerminalIO):
+    """
+    Interfaz de terminal con tres paneles fijos: mapa arriba, narración con
+    scroll en medio y menú abajo. No usa clear ni subprocesos: cada cambio se
+    dibuja escribiendo sólo las celdas distintas al fotograma anterior, así que
+    pasar de una escena a otra con el mismo mapa sólo redibuja el cohete y el texto.
+    """
+    def __init__(self, out=None):
+        self.out = out or sys.stdout
+        size = shutil.get_terminal_size()
+        self.screen = Screen(self.out, size.columns, size.lines)
+        self.map_lines = []
+        self.narrative = []   # filas ya partidas al ancho de la pantalla
+        self.partial = []     # celdas de la línea en curso (slowprint sin salto)
+        self.menu_lines = []
+        self.prompt = None
+        self.out.write("\033[?1049h\033[H\033[2J")  # pantalla alternativa
+        self.out.flush()
+        atexit.register(self.close)
+
+    def close(self):
+        if self.out is not None:
+            self.out.write(RESET + "\033[?1049l")
+            self.out.flush()
+            self.out = None
+
+    # --- composición ---
+    def _check_size(self):
+        size = shutil.get_terminal_size()
+        if (size.columns, size.lines) != (self.screen.width, self.screen.height):
+            self.screen.resize(size.columns, size.lines)
+            self.narrative = [r for line in self.narrative for r in wrap_cells(line, size.columns)]
+            self.out.write("\033[H\033[2J")
+
+    def _layout(self):
+        h = self.screen.height
+        menu_h = len(self.menu_lines) + 2  # menú + prompt + fila libre para el eco
+        map_h = min(len(self.map_lines), max(0, h - menu_h - 3))
+        return map_h, max(1, h - map_h - menu_h), menu_h
+
+    def _compose(self):
+        map_h, narr_h, menu_h = self._layout()
+        s = self.screen
+        for y in range(map_h):
+            s.set_row(y, self.map_lines[y])
+        rows = self.narrative + ([self.partial] if self.partial else [])
+        rows = rows[-narr_h:]
+        for i in range(narr_h):
+            s.set_row(map_h + i, rows[i] if i < len(rows) else [])
+        top = map_h + narr_h
+        for i in range(menu_h):
+            line = self.menu_lines[i] if i < len(self.menu_lines) else []
+            if i == len(self.menu_lines) and self.prompt is not None:
+                line = self.prompt
+            s.set_row(top + i, line)
+        del self.narrative[:-max(narr_h * 4, 200)]
+        return top + len(self.menu_lines)
+
+    def _refresh(self, cursor=None):
+        self._check_size()
+        prompt_y = self._compose()
+        if cursor == 'prompt':
+            cursor = (len(self.prompt or []), prompt_y)
+        self.screen.flush(cursor)
+        return prompt_y
+
+    def _add_text(self, text):
+        lines = text.split("\n")
+        for k, line in enumerate(lines):
+            self.partial = self.partial + to_cells(line)
+            if k < len(lines) - 1:
+                self.narrative.extend(wrap_cells(self.partial, self.screen.width))
+                self.partial = []
+
+    # --- GameIO ---
+    def print(self, *args, sep=" ", end="\n"):
+        self._add_text(sep.join(str(a) for a in args) + end)
+        self._refresh()
+
+    def slowprint(self, text, delay=0.01, newline=True):
+        end = "\n" if newline else ""
+        speed = typewriter.speed
+        if delay <= 0 or speed <= 0 or not text:
+            self.print(text, end=end)
+            return
+        per_char = delay / speed
+        step = max(1, int(round(1.0 / (typewriter.fps * per_char))))
+        start = time.perf_counter()
+        with _KeyPoll() as keys:
+            for i in range(0, len(text), step):
+                if keys.pressed():
+                    self._add_text(text[i:])
+                    break
+                self._add_text(text[i:i + step])
+                self._refresh()
+                wait = start + per_char * (i + step) - time.perf_counter()
+                if wait > 0:
+                    time.sleep(wait)
+        self._add_text(end)
+        self._refresh()
+
+    def cls(self):
+        self.narrative = []
+        self.partial = []
+        self.menu_lines = []
+        self._refresh()
+
+    def map_frame(self, frame):
+        self.map_lines = [to_cells(line) for line in frame.strip("\n").split("\n")]
+
+    def menu(self, header, lines):
+        self.menu_lines = [to_cells(l) for l in ([header.strip("\n")] if header else []) + list(lines)]
+        self._refresh()
+
+    def input(self, prompt="", choices=None):
+        self.prompt = to_cells(prompt)
+        prompt_y = self._refresh(cursor='prompt')
+        try:
+            answer = input()
+        finally:
+            # el eco del teclado ensució la fila del prompt y la siguiente
+            self.screen.forget_row(prompt_y)
+            self.screen.forget_row(prompt_y + 1)
+            self.prompt = None
+        self._add_text(DIM + prompt.strip() + " " + answer + RESET + "\n")
+        self.menu_lines = []
+        self._refresh()
+        return answer
+
+    def input_choice(self, prompt, choices):
+        return GameIO.input_choice(self, prompt, choices)
+
+class ScriptedIO(GameIO):
+    """
+    Entrada en memoria, sin esperas ni subprocesos.
+    answers: lista/iterable de respuestas, o una función policy(prompt, choices)
+    que decide cada respuesta (choices es None en las preguntas libres).
+    Si la política tiene un método observe(texto), recibe toda la salida.
+    Cuando el guion se agota lanza EOFError, igual que input() sin stdin.
+    La salida se acumula en self.output (lista de trozos de texto).
+    """
+    def __init__(self, answers=(), capture=True):
+        if callable(answers):
+            self.policy = answers
+            self.answers = None
+        else:
+            self.policy = None
+            self.answers = iter(answers)
+        self.capture = capture
+        self.observe = getattr(self.policy, 'observe', None)
+        self.output = []
+        self.inputs = 0
+
+    def print(self, *args, sep=" ", end="\n"):
+        if self.capture or self.observe:
+            text = sep.join(str(a) for a in args) + end
+            if self.capture:
+                self.output.append(text)
+            if self.observe:
+                self.observe(text)
+
+    def input(self, prompt="", choices=None):
+        if self.capture:
+            self.output.append(prompt)
+        self.inputs += 1
+        if self.policy is not None:
+            return self.policy(prompt, choices)
+        try:
+            return str(next(self.answers))
+        except StopIteration:
+            raise EOFError("guion de respuestas agotado") from None
+
+    def text(self):
+        return "".join(self.output)
+
+class NullIO(ScriptedIO):
+    """Como ScriptedIO pero descarta toda la salida (lo más rápido)."""
+    def __init__(self, answers=()):
+        super().__init__(answers, capture=False)
+
+def random_policy(rng=None):
+    """
+    Política para ScriptedIO/NullIO: elige al azar entre las opciones del menú
+    y responde a las preguntas libres (nombre, códigos, Enter) con 3 dígitos.
+    """
+    rng = rng or random.Random()
+    def policy(prompt, choices):
+        if choices:
+            return rng.choice(choices)
+        return "".join(str(rng.randint(0, 9)) for _ in range(3))
+    return policy
+
+# -------------------------
+# Grabación y repetición de sesiones
+# -------------------------
+def new_seed():
+    """Semilla nueva para una partida (no depende del RNG global)."""
+    return int.from_bytes(os.urandom(4), 'little')
+
+class Recording:
+    """
+    Sesión grabada: semilla de la partida y cada respuesta del jugador. Con
+    la misma semilla y las mismas respuestas la partida se repite igual.
+    Las respuestas de menú se guardan como el índice de la opción, un
+    carácter cada una; las libres (nombre, códigos, Enter...) y las que no
+    son una opción exacta van aparte, marcadas con FREE.
+    Para que la repetición no dependa de nada externo también guarda las
+    opciones de la partida (estación, rebobinar, autoguardado) y la partida
+    guardada que existía al empezar.
+    """
+    VERSION = 1
+    DIGITS = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    FREE = "~"
+
+    def __init__(self, seed, options=None, save=None):
+        self.seed = seed
+        self.options = dict(options or {})
+        self.save = save
+        self.events = []   # caracteres: índice de la opción o FREE
+        self.texts = []
+        self.turns = 0
+        self.state_hash = None
+
+    def add_choice(self, answer, choices):
+        try:
+            index = choices.index(answer)
+        except ValueError:
+            index = len(self.DIGITS)
+        if index < len(self.DIGITS):
+            self.events.append(self.DIGITS[index])
+        else:
+            self.add_text(answer)
+
+    def add_text(self, text):
+        self.events.append(self.FREE)
+        self.texts.append(text)
+
+    def finish(self, game):
+        """Apunta cómo acabó la partida, para comprobar la repetición."""
+        self.turns = game.turn
+        self.state_hash = game.state_hash() if game.player else None
+
+    def to_dict(self):
+        return {'version': self.VERSION, 'seed': self.seed, 'options': self.options,
+                'choices': "".join(self.events), 'texts': self.texts, 'turns': self.turns,
+                'hash': self.state_hash, 'save': self.save}
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get('version') != cls.VERSION:
+            raise ValueError(f"versión de grabación no soportada: {data.get('version')}")
+        rec = cls(data['seed'], data.get('options'), data.get('save'))
+        rec.events = list(data['choices'])
+        rec.texts = list(data['texts'])
+        rec.turns = data.get('turns', 0)
+        rec.state_hash = data.get('hash')
+        return rec
+
+    def dump(self, filename):
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+class RecordingIO:
+    """Envuelve otro backend y apunta en una Recording cada respuesta."""
+    def __init__(self, io, recording):
+        self.io = io
+        self.recording = recording
+
+    def __getattr__(self, name):
+        return getattr(self.io, name)
+
+    def input(self, prompt="", choices=None):
+        answer = self.io.input(prompt, choices)
+        self.recording.add_text(answer)
+        return answer
+
+    def input_choice(self, prompt, choices):
+        answer = self.io.input_choice(prompt, choices)
+        self.recording.add_choice(answer, choices)
+        return answer
+
+class ReplayIO(NullIO):
+    """
+    Repite las respuestas de una Recording sin salida ni esperas. Si la
+    partida pide otra cosa que la grabada lanza ValueError; al agotarse la
+    grabación, EOFError (como ScriptedIO).
+    """
+    def __init__(self, recording):
+        super().__init__()
+        self.events = iter(recording.events)
+        self.texts = iter(recording.texts)
+        self.index = {c: i for i, c in enumerate(Recording.DIGITS)}
+
+    def _next(self):
+        try:
+            return next(self.events)
+        except StopIteration:
+            raise EOFError("grabación agotada") from None
+
+    def input(self, prompt="", choices=None):
+        self.inputs += 1
+        if self._next() != Recording.FREE:
+            raise ValueError(f"la grabación no coincide: se esperaba una opción en {prompt!r}")
+        return next(self.texts)
+
+    def input_choice(self, prompt, choices):
+        self.inputs += 1
+        event = self._next()
+        if event == Recording.FREE:
+            answer = match_choice(next(self.texts), choices)
+            if answer is None:
+                raise ValueError(f"la grabación no coincide: respuesta no válida en {prompt!r}")
+            return answer
+        index = self.index[event]
+        if index >= len(choices):
+            raise ValueError(f"la grabación no coincide: opción {index + 1} en {prompt!r}")
+        return choices[index]
+
+class MemorySave:
+    """Guardado en memoria con la interfaz de SaveJournal (repeticiones y pruebas)."""
+    name = "memoria"
+
+    def __init__(self, state=None):
+        self.state = copy_state(state) if state is not None else None
+
+    def save(self, state):
+        self.state = copy_state(state)
+
+    def load(self):
+        return copy_state(self.state) if self.state is not None else None
+
+    def delete(self):
+        self.state = None
+
+    def exists(self):
+        return self.state is not None
+
+    def close(self):
+        pass
+
+def replay(recording, setup=None):
+    """
+    Repite una grabación sin cabeza, tan rápido como se pueda (sin salida,
+    sin esperas, guardados en memoria). Devuelve la partida al terminar.
+    setup(game), si se da, se llama antes de empezar (p. ej. para medirla).
+    """
+    game = Game(io=ReplayIO(recording), seed=recording.seed)
+    game.save_backend = MemorySave(recording.save)
+    opts = recording.options
+    if opts.get('estacion'):
+        game.set_station(StationMap.from_dict(opts['estacion']))
+    game.rewind_turns = opts.get('rebobinar', 0)
+    game.autosave_every = opts.get('autoguardado', 0)
+    if setup is not None:
+        setup(game)
+    try:
+        game.start()
+    except EOFError:
+        pass  # la sesión grabada se cortó antes del final
+    finally:
+        if game.autosaver is not None:
+            game.autosaver.close()
+    return game
+
+# -------------------------
+# Estado compacto: nombres internados, inventario por recuento, flags en bits
+# -------------------------
+class Registry:
+    """
+    Nombres internados: cada nombre distinto recibe un ID entero pequeño.
+    Los nombres iniciales tienen ID fijo; los que aparecen después (p. ej. en
+    una partida cargada) se añaden al final.
+    """
+    __slots__ = ('names', 'ids', 'fixed')
+
+    def __init__(self, names=()):
+        self.names = []
+        self.ids = {}
+        for name in names:
+            self.intern(name)
+        self.fixed = len(self.names)
+
+    def intern(self, name):
+        i = self.ids.get(name)
+        if i is None:
+            i = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return i
+
+    def __len__(self):
+        return len(self.names)
+
+ITEMS = Registry((
+    'multiherramienta', 'implante', 'kit_medico', 'municion', 'antiviral', 'mapa',
+    'modulo_memoria', 'llave_energetica',
+))
+FLAGS = Registry((
+    'prologo_done', 'core_locked', 'seen_ai_message', 'panel_hacked', 'panel_open', 'found_note',
+    'nucleo_access', 'ai_contact', 'sent_rescue', 'sent_shutdown_signal', 'ai_trust',
+    'ai_identity_seen', 'core_stabilized', 'ending', 'puerta_forzada',
+))
+PLACES = Registry(('entrada', 'pasillo', 'lab', 'almacen', 'hab_mod', 'sala_com', 'nucleo', 'final'))
+
+def set_bits(bits):
+    """Posiciones de los bits a 1 de un entero, de menor a mayor."""
+    found = []
+    while bits:
+        low = bits & -bits
+        found.append(low.bit_length() - 1)
+        bits ^= low
+    return found
+
+class Inventory:
+    """
+    Inventario como recuento por ID de objeto (ITEMS), empaquetado en un solo
+    entero: 16 bits por objeto. Se comporta como la lista de antes: append,
+    remove, pop, in, len, count e iteración (los objetos salen agrupados por ID).
+    """
+    __slots__ = ('packed',)
+    LANE = 16
+    MAX = (1 << LANE) - 1
+
+    def __init__(self, items=()):
+        self.packed = 0
+        for item in items:
+            self.append(item)
+
+    def append(self, item):
+        shift = ITEMS.intern(item) * self.LANE
+        if (self.packed >> shift) & self.MAX == self.MAX:
+            raise ValueError(f"Demasiados {item} en el inventario")
+        self.packed += 1 << shift
+
+    def has(self, i):
+        """¿Hay al menos uno del objeto con ID i?"""
+        return (self.packed >> (i * self.LANE)) & self.MAX != 0
+
+    def count(self, item):
+        i = ITEMS.ids.get(item)
+        return 0 if i is None else (self.packed >> (i * self.LANE)) & self.MAX
+
+    def remove(self, item):
+        if not self.count(item):
+            raise ValueError(f"{item} no está en el inventario")
+        self.packed -= 1 << (ITEMS.ids[item] * self.LANE)
+
+    def pop(self, index=-1):
+        item = self.to_list()[index]
+        self.remove(item)
+        return item
+
+    def items(self):
+        """Pares (objeto, cantidad) de lo que hay, por ID."""
+        names, lane, mask = ITEMS.names, self.LANE, self.MAX
+        found = []
+        packed, i = self.packed, 0
+        while packed:
+            n = packed & mask
+            if n:
+                found.append((names[i], n))
+            packed >>= lane
+            i += 1
+        return found
+
+    def __contains__(self, item):
+        return self.count(item) > 0
+
+    def __len__(self):
+        return sum(n for _, n in self.items())
+
+    def __bool__(self):
+        return self.packed != 0
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+    def to_list(self):
+        items = []
+        for name, n in self.items():
+            items += [name] * n
+        return items
+
+    def __eq__(self, other):
+        if isinstance(other, Inventory):
+            return self.packed == other.packed
+        return list(self) == list(other)
+
+    def copy(self):
+        new = Inventory.__new__(Inventory)
+        new.packed = self.packed
+        return new
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+    def key(self):
+        """Bytes estables (no dependen del orden en que se internaron los objetos nuevos)."""
+        fixed = ITEMS.fixed * self.LANE
+        head = (self.packed & ((1 << fixed) - 1)).to_bytes(fixed // 8, 'little')
+        extra = self.packed >> fixed
+        if not extra:
+            return head
+        names, lane, mask = ITEMS.names, self.LANE, self.MAX
+        tail = []
+        i = ITEMS.fixed
+        while extra:
+            n = extra & mask
+            if n:
+                tail.append((names[i], n))
+            extra >>= lane
+            i += 1
+        return head + b'\1' + repr(sorted(tail)).encode('utf-8')
+
+    def __repr__(self):
+        return f"Inventory({list(self)!r})"
+
+class NameSet(MutableSet):
+    """Conjunto de nombres de un Registry guardado como máscara de bits."""
+    __slots__ = ('registry', 'bits')
+
+    def __init__(self, registry, names=()):
+        self.registry = registry
+        self.bits = 0
+        for name in names:
+            self.add(name)
+
+    def __contains__(self, name):
+        i = self.registry.ids.get(name)
+        return i is not None and bool((self.bits >> i) & 1)
+
+    def add(self, name):
+        self.bits |= 1 << self.registry.intern(name)
+
+    def discard(self, name):
+        i = self.registry.ids.get(name)
+        if i is not None:
+            self.bits &= ~(1 << i)
+
+    def update(self, names):
+        for name in names:
+            self.add(name)
+
+    def __iter__(self):
+        names = self.registry.names
+        return iter([names[i] for i in set_bits(self.bits)])
+
+    def __len__(self):
+        return bin(self.bits).count('1')
+
+    def copy(self):
+        new = NameSet.__new__(NameSet)
+        new.registry = self.registry
+        new.bits = self.bits
+        return new
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+    def key(self):
+        """Bytes estables (bits de los nombres fijos + el resto por nombre)."""
+        fixed = self.registry.fixed
+        head = (self.bits & ((1 << fixed) - 1)).to_bytes((fixed + 7) // 8, 'little')
+        if not self.bits >> fixed:
+            return head
+        names = self.registry.names
+        extra = sorted(names[i] for i in range(fixed, len(names)) if (self.bits >> i) & 1)
+        return head + b'\1' + '\0'.join(extra).encode('utf-8')
+
+    def __repr__(self):
+        return f"NameSet({sorted(self)!r})"
+
+class Flags(MutableMapping):
+    """
+    Flags de la partida sobre el registro FLAGS: un bit por flag existente
+    (present), otro por flag que vale True (true) y un dict sólo para los
+    valores que no son booleanos (p. ej. 'ending'; None mientras no haya
+    ninguno). Se usa como un dict.
+    """
+    __slots__ = ('present', 'true', 'values')
+
+    def __init__(self, data=()):
+        self.present = 0
+        self.true = 0
+        self.values = None
+        if data:
+            self.update(data)
+
+    def __getitem__(self, name):
+        i = FLAGS.ids.get(name)
+        if i is None or not (self.present >> i) & 1:
+            raise KeyError(name)
+        if self.values and i in self.values:
+            return self.values[i]
+        return bool((self.true >> i) & 1)
+
+    def get(self, name, default=None):
+        i = FLAGS.ids.get(name)
+        if i is None or not (self.present >> i) & 1:
+            return default
+        if self.values and i in self.values:
+            return self.values[i]
+        return bool((self.true >> i) & 1)
+
+    def is_set(self, i):
+        """¿La flag con ID i existe y es verdadera?"""
+        if (self.true >> i) & 1:
+            return True
+        return bool(self.values and self.values.get(i))
+
+    def __setitem__(self, name, value):
+        i = FLAGS.intern(name)
+        bit = 1 << i
+        self.present |= bit
+        if value is True or value is False:
+            if self.values:
+                self.values.pop(i, None)
+                if not self.values:
+                    self.values = None
+            self.true = self.true | bit if value else self.true & ~bit
+        else:
+            self.true &= ~bit
+            if self.values is None:
+                self.values = {}
+            self.values[i] = value
+
+    def __delitem__(self, name):
+        i = FLAGS.ids.get(name)
+        if i is None or not (self.present >> i) & 1:
+            raise KeyError(name)
+        self.present &= ~(1 << i)
+        self.true &= ~(1 << i)
+        if self.values:
+            self.values.pop(i, None)
+            if not self.values:
+                self.values = None
+
+    def __contains__(self, name):
+        i = FLAGS.ids.get(name)
+        return i is not None and bool((self.present >> i) & 1)
+
+    def _ids(self):
+        return set_bits(self.present)
+
+    def __iter__(self):
+        names = FLAGS.names
+        return (names[i] for i in self._ids())
+
+    def __len__(self):
+        return bin(self.present).count('1')
+
+    def __eq__(self, other):
+        if isinstance(other, Flags):
+            return (self.present == other.present and self.true == other.true
+                    and (self.values or None) == (other.values or None))
+        return super().__eq__(other)
+
+    def copy(self):
+        new = Flags.__new__(Flags)
+        new.present = self.present
+        new.true = self.true
+        new.values = dict(self.values) if self.values else None
+        return new
+
+    def __deepcopy__(self, memo):
+        new = self.copy()
+        if new.values:
+            new.values = copy.deepcopy(self.values, memo)
+        return new
+
+    def to_dict(self):
+        names, values, true = FLAGS.names, self.values, self.true
+        flags = {names[i]: (true >> i) & 1 == 1 for i in set_bits(self.present)}
+        if values:
+            for i, value in values.items():
+                flags[names[i]] = value
+        return flags
+
+    def key(self):
+        """Bytes estables de las flags (bits fijos + nombres y valores del resto)."""
+        fixed = FLAGS.fixed
+        mask = (1 << fixed) - 1
+        size = (fixed + 7) // 8
+        parts = [(self.present & mask).to_bytes(size, 'little'), (self.true & mask).to_bytes(size, 'little')]
+        if not self.values and not self.present >> fixed:
+            return b''.join(parts)
+        names = FLAGS.names
+        for i in set_bits(self.present >> fixed << fixed):
+            if i >= fixed:
+                parts.append(names[i].encode('utf-8') + (b'\1' if (self.true >> i) & 1 else b'\0'))
+        for i in sorted(self.values or ()):
+            parts.append(names[i].encode('utf-8') + b'=' + repr(self.values[i]).encode('utf-8'))
+        return b'\0'.join(parts)
+
+    def __repr__(self):
+        return f"Flags({self.to_dict()!r})"
+
+class Memories:
+    """
+    Memorias del jugador en una tupla inmutable: copiar es O(1) y las copias
+    (instantáneas, ramas) comparten la misma tupla. Añadir crea una tupla
+    nueva, pero sólo ocurre en momentos de la historia, mientras que las
+    copias se hacen en cada turno. Se usa como la lista de antes.
+    """
+    __slots__ = ('items',)
+
+    def __init__(self, items=()):
+        self.items = tuple(items)
+
+    def append(self, item):
+        self.items += (item,)
+
+    def to_list(self):
+        return list(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+    def __contains__(self, item):
+        return item in self.items
+
+    def __eq__(self, other):
+        if isinstance(other, Memories):
+            return self.items == other.items
+        return list(self.items) == list(other)
+
+    def copy(self):
+        new = Memories.__new__(Memories)
+        new.items = self.items
+        return new
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+    def __repr__(self):
+        return f"Memories({list(self.items)!r})"
+
+# -------------------------
+# Clases principales
+# -------------------------
+class Player:
+    __slots__ = ('name', 'max_hp', 'hp', 'attack', 'defense', '_inventory', 'credits',
+                 '_memories', 'location', 'has_map', 'reputation')
+
+    def __init__(self, name="Protagonista"):
+        self.name = name
+        self.max_hp = 30
+        self.hp = 30
+        self.attack = 6
+        self.defense = 2
+        self._inventory = Inventory()
+        self.credits = 0
+        self._memories = Memories()   # objetos de historia
+        self.location = "entrada"
+        self.has_map = False
+        self.reputation = 0  # influye en algunos encuentros
+
+    @property
+    def inventory(self):
+        return self._inventory
+
+    @inventory.setter
+    def inventory(self, items):
+        self._inventory = items if isinstance(items, Inventory) else Inventory(items)
+
+    @property
+    def memories(self):
+        return self._memories
+
+    @memories.setter
+    def memories(self, items):
+        self._memories = items if isinstance(items, Memories) else Memories(items)
+
+    def is_alive(self):
+        return self.hp > 0
+
+    def heal(self, amount):
+        self.hp = min(self.max_hp, self.hp + amount)
+
+    def take_damage(self, dmg):
+        dmg = max(0, dmg - self.defense)
+        self.hp -= dmg
+        return dmg
+
+    def copy(self):
+        new = Player.__new__(Player)
+        new.name = self.name
+        new.max_hp = self.max_hp
+        new.hp = self.hp
+        new.attack = self.attack
+        new.defense = self.defense
+        new._inventory = self._inventory.copy()
+        new.credits = self.credits
+        new._memories = self._memories.copy()
+        new.location = self.location
+        new.has_map = self.has_map
+        new.reputation = self.reputation
+        return new
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+# -------------------------
+# Enemigos: plantillas y tablas de aparición
+# -------------------------
+# Cada tipo de enemigo es un diccionario:
+#   'name', 'hp', 'attack', 'defense', 'desc': los datos de la plantilla
+#   'spawn': {dificultad: {ubicación: peso}} para random_encounter. La
+#       ubicación '*' vale para las salas sin peso propio; los pesos son
+#       enteros (0 = no aparece ahí). Sin 'spawn', el tipo sólo aparece
+#       cuando una escena lo pide por su clave (ENEMIES.spawn('nucleo')).
+# Dificultades: 'normal' y 'dificil' (random_encounter(big=True)).
+ENEMY_TYPES = {
+    'dron_hostil': {'name': "Dron hostil", 'hp': 12, 'attack': 5, 'defense': 1,
+                    'desc': "Dron con sensores cortantes",
+                    'spawn': {'normal': {'*': 1}}},
+    'automata': {'name': "Autómata de servicio corrupto", 'hp': 10, 'attack': 4, 'defense': 0,
+                 'desc': "Un autómata con herramientas afiladas",
+                 'spawn': {'normal': {'*': 1}}},
+    'torreta': {'name': "Nh-Guard (turret)", 'hp': 14, 'attack': 6, 'defense': 1,
+                'desc': "Torreta fija con puntería errática",
+                'spawn': {'normal': {'*': 1}}},
+    'patrulla': {'name': "Patrulla reenviada", 'hp': 20, 'attack': 7, 'defense': 2,
+                 'desc': "Un dron mayor con blindaje.",
+                 'spawn': {'dificil': {'*': 1}}},
+    # el dron que aparece al forzar la puerta del vestíbulo
+    'dron_puerta': {'name': "Dron hostil", 'hp': 12, 'attack': 5, 'defense': 1,
+                    'desc': "Un dron pequeño con sensores parpadeantes."},
+    'nucleo': {'name': "Núcleo Defensivo", 'hp': 40, 'attack': 8, 'defense': 3,
+               'desc': "Torretas y sistemas de supresión."},
+}
+
+class EnemyType:
+    """Plantilla inmutable de un enemigo: la comparten todas sus apariciones."""
+    __slots__ = ('key', 'name', 'hp', 'attack', 'defense', 'desc')
+
+    def __init__(self, key, name, hp, attack, defense=0, desc=""):
+        for slot, value in zip(self.__slots__, (key, name, hp, attack, defense, desc)):
+            object.__setattr__(self, slot, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} es inmutable")
+
+    def spawn(self):
+        return Enemy(self)
+
+    def __repr__(self):
+        return f"EnemyType({self.key!r})"
+
+class Enemy:
+    """Un enemigo en combate: su plantilla y los HP que le quedan (lo único que cambia)."""
+    __slots__ = ('type', 'hp')
+
+    def __init__(self, kind, hp=None):
+        self.type = kind
+        self.hp = kind.hp if hp is None else hp
+
+    @property
+    def name(self):
+        return self.type.name
+
+    @property
+    def attack(self):
+        return self.type.attack
+
+    @property
+    def defense(self):
+        return self.type.defense
+
+    @property
+    def desc(self):
+        return self.type.desc
+
+    def is_alive(self):
+        return self.hp > 0
+
+    def take_damage(self, dmg):
+        dmg = max(0, dmg - self.type.defense)
+        self.hp -= dmg
+        return dmg
+
+class AliasTable:
+    """
+    Muestreo ponderado en O(1) con el método alias (Vose): se tira una
+    columna al azar y, si la columna no está llena, una moneda decide entre
+    su elemento y su alias. Con pesos enteros, las columnas llenas se
+    reconocen exactamente y no gastan la moneda: con pesos iguales se
+    consume el RNG igual que rng.choice (las semillas dan los mismos
+    encuentros).
+    """
+    __slots__ = ('items', 'cut', 'alias')
+
+    def __init__(self, weighted):
+        weighted = [(item, weight) for item, weight in weighted if weight > 0]
+        if not weighted:
+            raise ValueError("Tabla de aparición vacía")
+        n = len(weighted)
+        total = sum(weight for _, weight in weighted)
+        self.items = tuple(item for item, _ in weighted)
+        # cada columna vale `total`; scaled[i] es la parte del elemento i
+        scaled = [weight * n for _, weight in weighted]
+        cut = [total] * n
+        alias = list(range(n))
+        small = [i for i, w in enumerate(scaled) if w < total]
+        large = [i for i, w in enumerate(scaled) if w > total]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            cut[s] = scaled[s]
+            alias[s] = l
+            scaled[l] -= total - scaled[s]
+            if scaled[l] < total:
+                small.append(l)
+            elif scaled[l] > total:
+                large.append(l)
+        # None = columna llena; si no, probabilidad de quedarse con su elemento
+        self.cut = tuple(None if c == total else c / total for c in cut)
+        self.alias = tuple(alias)
+
+    def sample(self, rng):
+        items = self.items
+        if len(items) == 1:
+            return items[0]
+        i = rng.randrange(len(items))
+        cut = self.cut[i]
+        if cut is not None and rng.random() >= cut:
+            i = self.alias[i]
+        return items[i]
+
+    def probabilities(self):
+        """{elemento: probabilidad} (para comprobar la tabla)."""
+        n = len(self.items)
+        out = dict.fromkeys(self.items, 0.0)
+        for i, item in enumerate(self.items):
+            cut = 1.0 if self.cut[i] is None else self.cut[i]
+            out[item] += cut / n
+            out[self.items[self.alias[i]]] += (1.0 - cut) / n
+        return out
+
+class EnemyRegistry:
+    """
+    Los tipos de enemigo de ENEMY_TYPES y sus tablas de aparición, montadas
+    una vez al cargar: una por dificultad (la de '*') más una por cada sala
+    con pesos propios. Un encuentro sólo tira de una tabla y crea un Enemy.
+    """
+    def __init__(self, types):
+        self.types = {}
+        spawns = {}  # dificultad -> {ubicación: {tipo: peso}}
+        for key, data in types.items():
+            self.types[key] = EnemyType(key, data['name'], data['hp'], data['attack'],
+                                        data.get('defense', 0), data.get('desc', ""))
+            for difficulty, weights in data.get('spawn', {}).items():
+                for location, weight in weights.items():
+                    spawns.setdefault(difficulty, {}).setdefault(location, {})[key] = weight
+        self.tables = {}  # (dificultad, ubicación) -> AliasTable; '*' = el resto
+        for difficulty, by_location in spawns.items():
+            default = by_location.get('*', {})
+            for location, own in by_location.items():
+                weights = {k: own.get(k, default.get(k, 0)) for k in self.types}
+                self.tables[(difficulty, location)] = AliasTable(
+                    (self.types[k], w) for k, w in weights.items())
+
+    def __getitem__(self, key):
+        return self.types[key]
+
+    def __len__(self):
+        return len(self.types)
+
+    def spawn(self, key):
+        return Enemy(self.types[key])
+
+    def table(self, difficulty, location):
+        table = self.tables.get((difficulty, location))
+        if table is None:
+            table = self.tables.get((difficulty, '*'))
+            if table is None:
+                raise KeyError(f"Ningún enemigo aparece con dificultad {difficulty!r}")
+        return table
+
+    def random(self, rng, difficulty='normal', location='*'):
+        """Un enemigo al azar según los pesos de `difficulty` en `location`."""
+        return Enemy(self.table(difficulty, location).sample(rng))
+
+ENEMIES = EnemyRegistry(ENEMY_TYPES)
+
+
+# -------------------------
+# Catálogo de textos (traducciones)
+# -------------------------
+# Los textos se escriben en español en el código y su ID es un hash de 64
+# bits del original. Las traducciones de un idioma se compilan (catalog.py)
+# en un único archivo indexado que se abre con mmap:
+#   cabecera  'HTXT', versión, ranuras (potencia de 2), textos, idioma
+#   tabla     ranuras x (id u64, posición u32, longitud u32); id 0 = libre
+#   datos     los textos en UTF-8, uno tras otro
+# La tabla es hash abierto con sondeo lineal: buscar es O(1) y toca una o dos
+# páginas, y cada texto se decodifica al pedirlo. Abrir un catálogo no lee
+# nada, y los procesos que abren el mismo archivo comparten sus páginas.
+CATALOG_MAGIC = b'HTXT'
+CATALOG_VERSION = 1
+CATALOG_HEADER = struct.Struct('<4sH2xII8s')
+CATALOG_SLOT = struct.Struct('<QII')
+TEXTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "textos")
+
+@functools.lru_cache(maxsize=4096)
+def text_id(text):
+    """ID estable (64 bits, nunca 0) de un texto original."""
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little') or 1
+
+def translate(texts, source):
+    """`source` en el catálogo `texts`, o tal cual si no hay catálogo o no lo tiene."""
+    return source if texts is None else texts.get(text_id(source), source)
+
+class TextCatalog:
+    """Las traducciones de un idioma, leídas del archivo compilado con mmap."""
+    _open = {}
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, slots, count, language = CATALOG_HEADER.unpack_from(self.data, 0)
+        if magic != CATALOG_MAGIC or version != CATALOG_VERSION:
+            raise ValueError(f"{filename} no es un catálogo de textos compilado")
+        self.mask = slots - 1
+        self.count = count
+        self.language = language.rstrip(b'\0').decode('ascii')
+
+    @classmethod
+    def open(cls, filename):
+        """Un catálogo por archivo y proceso: todas las partidas lo comparten."""
+        path = os.path.abspath(filename)
+        catalog = cls._open.get(path)
+        if catalog is None:
+            catalog = cls._open[path] = cls(path)
+        return catalog
+
+    def get(self, key, default=None):
+        data, mask = self.data, self.mask
+        slot = key & mask
+        while True:
+            found, offset, length = CATALOG_SLOT.unpack_from(
+                data, CATALOG_HEADER.size + slot * CATALOG_SLOT.size)
+            if found == key:
+                return data[offset:offset + length].decode('utf-8')
+            if not found:
+                return default
+            slot = (slot + 1) & mask
+
+    def __len__(self):
+        return self.count
+
+    @classmethod
+    def find(cls, name):
+        """
+        Catálogo de un idioma: `name` es un archivo compilado o un código
+        (textos/<código>.cat junto al juego). None para el español original.
+        """
+        if os.path.exists(name):
+            return cls.open(name)
+        filename = os.path.join(TEXTS_DIR, name + ".cat")
+        if os.path.exists(filename):
+            return cls.open(filename)
+        if name == "es":
+            return None
+        raise FileNotFoundError(f"No hay catálogo de textos para {name!r} (compílalo con catalog.py)")
+
+    @staticmethod
+    def write(filename, texts, language=""):
+        """Compila {id: texto} en `filename` (de forma atómica: temporal + renombrado)."""
+        slots = 8
+        while slots < 2 * len(texts):
+            slots *= 2
+        table = [(0, 0, 0)] * slots
+        blobs = []
+        offset = CATALOG_HEADER.size + slots * CATALOG_SLOT.size
+        for key, text in texts.items():
+            data = text.encode('utf-8')
+            slot = key & (slots - 1)
+            while table[slot][0]:
+                slot = (slot + 1) & (slots - 1)
+            table[slot] = (key, offset, len(data))
+            blobs.append(data)
+            offset += len(data)
+        tmp = filename + ".tmp"
+        with open(tmp, 'wb') as f:
+            f.write(CATALOG_HEADER.pack(CATALOG_MAGIC, CATALOG_VERSION, slots, len(texts),
+                                        language.encode('ascii')[:8]))
+            f.write(b''.join(CATALOG_SLOT.pack(*entry) for entry in table))
+            f.write(b''.join(blobs))
+        os.replace(tmp, filename)
+
+
+# -------------------------
+# Escenas como datos
+# -------------------------
+# Cada escena es un diccionario:
+#   'require': (condición, efectos si no se cumple; se sale de la escena)
+#   'first' / 'again': efectos la primera vez / las siguientes (marca 'visited')
+#   'intro': efectos que se ejecutan siempre
+#   'header', 'options', 'default': el menú. Cada opción es un dict con
+#       'text', 'do' (efectos) y opcionalmente 'if' (sólo se muestra si se cumple).
+#       'default' es el índice de la opción que se usa con un número desconocido.
+#   'run': nombre de un método de Game que hace toda la escena.
+#   'travel': False para no ofrecer el viaje rápido en el menú.
+# Condiciones: ('flag', f) ('item', i) ('has_map',) ('reputation', n) ('memories', n)
+#              ('chance', p) ('not', c) ('any', c1, c2, ...) ('all', c1, c2, ...)
+# Efectos: ('say', texto[, color[, delay]]) ('title', texto[, delay]) ('goto', loc)
+#          ('set', flag[, valor]) ('give', item) ('memory', m) ('credits', n)
+#          ('reputation', n) ('has_map',) ('damage', n) ('wait', prompt)
+#          ('call', método, *args) ('if', cond, efectos[, efectos_else])
+#          ('menu', cabecera, opciones[, default])
+SCENES = {
+    'entrada': {
+        'first': [
+            ('title', "Vestíbulo principal - Halcyon", 0.02),
+            ('say', "La luz de emergencia vibra en tonos rojos. El aire huele a metal y ozono. Frente a ti, una puerta corrediza parcialmente bloqueada y un panel de la pared con acceso."),
+        ],
+        'again': [('title', "Vestíbulo principal")],
+        'header': "\nQué quieres hacer?",
+        'options': [
+            {'text': "Investigar el panel de acceso.", 'do': [('call', 'panel_acceso')]},
+            {'text': "Forzar la puerta bloqueada.", 'do': [('call', 'forzar_puerta')]},
+            {'text': "Salir al pasillo hacia la izquierda.", 'do': [('goto', 'pasillo')]},
+            {'text': "Guardar / Cargar partida", 'do': [('call', 'menu_save_load')]},
+            {'text': "Ver estado / inventario", 'do': [('call', 'show_status')]},
+        ],
+    },
+    'pasillo': {
+        'first': [('say', "Pasillo principal. Hay puertas a laboratorio (derecha) y módulo de habitáculos (izquierda). Un letrero indica: 'Nivel -2: Núcleo'.")],
+        'again': [('say', "Pasillo principal.")],
+        'header': "\nOpciones:",
+        'options': [
+            {'text': "Ir al laboratorio", 'do': [('goto', 'lab')]},
+            {'text': "Ir a los habitáculos", 'do': [('goto', 'hab_mod')]},
+            {'text': "Seguir hasta un panel con mapa (puede requerir desbloqueo)", 'do': [
+                ('if', ('any', ('flag', 'panel_hacked'), ('item', 'mapa')), [
+                    ('say', "El panel muestra un mapa parcial: Núcleo abajo, Sala de Comunicaciones a la izquierda, Almacén a la derecha."),
+                    ('has_map',),
+                ], [
+                    ('say', "El panel está protegido. Quizá puedas desbloquearlo en el vestíbulo."),
+                ]),
+                ('wait', "Enter..."),
+            ]},
+            {'text': "Volver al vestíbulo", 'do': [('goto', 'entrada')]},
+        ],
+        'default': 3,
+    },
+    'lab': {
+        'first': [('say', "Laboratorio de investigación. Estaciones de trabajo, contenedores y una vitrina con un implante cerebral antiguo.")],
+        'again': [('say', "Laboratorio.")],
+        'header': "\nQué haces?",
+        'options': [
+            {'text': "Abrir la vitrina (posible recompensa/alarma)", 'do': [
+                ('if', ('item', 'implante'), [
+                    ('say', "La vitrina está vacía. Ya cogiste el implante."),
+                ], [
+                    ('if', ('chance', 0.6), [
+                        ('say', "Te haces con el implante neural. Recuperas una memoria fragmentada.", 'green'),
+                        ('give', 'implante'),
+                        ('memory', 'memoria_parcial_1'),
+                        ('credits', 10),
+                    ], [
+                        ('say', "La vitrina estaba trampa: toxinas liberadas. Pierdes salud.", 'red'),
+                        ('damage', 6),
+                    ]),
+                ]),
+                ('wait', "Enter..."),
+            ]},
+            {'text': "Revisar terminales", 'do': [
+                ('say', "La terminal muestra registros: 'Incidente: Aislamiento del Núcleo. Señales AI corruptas.' Hay un mensaje marcado como urgente."),
+                ('menu', None, [
+                    {'text': "Leer mensaje urgente", 'do': [('call', 'read_urgent_message')]},
+                    {'text': "Ignorar", 'do': [('say', "Ignoras el mensaje por ahora."), ('wait', "Enter...")]},
+                ], 1),
+            ]},
+            {'text': "Volver al pasillo", 'do': [('goto', 'pasillo')]},
+        ],
+        'default': 2,
+    },
+    'almacen': {
+        'first': [('say', "Almacén. Cajas volcaron al suelo. A un lado hay una caja fuerte con un panel numérico.")],
+        'again': [('say', "Almacén.")],
+        'header': "\nOpciones:",
+        'options': [
+            {'text': "Buscar en cajas", 'do': [('call', 'buscar_cajas'), ('wait', "Enter...")]},
+            {'text': "Intentar abrir la caja fuerte", 'do': [('call', 'safe_minigame')]},
+            {'text': "Volver al vestíbulo", 'do': [('goto', 'entrada')]},
+        ],
+        'default': 2,
+    },
+    'hab_mod': {
+        'first': [('say', "Módulo de habitáculos. Cabinas personales, fotos pegadas en paredes y una puerta que baja hacia el Núcleo.")],
+        'again': [('say', "Módulo de habitáculos.")],
+        'header': "\nOpciones:",
+        'options': [
+            {'text': "Revisar cabina de la derecha", 'do': [
+                ('say', "Encuentras un diario con entradas truncas. Una entrada menciona 'la señal me susurra por la noche'."),
+                ('memory', 'diario_fragmento'),
+                ('wait', "Enter..."),
+            ]},
+            {'text': "Revisar cabina izquierda (puerta al Núcleo abajo cerca)", 'do': [
+                ('say', "Bajas por una trampilla que lleva a un ascensor dañado marcado como 'Acceso Núcleo'. Está cerrado por seguridad."),
+                ('if', ('any', ('flag', 'panel_hacked'), ('item', 'modulo_memoria')), [
+                    ('say', "Usas lo que tienes para forzar el ascensor. Acceso desbloqueado.", 'green'),
+                    ('set', 'nucleo_access'),
+                ], [
+                    ('say', "No tienes la autorización ni herramientas para abrirlo.", 'yellow'),
+                ]),
+                ('wait', "Enter..."),
+            ]},
+            {'text': "Buscar en tiendas personales", 'do': [
+                ('say', "Un vecino dejó su llave energética. La tomas (puede servir para desbloquear)."),
+                ('give', 'llave_energetica'),
+                ('wait', "Enter..."),
+            ]},
+            {'text': "Volver al pasillo", 'do': [('goto', 'pasillo')]},
+        ],
+        'default': 3,
+    },
+    'sala_com': {
+        'intro': [
+            ('say', "Sala de Comunicaciones. Antenas rotas y un terminal central."),
+            ('if', ('not', ('any', ('flag', 'panel_open'), ('flag', 'panel_hacked'))), [
+                ('say', "La sala está en silencio. Parece que la transmisión está bloqueada desde el Núcleo."),
+            ]),
+        ],
+        'header': "\nOpciones:",
+        'options': [
+            {'text': "Revisar terminal central", 'do': [
+                ('say', "El terminal solicita credenciales para arrancar el transmisor."),
+                ('if', ('flag', 'nucleo_access'), [
+                    ('say', "Usas acceso local para arrancar parte de los sistemas. Un mensaje AI aparece: '¿Por qué has vuelto?'", 'green'),
+                    ('set', 'ai_contact'),
+                    ('call', 'converse_ai'),
+                ], [
+                    ('say', "No tienes acceso. Quizá el Núcleo lo controla."),
+                ]),
+                ('wait', "Enter..."),
+            ]},
+            {'text': "Intentar enviar señal externa (requiere desbloqueo del Núcleo)", 'do': [
+                ('if', ('flag', 'nucleo_access'), [
+                    ('say', "Intentas enviar señal... se requiere decidir el destino: ¿Alerta de rescate o Señal de apagado sorpresivo?"),
+                    ('menu', None, [
+                        {'text': "Alerta de rescate (puede atraer naves pero revelar ubicación)", 'do': [
+                            ('say', "Envías la alerta. Un ping de respuesta: 'NAVE COMERCIAL EN RUTA'... pero el Núcleo reacciona."),
+                            ('set', 'sent_rescue'),
+                            ('call', 'random_encounter', True),
+                        ]},
+                        {'text': "Señal de apagado (intenta apagar emisión del Núcleo)", 'do': [
+                            ('say', "Envías la señal de apagado. Paras la frecuencia pero alguien lo detectó."),
+                            ('set', 'sent_shutdown_signal'),
+                            ('call', 'random_encounter'),
+                        ]},
+                    ], 1),
+                ], [
+                    ('say', "No tienes control para emitir. El Núcleo lo impide."),
+                ]),
+                ('wait', "Enter..."),
+            ]},
+            {'text': "Volver al vestíbulo", 'do': [('goto', 'entrada')]},
+        ],
+        'default': 2,
+    },
+    'nucleo': {
+        'require': (('flag', 'nucleo_access'), [
+            ('say', "El ascensor al Núcleo está bloqueado. No puedes acceder aún."),
+            ('goto', 'hab_mod'),
+            ('wait', "Enter..."),
+        ]),
+        'intro': [
+            ('title', "Núcleo - Cámara central", 0.02),
+            ('say', "Entrarás al corazón de Halcyon. Aquí descubrirás la verdad o perderás más de lo que recuperes."),
+        ],
+        'header': "\nOpciones:",
+        'options': [
+            {'text': "Avanzar hacia el núcleo y enfrentarte a su control lógico", 'do': [('call', 'encounter_core_ai')]},
+            {'text': "Intentar sabotear desde el acceso remoto (peligroso, puede requerir objetos)", 'do': [
+                ('if', ('any', ('item', 'llave_energetica'), ('item', 'modulo_memoria')), [
+                    ('say', "Con la llave y los módulos disponibles, intentas inyectar un parche que haga reset parcial al Núcleo."),
+                    ('if', ('chance', 0.6), [
+                        ('say', "El parche funciona parcialmente: el Núcleo se calma y te ofrece diálogo.", 'green'),
+                        ('set', 'core_stabilized'),
+                        ('call', 'converse_core', True),
+                    ], [
+                        ('say', "El parche falla y el Núcleo se defiende.", 'red'),
+                        ('call', 'random_encounter', True),
+                    ]),
+                ], [
+                    ('say', "No tienes los elementos necesarios para un sabotaje remoto seguro.", 'yellow'),
+                ]),
+            ]},
+            {'text': "Retroceder", 'do': [('goto', 'hab_mod')]},
+        ],
+        'default': 2,
+    },
+    'final': {'run': 'scene_final'},
+}
+
+TRAVEL_OPTION = {'if': ('has_map',), 'text': "Viaje rápido (ir a otra sala)", 'do': [('call', 'fast_travel')]}
+
+COLORS = {'red': RED, 'green': GREEN, 'yellow': YELLOW, 'cyan': CYAN, 'magenta': MAGENTA}
+
+
+def compile_condition(cond):
+    """Convierte una condición en una función game -> bool."""
+    kind = cond[0]
+    if kind == 'flag':
+        i = FLAGS.intern(cond[1])
+        return lambda g: g.flags.is_set(i)
+    if kind == 'has_map':
+        return lambda g: g.player.has_map
+    if kind == 'item':
+        i = ITEMS.intern(cond[1])
+        return lambda g: g.player.inventory.has(i)
+    if kind == 'reputation':
+        n = cond[1]
+        return lambda g: g.player.reputation >= n
+    if kind == 'memories':
+        n = cond[1]
+        return lambda g: len(g.player.memories) >= n
+    if kind == 'chance':
+        p = cond[1]
+        return lambda g: g.rng.random() < p
+    if kind == 'not':
+        inner = compile_condition(cond[1])
+        return lambda g: not inner(g)
+    if kind in ('any', 'all'):
+        parts = tuple(compile_condition(c) for c in cond[1:])
+        if kind == 'any':
+            return lambda g: any(c(g) for c in parts)
+        return lambda g: all(c(g) for c in parts)
+    raise ValueError(f"Condición desconocida: {cond!r}")
+
+
+def localized(text, before="", after=""):
+    """
+    Función game -> `before + text + after` con `text` en el idioma de la
+    partida. El ID se calcula al compilar y, sin catálogo, el resultado ya
+    está montado.
+    """
+    key = text_id(text)
+    full = before + text + after
+    def get(g):
+        return full if g.texts is None else before + g.texts.get(key, text) + after
+    return get
+
+
+def compile_effect(effect):
+    """
+    Convierte un efecto en una función game -> ..., que devuelve una escena
+    (generador) si el efecto espera algo: se ejecuta con perform().
+    """
+    kind = effect[0]
+    if kind == 'say':
+        if len(effect) > 2 and effect[2]:
+            text = localized(effect[1], COLORS[effect[2]], RESET)
+        else:
+            text = localized(effect[1])
+        delay = effect[3] if len(effect) > 3 else 0.01
+        return lambda g: g.io.slowprint(text(g), delay)
+    if kind == 'title':
+        text = localized(effect[1], BOLD, RESET)
+        delay = effect[2] if len(effect) > 2 else 0.01
+        return lambda g: g.io.slowprint(text(g), delay)
+    if kind == 'goto':
+        loc = effect[1]
+        def goto(g):
+            g.player.location = loc
+        return goto
+    if kind == 'set':
+        name = effect[1]
+        value = effect[2] if len(effect) > 2 else True
+        def set_flag(g):
+            g.flags[name] = value
+        return set_flag
+    if kind == 'give':
+        item = effect[1]
+        return lambda g: g.player.inventory.append(item)
+    if kind == 'memory':
+        memory = effect[1]
+        return lambda g: g.player.memories.append(memory)
+    if kind == 'credits':
+        n = effect[1]
+        def credits(g):
+            g.player.credits += n
+        return credits
+    if kind == 'reputation':
+        n = effect[1]
+        def reputation(g):
+            g.player.reputation += n
+        return reputation
+    if kind == 'has_map':
+        def has_map(g):
+            g.player.has_map = True
+        return has_map
+    if kind == 'damage':
+        n = effect[1]
+        return lambda g: g.player.take_damage(n)
+    if kind == 'wait':
+        prompt = localized(effect[1])
+        def wait(g):
+            yield Input(prompt(g))
+        return wait
+    if kind == 'call':
+        name, args = effect[1], effect[2:]
+        return lambda g: getattr(g, name)(*args)
+    if kind == 'if':
+        cond = compile_condition(effect[1])
+        then = compile_effects(effect[2])
+        other = compile_effects(effect[3]) if len(effect) > 3 else None
+        def branch(g):
+            if cond(g):
+                return then(g)
+            if other is not None:
+                return other(g)
+        return branch
+    if kind == 'menu':
+        return CompiledMenu(effect[1], effect[2], effect[3] if len(effect) > 3 else None).run
+    raise ValueError(f"Efecto desconocido: {effect!r}")
+
+
+def compile_effects(effects):
+    """Una lista de efectos se convierte en una sola función (como compile_effect)."""
+    fns = tuple(compile_effect(e) for e in effects)
+    if len(fns) == 1:
+        return fns[0]
+    def run(g):
+        for fn in fns:
+            scene = fn(g)
+            if type(scene) is types.GeneratorType:
+                yield from scene
+    return run
+
+
+class CompiledMenu:
+    """Menú numerado: textos, condiciones y acciones ya compilados."""
+    def __init__(self, header, options, default=None):
+        self.header = header
+        self.options = tuple(
+            (compile_condition(o['if']) if 'if' in o else None, o['text'], compile_effects(o['do']))
+            for o in options)
+        self.default = default
+        self.static = all(cond is None for cond, _, _ in self.options)
+        # (opciones visibles[, catálogo]) -> (cabecera, líneas, prompt, choices)
+        self.rendered = {}
+        if self.static:
+            self.visible = tuple(range(len(self.options)))
+            self.lines, self.prompt, self.choices = self._render(self.visible)[1:]
+
+    def _render(self, visible, texts=None):
+        n = len(visible)
+        header = translate(texts, self.header) if self.header else self.header
+        lines = tuple(f"{i}) {translate(texts, self.options[k][1])}"
+                      for i, k in enumerate(visible, start=1))
+        prompt = translate(texts, "Elige 1 o 2:") if n == 2 else translate(texts, "Elige 1-{n}:").format(n=n)
+        return header, lines, prompt, [str(i) for i in range(1, n + 1)]
+
+    def run(self, g):
+        texts = g.texts
+        if self.static and texts is None:
+            visible, header = self.visible, self.header
+            lines, prompt, choices = self.lines, self.prompt, self.choices
+        else:
+            visible = (self.visible if self.static else
+                       tuple(k for k, (cond, _, _) in enumerate(self.options) if cond is None or cond(g)))
+            key = visible if texts is None else (visible, texts)
+            rendered = self.rendered.get(key)
+            if rendered is None:
+                rendered = self.rendered[key] = self._render(visible, texts)
+            header, lines, prompt, choices = rendered
+        g.io.menu(header, lines)
+        c = yield Choice(prompt, choices)
+        idx = int(c) - 1 if c.isdigit() else -1
+        if 0 <= idx < len(visible):
+            yield from perform(self.options[visible[idx]][2], g)
+        elif self.default is not None:
+            yield from perform(self.options[self.default][2], g)
+
+
+class CompiledScene:
+    """Una escena de SCENES lista para ejecutar: sin búsquedas de texto ni if/elif."""
+    def __init__(self, index, name, data):
+        self.index = index
+        self.name = name
+        self.method = data.get('run')
+        self.require = None
+        if 'require' in data:
+            cond, fail = data['require']
+            self.require = (compile_condition(cond), compile_effects(fail))
+        self.first = compile_effects(data['first']) if 'first' in data else None
+        self.again = compile_effects(data['again']) if 'again' in data else None
+        self.intro = compile_effects(data['intro']) if 'intro' in data else None
+        self.menu = None
+        if 'options' in data:
+            # las salas con menú ofrecen el viaje rápido cuando tienes el mapa
+            options = list(data['options']) + ([TRAVEL_OPTION] if data.get('travel', True) else [])
+            self.menu = CompiledMenu(data.get('header'), options, data.get('default'))
+
+    def run(self, g):
+        if self.method is not None:
+            yield from perform(getattr(g, self.method))
+            return
+        g.io.cls()
+        # mostrar mapa fijo encima de la escena
+        g.show_map()
+        if self.require is not None and not self.require[0](g):
+            yield from perform(self.require[1], g)
+            return
+        if self.first is not None:
+            if self.name not in g.visited:
+                yield from perform(self.first, g)
+                g.visited.add(self.name)
+            elif self.again is not None:
+                yield from perform(self.again, g)
+        if self.intro is not None:
+            yield from perform(self.intro, g)
+        # sólo 'first' marca la sala como visitada: las escenas sin primera
+        # visita (sala_com, nucleo) nunca lo hicieron
+        if self.menu is not None:
+            yield from self.menu.run(g)
+
+
+def compile_scenes(scenes):
+    """
+    Compila SCENES una sola vez: devuelve (índice nombre -> posición, tabla).
+    Añadir salas no añade ramas ni código, sólo otra entrada en la tabla.
+    """
+    index = {}
+    table = []
+    for name, data in scenes.items():
+        index[name] = len(table)
+        table.append(CompiledScene(len(table), name, data))
+    return index, tuple(table)
+
+
+SCENE_INDEX, SCENE_TABLE = compile_scenes(SCENES)
+
+# -------------------------
+# Mapa de la estación
+# -------------------------
+class StationMap:
+    """
+    Mapa de salas en una rejilla respaldada por un array plano: la celda
+    (x, y) guarda el índice de la sala o -1. La propia rejilla es el índice
+    espacial, así que "qué hay cerca" o dibujar una ventana cuesta lo que
+    mide la ventana, no el número de salas.
+    """
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.grid = array('i', [-1]) * (width * height)
+        self.ids = []        # índice -> id de sala
+        self.labels = []     # índice -> etiqueta
+        self.coords = []     # índice -> (x, y)
+        self.index = {}      # id de sala -> índice
+
+    def __contains__(self, room_id):
+        return room_id in self.index
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add_room(self, room_id, x, y, label=None):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise ValueError(f"Sala {room_id!r} fuera del mapa: ({x}, {y})")
+        if self.grid[y * self.width + x] != -1:
+            raise ValueError(f"Ya hay una sala en ({x}, {y})")
+        i = len(self.ids)
+        self.ids.append(room_id)
+        self.labels.append(label if label is not None else room_id)
+        self.coords.append((x, y))
+        self.index[room_id] = i
+        self.grid[y * self.width + x] = i
+        return i
+
+    def room_at(self, x, y):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            i = self.grid[y * self.width + x]
+            if i != -1:
+                return self.ids[i]
+        return None
+
+    def position(self, room_id):
+        return self.coords[self.index[room_id]]
+
+    def label(self, room_id):
+        i = self.index.get(room_id)
+        return self.labels[i] if i is not None else room_id
+
+    def rooms_in(self, x0, y0, x1, y1):
+        """Salas dentro del rectángulo [x0, x1) x [y0, y1), como (x, y, id)."""
+        x0, y0 = max(0, x0), max(0, y0)
+        x1, y1 = min(self.width, x1), min(self.height, y1)
+        for y in range(y0, y1):
+            row = self.grid[y * self.width + x0:y * self.width + x1]
+            for dx, i in enumerate(row):
+                if i != -1:
+                    yield x0 + dx, y, self.ids[i]
+
+    def near(self, room_id, radius=1):
+        """Salas a distancia de Chebyshev <= radius (sin incluir la propia)."""
+        x, y = self.position(room_id)
+        return [r for _, _, r in self.rooms_in(x - radius, y - radius, x + radius + 1, y + radius + 1)
+                if r != room_id]
+
+    def neighbors(self, room_id):
+        """Salas contiguas en horizontal/vertical, como (dirección, id)."""
+        x, y = self.position(room_id)
+        out = []
+        for name, dx, dy in (("norte", 0, -1), ("sur", 0, 1), ("oeste", -1, 0), ("este", 1, 0)):
+            r = self.room_at(x + dx, y + dy)
+            if r is not None:
+                out.append((name, r))
+        return out
+
+    def viewport(self, room_id, vw, vh):
+        """Ventana de vw x vh celdas centrada en la sala, ajustada a los bordes."""
+        vw, vh = min(vw, self.width), min(vh, self.height)
+        x, y = self.position(room_id) if room_id in self.index else (0, 0)
+        x0 = min(max(0, x - vw // 2), self.width - vw)
+        y0 = min(max(0, y - vh // 2), self.height - vh)
+        return x0, y0, x0 + vw, y0 + vh
+
+    # --- construcción ---
+    @classmethod
+    def from_positions(cls, positions, labels=None):
+        labels = labels or {}
+        width = max((x for x, _ in positions.values()), default=0) + 1
+        height = max((y for _, y in positions.values()), default=0) + 1
+        station = cls(width, height)
+        for room_id, (x, y) in positions.items():
+            station.add_room(room_id, x, y, labels.get(room_id, room_id))
+        return station
+
+    @classmethod
+    def from_dict(cls, data):
+        station = cls(data['width'], data['height'])
+        for room in data['rooms']:
+            station.add_room(room['id'], room['x'], room['y'], room.get('label'))
+        return station
+
+    def to_dict(self):
+        return {
+            'width': self.width,
+            'height': self.height,
+            'rooms': [{'id': r, 'label': l, 'x': x, 'y': y}
+                      for r, l, (x, y) in zip(self.ids, self.labels, self.coords)],
+        }
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+    def save(self, filename):
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+
+    @classmethod
+    def generate(cls, rooms, width=None, height=None, seed=None, first=None, around=None):
+        """
+        Estación procedural de `rooms` salas conectadas: crece desde el centro
+        añadiendo celdas contiguas al azar. La primera sala (el muelle) se
+        llama `first` si se indica; la partida empieza en ella.
+        Con `around` (otra StationMap, p. ej. la estación clásica) sus salas
+        van en el centro con sus etiquetas, en lugar del muelle, y los
+        sectores crecen alrededor: la historia sigue pudiendo terminarse.
+        """
+        rng = random.Random(seed)
+        side = int((rooms * 2) ** 0.5) + 1
+        if around is not None:
+            side = max(side, around.width + 2, around.height + 2)
+        width, height = width or side, height or side
+        if rooms > width * height:
+            raise ValueError("No caben tantas salas en el mapa")
+        station = cls(width, height)
+        frontier = []
+        seen = set()
+        if around is None:
+            x, y = width // 2, height // 2
+            station.add_room(first or f"sector_{x}_{y}", x, y, "Muelle")
+            seen.add((x, y))
+            starts = [(x, y)]
+        else:
+            if around.width > width or around.height > height:
+                raise ValueError("La estación base no cabe en el mapa")
+            ox, oy = (width - around.width) // 2, (height - around.height) // 2
+            starts = []
+            for room_id, label, (x, y) in zip(around.ids, around.labels, around.coords):
+                station.add_room(room_id, x + ox, y + oy, label)
+                seen.add((x + ox, y + oy))
+                starts.append((x + ox, y + oy))
+
+        def grow(x, y):
+            for dx, dy in ((0, -1), (0, 1), (-1, 0), (1, 0)):
+                c = (x + dx, y + dy)
+                if 0 <= c[0] < width and 0 <= c[1] < height and c not in seen:
+                    seen.add(c)
+                    frontier.append(c)
+
+        for x, y in starts:
+            grow(x, y)
+        while len(station) < rooms and frontier:
+            k = rng.randrange(len(frontier))
+            frontier[k], frontier[-1] = frontier[-1], frontier[k]
+            x, y = frontier.pop()
+            station.add_room(f"sector_{x}_{y}", x, y, f"S{x}-{y}")
+            grow(x, y)
+        return station
+
+# -------------------------
+# Grafo de salas y rutas
+# -------------------------
+# Pasos entre salas que dependen de una flag (la puerta forzada, la
+# compuerta del panel, el ascensor del Núcleo). El resto de conexiones se
+# extraen de los 'goto' de los menús de SCENES.
+GATED_EDGES = [
+    ('entrada', 'almacen', 'puerta_forzada'),
+    ('entrada', 'sala_com', 'panel_open'),
+    ('hab_mod', 'nucleo', 'nucleo_access'),
+]
+
+def scene_edges(scenes):
+    """Conexiones directas (origen, destino) de las opciones de cada escena."""
+    edges = []
+    for name, data in scenes.items():
+        for option in data.get('options', ()):
+            for effect in option['do']:
+                if effect[0] == 'goto' and effect[1] != name:
+                    edges.append((name, effect[1]))
+    return edges
+
+class RoomGraph:
+    """
+    Grafo dirigido de salas con puertas (aristas que requieren una flag).
+    Las rutas más cortas se calculan con un BFS por origen y se guardan como
+    tablas de predecesores, así una consulta es reconstruir el camino (O(largo)).
+    Cuando cambia una flag sólo se descartan las tablas de los orígenes a los
+    que afecta esa arista.
+    """
+    def __init__(self, rooms, edges, precompute_limit=512, cache_size=None):
+        self.rooms = list(rooms)
+        self.index = {r: i for i, r in enumerate(self.rooms)}
+        self.adj = [[] for _ in self.rooms]   # índice -> [(destino, flag o None)]
+        self.gates = {}                        # flag -> [(origen, destino)]
+        self.open = set()
+        self.tables = OrderedDict()            # origen -> (dist, prev)
+        # por defecto unas ~16 MB de tablas como mucho (8 bytes por sala y origen)
+        self.cache_size = cache_size or max(16, 2000000 // max(1, len(self.rooms)))
+        for edge in edges:
+            a, b = edge[0], edge[1]
+            gate = edge[2] if len(edge) > 2 else None
+            if a not in self.index or b not in self.index:
+                continue
+            ia, ib = self.index[a], self.index[b]
+            self.adj[ia].append((ib, gate))
+            if gate is not None:
+                self.gates.setdefault(gate, []).append((ia, ib))
+        if len(self.rooms) <= precompute_limit:
+            self.precompute()
+
+    @classmethod
+    def for_game(cls, station, scenes=None, gated=None):
+        """Grafo de una estación: escenas con sus menús y salas genéricas por contigüidad."""
+        scenes = SCENES if scenes is None else scenes
+        gated = GATED_EDGES if gated is None else gated
+        rooms = list(station.ids) + [r for r in scenes if r not in station and 'options' in scenes[r]]
+        edges = scene_edges(scenes) + list(gated)
+        for r in station.ids:
+            if r not in scenes:
+                edges.extend((r, n) for _, n in station.neighbors(r))
+            else:
+                # de una escena a las salas genéricas de al lado (estaciones
+                # generadas alrededor de la clásica); entre escenas mandan sus menús
+                edges.extend((r, n) for _, n in station.neighbors(r) if n not in scenes)
+        return cls(rooms, edges)
+
+    # --- puertas ---
+    def sync(self, flags):
+        """Actualiza las puertas según las flags de la partida (O(nº de puertas))."""
+        for gate in self.gates:
+            is_open = bool(flags.get(gate))
+            if is_open != (gate in self.open):
+                self.set_gate(gate, is_open)
+
+    def set_gate(self, gate, is_open):
+        if is_open:
+            self.open.add(gate)
+        else:
+            self.open.discard(gate)
+        stale = []
+        for src, (dist, prev) in self.tables.items():
+            for a, b in self.gates.get(gate, ()):
+                # abrir sólo mejora rutas de quien llega al origen de la arista;
+                # cerrar sólo rompe rutas que pasaban por ella
+                if (is_open and dist[a] >= 0) or (not is_open and prev[b] == a):
+                    stale.append(src)
+                    break
+        for src in stale:
+            del self.tables[src]
+
+    # --- BFS ---
+    def _bfs(self, src):
+        n = len(self.rooms)
+        dist = array('i', [-1]) * n
+        prev = array('i', [-1]) * n
+        dist[src] = 0
+        queue = [src]
+        opened = self.open
+        for u in queue:
+            du = dist[u] + 1
+            for v, gate in self.adj[u]:
+                if dist[v] < 0 and (gate is None or gate in opened):
+                    dist[v] = du
+                    prev[v] = u
+                    queue.append(v)
+        return dist, prev
+
+    def _table(self, src):
+        table = self.tables.get(src)
+        if table is None:
+            table = self.tables[src] = self._bfs(src)
+            if len(self.tables) > self.cache_size:
+                self.tables.popitem(last=False)
+        else:
+            self.tables.move_to_end(src)
+        return table
+
+    def precompute(self):
+        """BFS desde todas las salas (para grafos pequeños)."""
+        for i in range(len(self.rooms)):
+            self._table(i)
+
+    # --- consultas ---
+    def distance(self, a, b):
+        """Pasos de a a b, o None si no hay camino con las puertas actuales."""
+        d = self._table(self.index[a])[0][self.index[b]]
+        return d if d >= 0 else None
+
+    def path(self, a, b):
+        """Lista de salas de a a b (ambas incluidas), o None si no hay camino."""
+        ia, ib = self.index.get(a), self.index.get(b)
+        if ia is None or ib is None:
+            return None
+        dist, prev = self._table(ia)
+        if dist[ib] < 0:
+            return None
+        out = [ib]
+        while out[-1] != ia:
+            out.append(prev[out[-1]])
+        return [self.rooms[i] for i in reversed(out)]
+
+    def reachable(self, a):
+        """Salas alcanzables desde a con su distancia, de la más cercana a la más lejana."""
+        dist = self._table(self.index[a])[0]
+        found = [(d, i) for i, d in enumerate(dist) if d > 0]
+        found.sort()
+        return [(self.rooms[i], d) for d, i in found]
+
+# -------------------------
+# Formatos de guardado (JSON y binario)
+# -------------------------
+# Cadenas conocidas con ID fijo en el formato binario. Forman parte del
+# esquema: sólo se añaden al final (cambiar el orden exige subir la versión).
+SAVE_STRINGS = (
+    # ubicaciones
+    'entrada', 'pasillo', 'lab', 'almacen', 'hab_mod', 'sala_com', 'nucleo', 'final',
+    # objetos
+    'multiherramienta', 'implante', 'kit_medico', 'municion', 'antiviral', 'mapa',
+    'modulo_memoria', 'llave_energetica',
+    # memorias
+    'nota_no_confiar_nucleo', 'memoria_parcial_1', 'memoria_parcial_2', 'registro_kessler',
+    'diario_fragmento', 'ai_dialogo_1', 'ai_identity', 'recovered_during_combat',
+    'memoria_core_reinicio', 'core_fragment_extracted', 'memoria_core_engano', 'datos_core_crudos',
+    # flags
+    'prologo_done', 'core_locked', 'seen_ai_message', 'panel_hacked', 'panel_open', 'found_note',
+    'nucleo_access', 'ai_contact', 'sent_rescue', 'sent_shutdown_signal', 'ai_trust',
+    'ai_identity_seen', 'core_stabilized', 'ending', 'puerta_forzada',
+    # finales
+    'paz', 'coexistencia', 'desconexion', 'destruccion', 'escapar_con_datos',
+)
+SAVE_STRING_IDS = {s: i for i, s in enumerate(SAVE_STRINGS)}
+
+class JsonCodec:
+    """El formato de siempre: JSON legible."""
+    name = 'json'
+
+    def encode(self, state):
+        return json.dumps(state, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def decode(self, data):
+        return json.loads(data.decode('utf-8'))
+
+class BinaryCodec:
+    """
+    Formato binario compacto. Todas las cadenas (objetos, flags, memorias,
+    ubicaciones) se guardan como IDs de 16 bits: las de SAVE_STRINGS tienen
+    ID fijo y el resto va en una tabla propia del archivo, a continuación de
+    las conocidas. Cada sección se empaqueta de una vez con un Struct
+    precompilado, sin recorrer los campos uno a uno en Python.
+
+      cabecera  'HSV' + versión (B)
+      tabla     cadenas fijas usadas (H), n (H), bytes (I) + utf-8 separado por NUL
+      jugador   max_hp hp attack defense reputation (5 x h), credits (i), turn (I),
+                seq del diario (I), has_map (B), nombre (ID), ubicación (ID)
+      tamaños   inventario, memorias, visitadas, flags, enteros, textos, json (7 x I)
+      IDs       inventario + memorias + visitadas + claves de flags
+                + valores de texto + valores json + valor de cada flag (H)
+      enteros   valores enteros de flags (i)
+    El valor de cada flag es un índice en [False, True, None, *enteros,
+    *textos, *json]. Las versiones antiguas se leen y se pasan por
+    BINARY_MIGRATIONS.
+    """
+    name = 'binario'
+    MAGIC = b'HSV'
+    VERSION = 2
+    TABLE = struct.Struct('<HHI')
+    PLAYER = struct.Struct('<5hiIIBHH')
+    SIZES = struct.Struct('<7I')
+    CONSTANTS = (False, True, None)
+    # versión 1: flags campo a campo
+    HEAD = struct.Struct('<5hiIIB')
+    F_FALSE, F_TRUE, F_INT, F_STR, F_NONE, F_JSON = range(6)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=64)
+    def _section(code, n):
+        """Struct precompilado para una sección de `n` valores del tipo `code`."""
+        return struct.Struct(f'<{n}{code}')
+
+    @staticmethod
+    def _gather(table, keys):
+        """tuple(table[k] for k in keys), pero sin un bucle en Python."""
+        keys = tuple(keys)
+        if len(keys) > 1:
+            return operator.itemgetter(*keys)(table)
+        return tuple(table[k] for k in keys)
+
+    def encode(self, state):
+        p, flags = state['player'], state['flags']
+        ints, texts, dumped = {}, {}, {}
+        refs = []
+        for value in flags.values():
+            if value is False or value is True or value is None:
+                refs.append((0, self.CONSTANTS.index(value)))
+            elif isinstance(value, int) and -2 ** 31 <= value < 2 ** 31:
+                refs.append((1, ints.setdefault(value, len(ints))))
+            elif isinstance(value, str):
+                refs.append((2, texts.setdefault(value, len(texts))))
+            else:
+                refs.append((3, dumped.setdefault(json.dumps(value), len(dumped))))
+        base = (0, 3, 3 + len(ints), 3 + len(ints) + len(texts))
+        lists = (p['inventory'], p['memories'], state['visited'], flags, texts, dumped)
+
+        # cadenas propias del archivo, en orden de aparición
+        local = dict.fromkeys(itertools.chain((p['name'], p['location']), *lists))
+        for s in SAVE_STRINGS:
+            local.pop(s, None)
+        fixed = len(SAVE_STRINGS)
+        if fixed + len(local) > 0xFFFF:
+            raise ValueError("Demasiadas cadenas distintas para el formato binario")
+        ids = dict(SAVE_STRING_IDS)
+        ids.update(zip(local, range(fixed, fixed + len(local))))
+
+        words = self._gather(ids, itertools.chain(*lists)) + tuple([base[pool] + i for pool, i in refs])
+        blob = '\0'.join(local).encode('utf-8')
+        return b''.join((
+            self.MAGIC, bytes([self.VERSION]), self.TABLE.pack(fixed, len(local), len(blob)), blob,
+            self.PLAYER.pack(p['max_hp'], p['hp'], p['attack'], p['defense'], p['reputation'],
+                             p['credits'], state['turn'], state.get('seq', 0), bool(p['has_map']),
+                             ids[p['name']], ids[p['location']]),
+            self.SIZES.pack(*map(len, lists[:4]), len(ints), len(texts), len(dumped)),
+            self._section('H', len(words)).pack(*words), self._section('i', len(ints)).pack(*ints),
+        ))
+
+    def decode(self, data):
+        if data[:3] != self.MAGIC:
+            raise ValueError("No es un guardado binario")
+        version = data[3]
+        if not 1 <= version <= self.VERSION:
+            raise ValueError(f"Versión de guardado desconocida ({version})")
+        state = (self._decode_v1 if version == 1 else self._decode_v2)(data)
+        while version < self.VERSION:
+            state = BINARY_MIGRATIONS[version](state)
+            version += 1
+        return state
+
+    def _strings(self, data):
+        fixed, n, size = self.TABLE.unpack_from(data, 4)
+        pos = 4 + self.TABLE.size
+        local = data[pos:pos + size].decode('utf-8').split('\0') if n else []
+        return SAVE_STRINGS[:fixed] + tuple(local), pos + size
+
+    def _decode_v2(self, data):
+        strings, pos = self._strings(data)
+        max_hp, hp, attack, defense, reputation, credits, turn, seq, has_map, name, location = \
+            self.PLAYER.unpack_from(data, pos)
+        pos += self.PLAYER.size
+        n_inv, n_mem, n_vis, n_flags, n_ints, n_texts, n_json = self.SIZES.unpack_from(data, pos)
+        pos += self.SIZES.size
+        a = n_inv
+        b = a + n_mem
+        c = b + n_vis
+        d = c + n_flags
+        e = d + n_texts
+        f = e + n_json
+        words = self._section('H', f + n_flags).unpack_from(data, pos)
+        ints = self._section('i', n_ints).unpack_from(data, pos + 2 * (f + n_flags))
+        named = self._gather(strings, words[:f])
+        pool = [*self.CONSTANTS, *ints, *named[d:e], *map(json.loads, named[e:f])]
+        return {
+            'player': {
+                'name': strings[name], 'max_hp': max_hp, 'hp': hp, 'attack': attack,
+                'defense': defense, 'inventory': list(named[:a]), 'credits': credits,
+                'memories': list(named[a:b]), 'location': strings[location], 'has_map': bool(has_map),
+                'reputation': reputation,
+            },
+            'visited': list(named[b:c]),
+            'flags': dict(zip(named[c:d], self._gather(pool, words[f:]))),
+            'turn': turn,
+            'seq': seq,
+        }
+
+    def _decode_v1(self, data):
+        strings, pos = self._strings(data)
+
+        max_hp, hp, attack, defense, reputation, credits, turn, seq, has_map = self.HEAD.unpack_from(data, pos)
+        pos += self.HEAD.size
+        name, location = struct.unpack_from('<HH', data, pos)
+        pos += 4
+        lists = []
+        for _ in range(3):
+            (n,) = struct.unpack_from('<I', data, pos)
+            pos += 4
+            ids = array('H')
+            ids.frombytes(data[pos:pos + 2 * n])
+            if sys.byteorder == 'big':
+                ids.byteswap()
+            lists.append(list(map(strings.__getitem__, ids)))
+            pos += 2 * n
+        (n,) = struct.unpack_from('<H', data, pos)
+        pos += 2
+        flags = {}
+        for _ in range(n):
+            k, kind = struct.unpack_from('<HB', data, pos)
+            pos += 3
+            if kind == self.F_INT:
+                (value,) = struct.unpack_from('<i', data, pos)
+                pos += 4
+            elif kind in (self.F_STR, self.F_JSON):
+                (i,) = struct.unpack_from('<H', data, pos)
+                pos += 2
+                value = strings[i] if kind == self.F_STR else json.loads(strings[i])
+            else:
+                value = {self.F_TRUE: True, self.F_FALSE: False, self.F_NONE: None}[kind]
+            flags[strings[k]] = value
+        return {
+            'player': {
+                'name': strings[name], 'max_hp': max_hp, 'hp': hp, 'attack': attack,
+                'defense': defense, 'inventory': lists[0], 'credits': credits,
+                'memories': lists[1], 'location': strings[location], 'has_map': bool(has_map),
+                'reputation': reputation,
+            },
+            'visited': lists[2],
+            'flags': flags,
+            'turn': turn,
+            'seq': seq,
+        }
+
+# versión -> función que convierte un estado de esa versión a la siguiente
+BINARY_MIGRATIONS = {
+    1: lambda state: state,  # la 2 sólo cambia la codificación, no el estado
+}
+
+SAVE_CODECS = {c.name: c for c in (JsonCodec(), BinaryCodec())}
+
+def decode_save(data):
+    """Decodifica un checkpoint en cualquiera de los formatos (por su cabecera)."""
+    if data[:3] == BinaryCodec.MAGIC:
+        return SAVE_CODECS['binario'].decode(data)
+    return SAVE_CODECS['json'].decode(data)
 
 # -------------------------
-# Utilidades y colores ANSI
+# Guardado con diario (checkpoint + deltas)
 # -------------------------
-RESET = "\033[0m"
-BOLD = "\033[1m"
-DIM = "\033[2m"
-RED = "\033[31m"
-GREEN = "\033[32m"
-YELLOW = "\033[33m"
-CYAN = "\033[36m"
-MAGENTA = "\033[35m"
+def state_delta(old, new):
+    """
+    Diferencias entre dos estados de partida (los dict de Game.save_state).
+    Las listas que sólo crecen se guardan como lo añadido.
+    """
+    delta = {}
+    p_set, p_add = {}, {}
+    for key, value in new['player'].items():
+        before = old['player'].get(key)
+        if value == before:
+            continue
+        if isinstance(value, list) and isinstance(before, list) and value[:len(before)] == before:
+            p_add[key] = value[len(before):]
+        else:
+            p_set[key] = value
+    if p_set:
+        delta['p'] = p_set
+    if p_add:
+        delta['pa'] = p_add
+    old_v, new_v = set(old['visited']), set(new['visited'])
+    if new_v - old_v:
+        delta['va'] = sorted(new_v - old_v)
+    if old_v - new_v:
+        delta['vr'] = sorted(old_v - new_v)
+    f_set = {k: v for k, v in new['flags'].items() if old['flags'].get(k, delta) != v}
+    f_del = [k for k in old['flags'] if k not in new['flags']]
+    if f_set:
+        delta['f'] = f_set
+    if f_del:
+        delta['fd'] = f_del
+    if new['turn'] != old['turn']:
+        delta['t'] = new['turn']
+    return delta
 
-def slowprint(text, delay=0.01, newline=True):
-    """Imprime el texto como si fuera una persona escribiendo (puedes subir delay)."""
-    for ch in text:
-        sys.stdout.write(ch)
-        sys.stdout.flush()
-        time.sleep(delay)
-    if newline:
-        print()
+def apply_delta(state, delta):
+    """Aplica una delta de state_delta sobre un estado (lo modifica)."""
+    player = state['player']
+    player.update(delta.get('p', {}))
+    for key, extra in delta.get('pa', {}).items():
+        player[key] = list(player.get(key, [])) + extra
+    visited = set(state['visited'])
+    visited.update(delta.get('va', ()))
+    visited.difference_update(delta.get('vr', ()))
+    state['visited'] = sorted(visited)
+    state['flags'].update(delta.get('f', {}))
+    for k in delta.get('fd', ()):
+        state['flags'].pop(k, None)
+    if 't' in delta:
+        state['turn'] = delta['t']
+    return state
 
-def cls():
-    os.system('cls' if os.name == 'nt' else 'clear')
+def copy_state(state):
+    return json.loads(json.dumps(state))
 
-def input_choice(prompt, choices):
+class SaveJournal:
     """
-    Muestra prompt y espera una opción valida.
-    choices: lista de strings que son válidas (se compara en minúsculas)
+    Guardado en dos archivos:
+      - `filename`: checkpoint con el estado completo (JSON como antes, o
+        binario con codec='binario'), que se escribe en un temporal y se
+        renombra (nunca queda a medias);
+      - `filename + '.journal'`: una línea JSON por guardado con sólo lo que
+        cambió desde el anterior.
+    Cada `compact_every` guardados se escribe un checkpoint nuevo y se vacía
+    el diario, así guardar no se encarece con la duración de la partida.
+    Los fsync del diario se agrupan cada `fsync_every` guardados (y al cerrar).
+    Cada entrada lleva un número de secuencia y el checkpoint el último que
+    incluye, así que un corte entre renombrar y vaciar no duplica deltas.
     """
-    while True:
-        res = input(prompt + " ").strip().lower()
-        if res == "":
-            continue
-        # permitir elegir por número si se muestran opciones numeradas
-        if res.isdigit():
-            return res
-        # si la respuesta es una de las opciones:
-        if res in choices:
-            return res
-        # permitir coincidencia por prefijo
-        for c in choices:
-            if c.startswith(res):
-                return c
-        print(YELLOW + "Opción no reconocida. Prueba otra vez." + RESET)
+    def __init__(self, filename, codec='json', compact_every=64, fsync_every=8):
+        self.filename = filename
+        self.name = filename
+        self.codec = SAVE_CODECS[codec]
+        self.journal_filename = filename + '.journal'
+        self.compact_every = compact_every
+        self.fsync_every = fsync_every
+        self.last = None       # último estado escrito (base de la próxima delta)
+        self.seq = 0
+        self.entries = 0       # deltas en el diario desde el checkpoint
+        self.unsynced = 0
+        self._journal = None
+
+    def _open_journal(self):
+        if self._journal is None:
+            self._journal = open(self.journal_filename, 'a', encoding='utf-8')
+        return self._journal
+
+    def sync(self):
+        if self._journal is not None and self.unsynced:
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self.unsynced = 0
+
+    def close(self):
+        if self._journal is not None:
+            self.sync()
+            self._journal.close()
+            self._journal = None
+
+    def checkpoint(self, state):
+        """Escribe el estado completo de forma atómica y vacía el diario."""
+        self.close()
+        data = dict(state)
+        data['seq'] = self.seq
+        tmp = self.filename + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(self.codec.encode(data))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.filename)
+        with open(self.journal_filename, 'w', encoding='utf-8'):
+            pass
+        self.last = copy_state(state)
+        self.entries = 0
+
+    def save(self, state):
+        if self.last is None:
+            self.checkpoint(state)
+            return
+        delta = state_delta(self.last, state)
+        if not delta:
+            return
+        self.seq += 1
+        delta['seq'] = self.seq
+        if self.entries + 1 >= self.compact_every:
+            self.checkpoint(state)
+            return
+        journal = self._open_journal()
+        journal.write(json.dumps(delta, ensure_ascii=False, separators=(',', ':')) + "\n")
+        journal.flush()
+        self.entries += 1
+        self.unsynced += 1
+        if self.unsynced >= self.fsync_every:
+            self.sync()
+        self.last = copy_state(state)
+
+    def load(self):
+        """Checkpoint + deltas del diario. Devuelve el estado o None."""
+        if not os.path.exists(self.filename):
+            return None
+        self.close()
+        with open(self.filename, 'rb') as f:
+            state = decode_save(f.read())
+        seq = state.pop('seq', 0)
+        entries = 0
+        if os.path.exists(self.journal_filename):
+            with open(self.journal_filename, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        delta = json.loads(line)
+                    except ValueError:
+                        break  # última línea cortada por una interrupción
+                    if delta.get('seq', 0) <= seq:
+                        continue
+                    apply_delta(state, delta)
+                    seq = delta['seq']
+                    entries += 1
+        self.seq = seq
+        self.entries = entries
+        self.last = copy_state(state)
+        return state
+
+    def exists(self):
+        return os.path.exists(self.filename)
+
+    def delete(self):
+        self.close()
+        for name in (self.filename, self.journal_filename):
+            if os.path.exists(name):
+                os.remove(name)
+        self.last = None
 
 # -------------------------
-# Clases principales
+# Autoguardado en segundo plano
 # -------------------------
-class Player:
-    def __init__(self, name="Protagonista"):
-        self.name = name
-        self.max_hp = 30
-        self.hp = 30
-        self.attack = 6
-        self.defense = 2
-        self.inventory = []
-        self.credits = 0
-        self.memories = []   # objetos de historia
-        self.location = "entrada"
-        self.has_map = False
-        self.reputation = 0  # influye en algunos encuentros
+class AutoSaver:
+    """
+    Escribe guardados en un hilo aparte para que el turno nunca espere al
+    disco. Se le entregan instantáneas (los dict de Game.save_state) junto al
+    destino (SaveJournal, ranura...); si llegan varias para el mismo destino
+    antes de escribirse, sólo se escribe la última. Un mismo AutoSaver puede
+    servir a muchas partidas (el servidor usa uno para todas las sesiones).
+    Si una escritura falla se registra en el log y el error se lanza en el
+    siguiente flush() de ese destino (o en close()).
+    """
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._pending = {}      # destino -> última instantánea sin escribir
+        self._writing = None    # destino que se está escribiendo ahora
+        self._failed = {}       # destino -> error de escritura aún sin lanzar
+        self._thread = None
+        self._stop = False
+        self.written = 0
+        self.coalesced = 0      # instantáneas descartadas por llegar otra más nueva
+        self.errors = 0
+        atexit.register(self.close)
 
-    def is_alive(self):
-        return self.hp > 0
+    def submit(self, target, state):
+        with self._cond:
+            if target in self._pending:
+                self.coalesced += 1
+            self._pending[target] = state
+            if self._thread is None:
+                self._stop = False
+                self._thread = threading.Thread(target=self._run, name="autoguardado", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
 
-    def heal(self, amount):
-        self.hp = min(self.max_hp, self.hp + amount)
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stop:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                target = next(iter(self._pending))
+                state = self._pending.pop(target)
+                self._writing = target
+            error = None
+            try:
+                target.save(state)
+                self.written += 1
+            except Exception as e:
+                error = e
+                logger.exception("No se pudo autoguardar en %s", getattr(target, 'name', target))
+            with self._cond:
+                if error is not None:
+                    self.errors += 1
+                    self._failed[target] = error
+                self._writing = None
+                self._cond.notify_all()
 
-    def take_damage(self, dmg):
-        dmg = max(0, dmg - self.defense)
-        self.hp -= dmg
-        return dmg
+    def _raise_failed(self, target=None):
+        """Lanza (y olvida) el error pendiente de un destino o el primero de todos."""
+        with self._cond:
+            if target is None:
+                errors = list(self._failed.values())
+                self._failed.clear()
+            else:
+                error = self._failed.pop(target, None)
+                errors = [error] if error is not None else []
+        if errors:
+            raise errors[0]
 
-class Enemy:
-    def __init__(self, name, hp, attack, defense=0, desc=""):
-        self.name = name
-        self.hp = hp
-        self.attack = attack
-        self.defense = defense
-        self.desc = desc
+    def flush(self, target=None):
+        """
+        Espera a que se escriba lo pendiente (de un destino o de todos) y
+        lanza el error de la escritura que haya fallado desde el último flush.
+        """
+        with self._cond:
+            if target is None:
+                self._cond.wait_for(lambda: not self._pending and self._writing is None)
+            else:
+                self._cond.wait_for(lambda: target not in self._pending and self._writing is not target)
+        self._raise_failed(target)
 
-    def is_alive(self):
-        return self.hp > 0
+    def close(self):
+        """Escribe lo pendiente, para el hilo y lanza el error que quede pendiente."""
+        with self._cond:
+            thread = self._thread
+            self._stop = True
+            self._cond.notify_all()
+        if thread is not None:
+            thread.join()
+        with self._cond:
+            self._thread = None
+        self._raise_failed()
 
-    def take_damage(self, dmg):
-        dmg = max(0, dmg - self.defense)
-        self.hp -= dmg
-        return dmg
+# -------------------------
+# Instantáneas (rebobinar y ramificar)
+# -------------------------
+class Snapshot:
+    """
+    Estado completo de una partida en un momento dado: jugador, visitadas,
+    flags, turno y semilla. Es inmutable y comparte estructura con la
+    partida (enteros de bits, memorias persistentes), así que tomarla y
+    restaurarla no depende de lo larga que sea la sesión. El RNG no se copia:
+    cada turno lo vuelve a sembrar (semilla, turno).
+    """
+    __slots__ = ('player', 'visited', 'flags', 'turn', 'running', 'seed')
+
+    def __init__(self, player, visited, flags, turn, running, seed):
+        self.player = player
+        self.visited = visited
+        self.flags = flags
+        self.turn = turn
+        self.running = running
+        self.seed = seed
 
 class Game:
-    def __init__(self):
+    def __init__(self, io=None, seed=None):
+        # io: backend de entrada/salida (TerminalIO por defecto)
+        self.io = io if io is not None else TerminalIO()
         self.player = None
         self.running = True
-        self.visited = set()
-        self.flags = {}
+        self.visited = NameSet(PLACES)
+        self.flags = Flags()
         self.turn = 0
+        # RNG propio de la partida: con la misma semilla y las mismas
+        # respuestas la sesión se repite igual (ver Recording)
+        self.seed = seed if seed is not None else new_seed()
+        self.rng = random.Random()
         # mapa fijo: posiciones y etiquetas (3x3)
         # coordenadas: (x,y) con x 0..2, y 0..2 (y=0 arriba)
-        self.map_positions = {
+        positions = {
             'entrada': (0, 0),
             'pasillo': (1, 0),
             'lab': (2, 0),
@@ -121,7 +2877,7 @@ class Game:
             # 'final' no se representa aparte (final suele ser resultado)
         }
         # etiquetas para mostrar en celdas
-        self.map_labels = {
+        labels = {
             'entrada': "Entrada",
             'pasillo': "Pasillo",
             'lab': "Laboratorio",
@@ -130,440 +2886,648 @@ class Game:
             'sala_com': "SalaCom",
             'nucleo': "Núcleo"
         }
+        self.station = StationMap.from_positions(positions, labels)
+        self.graph = RoomGraph.for_game(self.station)
+        # ventana del minimapa (celdas) centrada en el jugador
+        self.viewport_size = (3, 3)
+        # marcos del mapa ya renderizados (LRU por ubicación y niebla visible)
+        self._map_frames = OrderedDict()
+        self._viewport_rooms = {}  # ubicación -> salas dentro de su ventana
         # archivo de guardado específico (distinto al original)
         self.save_filename = 'savegame_nave_origen.json'
+        self._saves = None
+        # formato de los checkpoints: 'json' o 'binario' (se cargan los dos)
+        self.save_codec = 'json'
+        # otro almacén de guardado con la interfaz de SaveJournal (p. ej. una
+        # ranura de save_store.SaveStore); None = archivo save_filename
+        self.save_backend = None
+        # autoguardado cada N turnos y al cambiar de escena (0 = desactivado);
+        # lo escribe un AutoSaver en segundo plano (compartible entre partidas)
+        self.autosave_every = 0
+        self.autosaver = None
+        # instantáneas de los últimos turnos para rebobinar (0 = desactivado)
+        self.rewind_turns = 0
+        self.history = deque()
+        # catálogo de textos del idioma (TextCatalog); None = el español original
+        self.texts = None
+        # registro de eventos de juego (events.GameEvents) o None
+        self.events = None
 
     # -------------------------
     # Mapa: renderizado fijo grande y detallado
     # -------------------------
-    def show_map(self):
-        """Muestra el mapa fijo y marca la posición actual con 🚀. Aparece arriba de la escena."""
-        # construir una matriz de celdas con etiquetas o vacías
-        width, height = 3, 3
-        # initialize empty grid with blanks
-        grid = [["" for _ in range(width)] for _ in range(height)]
-        # fill with labels for known positions
-        for loc, (x, y) in self.map_positions.items():
-            label = self.map_labels.get(loc, loc)
-            grid[y][x] = label
-
-        # replace the player's location with the rocket symbol
-        player_loc = self.player.location
-        if player_loc in self.map_positions:
-            px, py = self.map_positions[player_loc]
-            grid[py][px] = "🚀 " + (self.map_labels.get(player_loc, player_loc))
-
-        # render the map in a box-like big style
-        print("\n" + BOLD + "MAPA - ESTACIÓN HALCYON" + RESET)
-        print("-" * 40)
-        # We'll print each row with columns separated and padded to same width
+    @property
+    def map_positions(self):
+        """{sala: (x, y)} del mapa actual (compatibilidad; construye un dict)."""
+        return dict(zip(self.station.ids, self.station.coords))
+
+    @map_positions.setter
+    def map_positions(self, positions):
+        self.set_station(StationMap.from_positions(positions, self.map_labels))
+
+    @property
+    def map_labels(self):
+        return dict(zip(self.station.ids, self.station.labels))
+
+    @map_labels.setter
+    def map_labels(self, labels):
+        self.set_station(StationMap.from_positions(self.map_positions, labels))
+
+    def set_station(self, station):
+        """Cambia el mapa de la estación (cargado o generado)."""
+        self.station = station
+        self.graph = RoomGraph.for_game(station)
+        self.invalidate_map()
+
+    def invalidate_map(self):
+        """Descarta los marcos cacheados (llamar si se edita el mapa en sitio o cambia viewport_size)."""
+        self._map_frames.clear()
+        self._viewport_rooms = {}
+
+    def _fog_key(self, player_loc):
+        # qué salas de la ventana están a la vista: O(ventana), no O(salas)
+        if self.player.has_map:
+            return True
+        rooms = self._viewport_rooms.get(player_loc)
+        if rooms is None:
+            x0, y0, x1, y1 = self.station.viewport(player_loc, *self.viewport_size)
+            rooms = self._viewport_rooms[player_loc] = tuple(
+                r for _, _, r in self.station.rooms_in(x0, y0, x1, y1))
+        visited = self.visited
+        return tuple([r in visited for r in rooms])
+
+    def render_map(self, player_loc, fog=None):
+        """
+        Construye el marco del mapa (ventana centrada en player_loc) como un solo
+        string. Sin mapa, las salas no visitadas se ven como '···'.
+        """
+        station = self.station
+        x0, y0, x1, y1 = station.viewport(player_loc, *self.viewport_size)
+        reveal_all = self.player is None or self.player.has_map
+        visited = self.visited
         col_width = 12
-        for y in range(height):
-            # first line: top borders for cells
-            # content line
-            row_cells = []
-            for x in range(width):
-                content = grid[y][x]
-                if content == "":
-                    row_cells.append(" " * col_width)
+        rule = "-" * ((col_width + 3) * (x1 - x0) + 1)
+        lines = ["\n" + BOLD + self.text("MAPA - ESTACIÓN HALCYON") + RESET, rule]
+        for y in range(y0, y1):
+            cells = []
+            for x in range(x0, x1):
+                room = station.room_at(x, y)
+                if room is None:
+                    cell = ""
+                elif room == player_loc:
+                    # la ubicación del jugador lleva el cohete
+                    cell = "🚀 " + self.room_label(room)
+                elif reveal_all or room in visited:
+                    cell = self.room_label(room)
                 else:
-                    # center the text in the cell
-                    content_str = content
-                    if len(content_str) > col_width:
-                        content_str = content_str[:col_width]
-                    pad_left = max((col_width - len(content_str)) // 2, 0)
-                    pad_right = col_width - len(content_str) - pad_left
-                    row_cells.append(" " * pad_left + content_str + " " * pad_right)
-            # join cells with vertical separators
-            print("| " + " | ".join(row_cells) + " |")
-            print("-" * 40)
-        print("Leyenda: 🚀 = tu posición\n")
+                    cell = "···"
+                # celdas centradas por ancho visible (el cohete ocupa 2 columnas)
+                cells.append(fit_width(cell, col_width))
+            lines.append("| " + " | ".join(cells) + " |")
+            lines.append(rule)
+        lines.append(self.text("Leyenda: 🚀 = tu posición\n\n"))
+        return "\n".join(lines)
+
+    def show_map(self):
+        """Muestra el mapa y marca la posición actual con 🚀. Aparece arriba de la escena."""
+        loc = self.player.location
+        key = (loc, self._fog_key(loc))
+        frames = self._map_frames
+        frame = frames.get(key)
+        if frame is None:
+            frame = frames[key] = self.render_map(loc)
+            if len(frames) > 512:
+                frames.popitem(last=False)
+        else:
+            frames.move_to_end(key)
+        self.io.map_frame(frame)
+
+    def travel(self, target):
+        """
+        Mueve al jugador a `target` por el camino más corto que permiten las
+        puertas abiertas, en un solo paso. Devuelve el camino o None.
+        """
+        self.graph.sync(self.flags)
+        path = self.graph.path(self.player.location, target)
+        if path is None:
+            return None
+        self.visited.update(path[:-1])
+        self.player.location = target
+        return path
+
+    def fast_travel(self):
+        """Menú 'ir a <sala>': salas conocidas y alcanzables, de la más cercana a la más lejana."""
+        self.graph.sync(self.flags)
+        here = self.player.location
+        known = [(r, d) for r, d in self.graph.reachable(here)
+                 if r in self.visited or self.player.has_map]
+        if not known:
+            self.io.slowprint(YELLOW + self.text("No conoces ninguna ruta desde aquí.") + RESET)
+            return
+        shown = known[:12]
+        lines = [self.text("{i}) {sala} ({d} salas)", i=i, sala=self.room_label(r), d=d)
+                 for i, (r, d) in enumerate(shown, start=1)]
+        lines.append(self.text("{i}) Cancelar", i=len(shown) + 1))
+        self.io.menu(self.text("\n¿A dónde vas? (número o nombre de la sala)"), lines)
+        choices = [str(i) for i in range(1, len(lines) + 1)] + [r for r, _ in known]
+        c = yield Choice(self.text("Elige 1-{n}:", n=len(lines)), choices)
+        if c.isdigit():
+            idx = int(c) - 1
+            if not 0 <= idx < len(shown):
+                return
+            target = shown[idx][0]
+        else:
+            target = c
+        path = self.travel(target)
+        if path:
+            labels = " -> ".join(self.room_label(r) for r in path)
+            self.io.slowprint(GREEN + self.text("Recorres la estación: {camino}.", camino=labels) + RESET)
+
+    def generic_room(self):
+        """Escena para salas del mapa sin escena propia (estaciones cargadas o generadas)."""
+        loc = self.player.location
+        self.io.cls()
+        self.show_map()
+        self.io.slowprint(BOLD + self.room_label(loc) + RESET)
+        if loc not in self.visited:
+            self.io.slowprint(self.text("Un módulo silencioso de la estación. Paneles apagados y conductos que crujen."))
+            self.visited.add(loc)
+        exits = self.station.neighbors(loc)
+        lines = [self.text("{i}) Ir al {d}: {sala}", i=i, d=self.text(d), sala=self.room_label(r))
+                 for i, (d, r) in enumerate(exits, start=1)]
+        lines.append(self.text("{i}) Ver estado / inventario", i=len(exits) + 1))
+        if self.player.has_map:
+            lines.append(self.text("{i}) Viaje rápido (ir a otra sala)", i=len(exits) + 2))
+        self.io.menu(self.text("\nSalidas:"), lines)
+        n = len(lines)
+        prompt = self.text("Elige 1 o 2:") if n == 2 else self.text("Elige 1-{n}:", n=n)
+        c = yield Choice(prompt, [str(i) for i in range(1, n + 1)])
+        idx = int(c) - 1
+        if 0 <= idx < len(exits):
+            self.player.location = exits[idx][1]
+        elif idx == len(exits):
+            yield from self.show_status()
+        elif idx == len(exits) + 1 and self.player.has_map:
+            yield from self.fast_travel()
+
+    def text(self, source, **fields):
+        """
+        Texto en el idioma de la partida. `source` es el original en español
+        (y su ID en el catálogo); `fields` rellena sus {huecos}.
+        """
+        if self.texts is not None:
+            source = self.texts.get(text_id(source), source)
+        return source.format(**fields) if fields else source
+
+    def room_label(self, room):
+        """Nombre de una sala para mostrar (traducido si el catálogo lo tiene)."""
+        return self.text(self.station.label(room))
 
     # -------------------------
     # Inicio, guardado y carga
     # -------------------------
     def start(self):
-        cls()
-        slowprint(BOLD + "ECOS DE HALCYON" + RESET, 0.02)
-        slowprint("Un juego de terminal: explora, decide, sobrevive.", 0.01)
-        slowprint("")
-        slowprint("¿Quieres cargar la partida anterior o empezar nueva?", 0.01)
-        print("1) Empezar partida nueva")
-        print("2) Cargar partida (si existe)")
-        choice = input_choice("Elige 1 o 2:", ["1", "2"])
+        self.play(self.begin())
+        self.main_loop()
+
+    def play(self, scene):
+        """Ejecuta una escena de la partida contestando con self.io (ver run_scene)."""
+        return run_scene(scene, self.io)
+
+    def begin(self):
+        """Pantalla de título: cargar la partida guardada o empezar una nueva."""
+        self.io.cls()
+        self.io.slowprint(BOLD + self.text("ECOS DE HALCYON") + RESET, 0.02)
+        self.io.slowprint(self.text("Un juego de terminal: explora, decide, sobrevive."), 0.01)
+        self.io.slowprint("")
+        self.io.slowprint(self.text("¿Quieres cargar la partida anterior o empezar nueva?"), 0.01)
+        self.io.print(self.text("1) Empezar partida nueva"))
+        self.io.print(self.text("2) Cargar partida (si existe)"))
+        choice = yield Choice(self.text("Elige 1 o 2:"), ["1", "2"])
         if choice == "2":
-            if self.load_game():
-                slowprint(GREEN + "Partida cargada." + RESET)
-                time.sleep(1)
-                self.main_loop()
+            if (yield from self.load_game()):
+                self.io.slowprint(GREEN + self.text("Partida cargada.") + RESET)
+                self.io.sleep(1)
                 return
             else:
-                slowprint(YELLOW + "No se encontró partida. Iniciando nueva..." + RESET)
-        self.new_game()
-        self.main_loop()
+                self.io.slowprint(YELLOW + self.text("No se encontró partida. Iniciando nueva...") + RESET)
+        yield from self.new_game()
 
     def new_game(self):
-        cls()
-        slowprint("Introduce tu nombre:", 0.01, newline=False)
-        name = input(" ")
+        self.io.cls()
+        self.io.slowprint(self.text("Introduce tu nombre:"), 0.01, newline=False)
+        name = yield Input(" ")
         if not name.strip():
             name = "Ava"
         self.player = Player(name=name)
-        slowprint("")
-        slowprint(f"Bienvenido, {BOLD}{self.player.name}{RESET}.", 0.01)
-        slowprint("Año 2147. La estación orbital Halcyon se apagó hace meses. Tú eres el/la único/a sobreviviente del equipo de reconocimiento que ha despertado dentro de la estación.")
-        slowprint("Tu objetivo: recuperar tus recuerdos fragmentados y descubrir qué pasó en Halcyon. Pero no será fácil.")
-        slowprint("\nTe recomendamos leer las descripciones con atención. Las decisiones importan.\n")
-        input("Pulsa Enter para continuar...")
-        cls()
+        if self.player.location not in self.station and len(self.station):
+            self.player.location = self.station.ids[0]
+        self.io.slowprint("")
+        self.io.slowprint(self.text("Bienvenido, {nombre}.", nombre=BOLD + self.player.name + RESET), 0.01)
+        self.io.slowprint(self.text("Año 2147. La estación orbital Halcyon se apagó hace meses. Tú eres el/la único/a sobreviviente del equipo de reconocimiento que ha despertado dentro de la estación."))
+        self.io.slowprint(self.text("Tu objetivo: recuperar tus recuerdos fragmentados y descubrir qué pasó en Halcyon. Pero no será fácil."))
+        self.io.slowprint(self.text("\nTe recomendamos leer las descripciones con atención. Las decisiones importan.\n"))
+        yield Input(self.text("Pulsa Enter para continuar..."))
+        self.io.cls()
         # inicio con un item básico
         self.player.inventory.append("multiherramienta")
         self.flags['prologo_done'] = False
         self.flags['core_locked'] = True
         self.flags['seen_ai_message'] = False
 
-    def save_game(self):
-        data = {
+    def save_state(self):
+        """Estado completo de la partida como dict serializable."""
+        return {
             'player': {
                 'name': self.player.name,
                 'max_hp': self.player.max_hp,
                 'hp': self.player.hp,
                 'attack': self.player.attack,
                 'defense': self.player.defense,
-                'inventory': self.player.inventory,
+                'inventory': self.player.inventory.to_list(),
                 'credits': self.player.credits,
-                'memories': self.player.memories,
+                'memories': self.player.memories.to_list(),
                 'location': self.player.location,
                 'has_map': self.player.has_map,
                 'reputation': self.player.reputation
             },
-            'visited': list(self.visited),
-            'flags': self.flags,
+            'visited': sorted(self.visited),
+            'flags': self.flags.to_dict(),
             'turn': self.turn
         }
+
+    def apply_state(self, data):
+        """Restaura la partida desde un dict de save_state."""
+        p = data['player']
+        self.player = Player(name=p.get('name', "Ava"))
+        self.player.max_hp = p.get('max_hp', 30)
+        self.player.hp = p.get('hp', 30)
+        self.player.attack = p.get('attack', 6)
+        self.player.defense = p.get('defense', 2)
+        self.player.inventory = list(p.get('inventory', []))
+        self.player.credits = p.get('credits', 0)
+        self.player.memories = p.get('memories', [])
+        self.player.location = p.get('location', 'entrada')
+        self.player.has_map = p.get('has_map', False)
+        self.player.reputation = p.get('reputation', 0)
+        self.visited = NameSet(PLACES, data.get('visited', []))
+        self.flags = Flags(data.get('flags', {}))
+        self.turn = data.get('turn', 0)
+        self.reseed()
+
+    def snapshot(self):
+        """Instantánea O(1) del estado (ver Snapshot)."""
+        return Snapshot(self.player.copy() if self.player else None, self.visited.bits,
+                        self.flags.copy(), self.turn, self.running, self.seed)
+
+    def restore(self, snap):
+        """Vuelve al estado de una instantánea (que sigue siendo reutilizable)."""
+        self.player = snap.player.copy() if snap.player else None
+        self.visited = NameSet(PLACES)
+        self.visited.bits = snap.visited
+        self.flags = snap.flags.copy()
+        self.turn = snap.turn
+        self.running = snap.running
+        self.seed = snap.seed
+        self.reseed()
+
+    def fork(self, io=None, snap=None):
+        """
+        Otra partida que sigue desde el estado actual (o desde `snap`) sin
+        repetir nada desde new_game. Comparte el mapa y sus cachés, pero no
+        el guardado ni el historial.
+        """
+        other = copy.copy(self)
+        other.io = io if io is not None else NullIO()
+        other._saves = None
+        other.save_backend = None
+        other.autosaver = None
+        other.autosave_every = 0
+        other.history = deque()
+        other.events = None
+        other.rng = random.Random()
+        other.restore(snap if snap is not None else self.snapshot())
+        return other
+
+    def rewind(self, turns=1):
+        """Vuelve al principio de hace `turns` turnos. Devuelve False si no hay tantos."""
+        if turns < 1 or turns > len(self.history):
+            return False
+        for _ in range(turns - 1):
+            self.history.pop()
+        self.restore(self.history.pop())
+        return True
+
+    STATE_HEAD = struct.Struct('<5hiIB')
+
+    def state_hash(self):
+        """
+        Hash de 64 bits del estado (jugador, visitadas, flags, turno). Es
+        estable entre procesos y ejecuciones: no usa hash() de Python.
+        """
+        p = self.player
+        data = b'\0'.join((self.STATE_HEAD.pack(p.max_hp, p.hp, p.attack, p.defense, p.reputation,
+                                                p.credits, self.turn, p.has_map),
+                           p.inventory.key(), self.flags.key(), self.visited.key(),
+                           '\0'.join((p.name, p.location, '\1'.join(p.memories.items))).encode('utf-8')))
+        return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
+    @property
+    def saves(self):
+        """Diario de guardado del archivo actual (se rehace si cambia save_filename)."""
+        if self.save_backend is not None:
+            return self.save_backend
+        if (self._saves is None or self._saves.filename != self.save_filename
+                or self._saves.codec.name != self.save_codec):
+            if self._saves is not None:
+                self._saves.close()
+            self._saves = SaveJournal(self.save_filename, self.save_codec)
+        return self._saves
+
+    def autosave(self, previous_location=None):
+        """Tras un turno: entrega una instantánea al autoguardado si toca."""
+        if not self.autosave_every or not self.running or not self.player or not self.player.is_alive():
+            return
+        if self.player.location != previous_location or self.turn % self.autosave_every == 0:
+            if self.autosaver is None:
+                self.autosaver = AutoSaver()
+            self.autosaver.submit(self.saves, self.save_state())
+
+    def flush_saves(self):
+        """Espera a que el autoguardado termine de escribir esta partida."""
+        if self.autosaver is not None:
+            self.autosaver.flush(self.saves)
+
+    def close_saves(self):
+        """
+        Espera al autoguardado y cierra el diario de la partida (al terminar o
+        desconectar). Se cierra aunque el autoguardado haya fallado; el error
+        se lanza después.
+        """
+        try:
+            self.flush_saves()
+        finally:
+            if self._saves is not None:
+                self._saves.close()
+            if self.save_backend is not None:
+                self.save_backend.close()
+
+    def write_save(self, state):
+        """Guarda `state` ya, después de lo que tuviera pendiente el autoguardado."""
+        self.flush_saves()
+        self.saves.save(state)
+
+    def read_save(self):
+        """El estado guardado (o None), contando con lo que tuviera pendiente el autoguardado."""
+        self.flush_saves()
+        return self.saves.load()
+
+    def remove_save(self):
+        """Borra la partida guardada (y antes deja acabar al autoguardado)."""
+        self.flush_saves()
+        self.saves.delete()
+
+    def save_game(self):
         try:
-            with open(self.save_filename, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            slowprint(GREEN + f"Partida guardada en {self.save_filename}." + RESET)
+            yield DiskWork(self.write_save, self.save_state())
+            self.io.slowprint(GREEN + self.text("Partida guardada en {archivo}.", archivo=self.saves.name) + RESET)
         except Exception as e:
-            slowprint(RED + "Error al guardar la partida." + RESET)
+            self.io.slowprint(RED + self.text("Error al guardar la partida.") + RESET)
 
     def load_game(self):
         try:
-            if not os.path.exists(self.save_filename):
+            data = yield DiskWork(self.read_save)
+            if data is None:
                 return False
-            with open(self.save_filename, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            p = data['player']
-            self.player = Player(name=p.get('name', "Ava"))
-            self.player.max_hp = p.get('max_hp', 30)
-            self.player.hp = p.get('hp', 30)
-            self.player.attack = p.get('attack', 6)
-            self.player.defense = p.get('defense', 2)
-            self.player.inventory = p.get('inventory', [])
-            self.player.credits = p.get('credits', 0)
-            self.player.memories = p.get('memories', [])
-            self.player.location = p.get('location', 'entrada')
-            self.player.has_map = p.get('has_map', False)
-            self.player.reputation = p.get('reputation', 0)
-            self.visited = set(data.get('visited', []))
-            self.flags = data.get('flags', {})
-            self.turn = data.get('turn', 0)
+            self.apply_state(data)
             return True
         except Exception as e:
             return False
 
+    def delete_save(self):
+        try:
+            yield DiskWork(self.remove_save)
+        except OSError:
+            pass
+
     def main_loop(self):
         # bucle principal del juego
-        while self.running and self.player and self.player.is_alive():
-            self.turn += 1
-            loc = self.player.location
-            if loc == "entrada":
-                self.scene_entrada()
-            elif loc == "pasillo":
-                self.scene_pasillo()
-            elif loc == "lab":
-                self.scene_lab()
-            elif loc == "almacen":
-                self.scene_almacen()
-            elif loc == "hab_mod":
-                self.scene_hab_mod()
-            elif loc == "nucleo":
-                self.scene_nucleo()
-            elif loc == "sala_com":
-                self.scene_sala_com()
-            elif loc == "final":
-                self.scene_final()
-            else:
-                slowprint("Te encuentras en la oscuridad... (ubicación desconocida)")
-                self.player.location = "entrada"
-        if not self.player.is_alive():
-            slowprint(RED + "\nHas muerto... La estación se queda en silencio." + RESET)
-            slowprint("FIN DE LA PARTIDA.")
-            if os.path.exists(self.save_filename):
-                slowprint("Puedes volver a intentarlo cargando la partida guardada si existe.")
+        try:
+            while self.running and self.player and self.player.is_alive():
+                location = self.player.location
+                if self.rewind_turns:
+                    self.history.append(self.snapshot())
+                    if len(self.history) > self.rewind_turns:
+                        self.history.popleft()
+                self.play(self.step())
+                self.autosave(location)
+        finally:
+            self.flush_saves()
+        self.play(self.game_over())
+
+    @property
+    def rng(self):
+        """
+        RNG de la partida. (semilla, turno) decide las tiradas de cada turno:
+        se siembra la primera vez que se usa en el turno, así que los turnos
+        sin azar no pagan nada y restaurar una instantánea no copia su estado.
+        """
+        if self._rng_turn != self.turn:
+            self._rng.seed(self.seed << 32 | self.turn)
+            self._rng_turn = self.turn
+        return self._rng
+
+    @rng.setter
+    def rng(self, rng):
+        self._rng = rng
+        self._rng_turn = None
+
+    def reseed(self):
+        """El próximo uso del RNG lo vuelve a sembrar para el turno actual."""
+        self._rng_turn = None
+
+    def step(self):
+        """Un turno (escena): la escena compilada de la ubicación actual."""
+        self.turn += 1
+        idx = SCENE_INDEX.get(self.player.location)
+        if idx is None:
+            if self.player.location in self.station:
+                yield from self.generic_room()
+                return
+            self.io.slowprint(self.text("Te encuentras en la oscuridad... (ubicación desconocida)"))
+            self.player.location = "entrada"
+            return
+        yield from SCENE_TABLE[idx].run(self)
+
+    def game_over(self):
+        try:
+            yield DiskWork(self.close_saves)
+        except Exception:
+            self.io.slowprint(RED + self.text("No se pudo escribir el último autoguardado.") + RESET)
+        if self.player and not self.player.is_alive():
+            self.io.slowprint(RED + self.text("\nHas muerto... La estación se queda en silencio.") + RESET)
+            self.io.slowprint(self.text("FIN DE LA PARTIDA."))
+            if (yield DiskWork(self.saves.exists)):
+                self.io.slowprint(self.text("Puedes volver a intentarlo cargando la partida guardada si existe."))
         self.running = False
 
     # -------------------------
     # Escenas
     # -------------------------
-    def scene_entrada(self):
-        cls()
-        # mostrar mapa fijo encima de la escena
-        self.show_map()
-        if 'entrada' not in self.visited:
-            slowprint(BOLD + "Vestíbulo principal - Halcyon" + RESET, 0.02)
-            slowprint("La luz de emergencia vibra en tonos rojos. El aire huele a metal y ozono. Frente a ti, una puerta corrediza parcialmente bloqueada y un panel de la pared con acceso.")
-            self.visited.add('entrada')
-        else:
-            slowprint(BOLD + "Vestíbulo principal" + RESET)
-        print("\nQué quieres hacer?")
-        print("1) Investigar el panel de acceso.")
-        print("2) Forzar la puerta bloqueada.")
-        print("3) Salir al pasillo hacia la izquierda.")
-        print("4) Guardar / Cargar partida")
-        print("5) Ver estado / inventario")
-        choice = input_choice("Elige 1-5:", ["1","2","3","4","5"])
-        if choice == "1":
-            self.panel_acceso()
-        elif choice == "2":
-            self.forzar_puerta()
-        elif choice == "3":
-            self.player.location = "pasillo"
-        elif choice == "4":
-            self.menu_save_load()
-        elif choice == "5":
-            self.show_status()
-
     def panel_acceso(self):
-        cls()
+        self.io.cls()
         self.show_map()
-        slowprint("Te acercas al panel. Una pantalla parpadea: 'HALCYON - SECURE NODE'. Hay un lector biométrico y un teclado.")
+        self.io.slowprint(self.text("Te acercas al panel. Una pantalla parpadea: 'HALCYON - SECURE NODE'. Hay un lector biométrico y un teclado."))
         if 'panel_hacked' in self.flags:
-            slowprint("El panel ya está desbloqueado. Puedes abrir la compuerta principal si quieres.")
-            print("1) Abrir compuerta principal")
-            print("2) Volver")
-            c = input_choice("Elige 1 o 2:", ["1","2"])
+            self.io.slowprint(self.text("El panel ya está desbloqueado. Puedes abrir la compuerta principal si quieres."))
+            self.io.print(self.text("1) Abrir compuerta principal"))
+            self.io.print(self.text("2) Volver"))
+            c = yield Choice(self.text("Elige 1 o 2:"), ["1","2"])
             if c == "1":
-                slowprint("La compuerta se abre con un chirrido. Un pasaje a la sala de comunicaciones se revela.")
+                self.io.slowprint(self.text("La compuerta se abre con un chirrido. Un pasaje a la sala de comunicaciones se revela."))
                 self.flags['panel_open'] = True
                 self.player.location = "sala_com"
                 return
             else:
                 return
-        slowprint("¿Quieres intentar hackear el teclado, usar fuerza o buscar pistas?")
-        print("1) Hackear (mini-juego de código)")
-        print("2) Usar fuerza (multiherramienta)")
-        print("3) Buscar pistas alrededor")
-        print("4) Volver")
-        c = input_choice("Elige 1-4:", ["1","2","3","4"])
+        self.io.slowprint(self.text("¿Quieres intentar hackear el teclado, usar fuerza o buscar pistas?"))
+        self.io.print(self.text("1) Hackear (mini-juego de código)"))
+        self.io.print(self.text("2) Usar fuerza (multiherramienta)"))
+        self.io.print(self.text("3) Buscar pistas alrededor"))
+        self.io.print(self.text("4) Volver"))
+        c = yield Choice(self.text("Elige 1-4:"), ["1","2","3","4"])
         if c == "1":
-            self.hack_minijuego()
+            yield from self.hack_minijuego()
         elif c == "2":
             if "multiherramienta" in self.player.inventory:
-                slowprint("Intentas forzar el panel con la multiherramienta...")
-                if random.random() < 0.5:
-                    slowprint(GREEN + "Éxito parcial: desbloqueas acceso limitado." + RESET)
+                self.io.slowprint(self.text("Intentas forzar el panel con la multiherramienta..."))
+                if self.rng.random() < 0.5:
+                    self.io.slowprint(GREEN + self.text("Éxito parcial: desbloqueas acceso limitado.") + RESET)
                     self.flags['panel_hacked'] = True
                     self.player.reputation += 1
                 else:
-                    slowprint(RED + "Fallaste y activaste una alarma silenciosa. Algo se ha activado en los conductos..." + RESET)
-                    self.random_encounter()
+                    self.io.slowprint(RED + self.text("Fallaste y activaste una alarma silenciosa. Algo se ha activado en los conductos...") + RESET)
+                    yield from self.random_encounter(origin='panel_acceso')
             else:
-                slowprint(YELLOW + "No tienes la herramienta adecuada." + RESET)
+                self.io.slowprint(YELLOW + self.text("No tienes la herramienta adecuada.") + RESET)
         elif c == "3":
-            slowprint("Encuentras una ficha de acceso rayada y una nota: 'No confíes en el núcleo'.")
+            self.io.slowprint(self.text("Encuentras una ficha de acceso rayada y una nota: 'No confíes en el núcleo'."))
             self.player.memories.append("nota_no_confiar_nucleo")
             self.flags['found_note'] = True
         else:
             return
 
     def hack_minijuego(self):
-        cls()
+        self.io.cls()
         self.show_map()
-        slowprint("MINIJUEGO: Adivina la secuencia de 3 dígitos (0-9). Tienes 5 intentos.")
-        secret = "".join(str(random.randint(0,9)) for _ in range(3))
+        self.io.slowprint(self.text("MINIJUEGO: Adivina la secuencia de 3 dígitos (0-9). Tienes 5 intentos."))
+        secret = "".join(str(self.rng.randint(0,9)) for _ in range(3))
         attempts = 5
         while attempts > 0:
-            guess = input("Introduce 3 dígitos: ").strip()
+            guess = (yield Input(self.text("Introduce 3 dígitos: "))).strip()
             if len(guess) != 3 or not guess.isdigit():
-                print(YELLOW + "Formato inválido. Debes introducir 3 dígitos." + RESET)
+                self.io.print(YELLOW + self.text("Formato inválido. Debes introducir 3 dígitos.") + RESET)
                 continue
             if guess == secret:
-                slowprint(GREEN + "Hackeo exitoso. Acceso concedido." + RESET)
+                self.io.slowprint(GREEN + self.text("Hackeo exitoso. Acceso concedido.") + RESET)
                 self.flags['panel_hacked'] = True
                 self.player.has_map = True
                 self.player.reputation += 1
                 return
             # dar pista: cuántos dígitos correctos en lugar correcto
             correct_pos = sum(1 for a,b in zip(guess, secret) if a==b)
-            print(f"Pistas: {correct_pos} dígito(s) en la posición correcta.")
+            self.io.print(self.text("Pistas: {n} dígito(s) en la posición correcta.", n=correct_pos))
             attempts -= 1
-        slowprint(RED + "Has agotado los intentos. El teclado se bloquea y una luz roja se enciende." + RESET)
-        self.random_encounter()
+        self.io.slowprint(RED + self.text("Has agotado los intentos. El teclado se bloquea y una luz roja se enciende.") + RESET)
+        yield from self.random_encounter(origin='hack_minijuego')
 
     def forzar_puerta(self):
-        cls()
+        self.io.cls()
         self.show_map()
-        slowprint("Intentas empujar la puerta. Está pesada y algo atascada.")
+        self.io.slowprint(self.text("Intentas empujar la puerta. Está pesada y algo atascada."))
         success_chance = 0.3 + (0.05 * len(self.player.inventory))
-        if random.random() < success_chance:
-            slowprint(GREEN + "Con un empujón, la puerta cede. Entras a un almacén lateral." + RESET)
+        if self.rng.random() < success_chance:
+            self.io.slowprint(GREEN + self.text("Con un empujón, la puerta cede. Entras a un almacén lateral.") + RESET)
+            self.flags['puerta_forzada'] = True
             self.player.location = "almacen"
         else:
-            slowprint(YELLOW + "No puedes abrirla. Algo dentro vibra con ruido metálico...") 
-            if random.random() < 0.4:
-                slowprint(RED + "Se escucha un zumbido que se acerca: un dron patrulla aparece." + RESET)
-                self.encounter_enemy(Enemy("Dron hostil", 12, 5, defense=1, desc="Un dron pequeño con sensores parpadeantes."))
+            self.io.slowprint(YELLOW + self.text("No puedes abrirla. Algo dentro vibra con ruido metálico...")) 
+            if self.rng.random() < 0.4:
+                self.io.slowprint(RED + self.text("Se escucha un zumbido que se acerca: un dron patrulla aparece.") + RESET)
+                yield from self.encounter_enemy(ENEMIES.spawn('dron_puerta'), origin='forzar_puerta')
 
     def menu_save_load(self):
-        cls()
+        self.io.cls()
         self.show_map()
-        print("1) Guardar partida")
-        print("2) Cargar partida")
-        print("3) Volver")
-        c = input_choice("Elige 1-3:", ["1","2","3"])
-        if c == "1":
-            self.save_game()
-            input("Enter para continuar...")
+        self.io.print(self.text("1) Guardar partida"))
+        self.io.print(self.text("2) Cargar partida"))
+        self.io.print(self.text("3) Volver"))
+        choices = ["1","2","3"]
+        if self.history:
+            self.io.print(self.text("4) Rebobinar (hasta {n} turnos)", n=len(self.history)))
+            choices.append("4")
+        c = yield Choice(self.text("Elige 1-{n}:", n=len(choices)), choices)
+        if c == "4":
+            n = yield Choice(self.text("¿Cuántos turnos? (1-{n}):", n=len(self.history)),
+                             [str(i) for i in range(1, len(self.history) + 1)])
+            self.rewind(int(n))
+            self.io.slowprint(CYAN + self.text("El tiempo se pliega. Vuelves a un momento anterior.") + RESET)
+            yield Input(self.text("Enter para continuar..."))
+        elif c == "1":
+            yield from self.save_game()
+            yield Input(self.text("Enter para continuar..."))
         elif c == "2":
-            if self.load_game():
-                slowprint(GREEN + "Partida cargada." + RESET)
+            if (yield from self.load_game()):
+                self.io.slowprint(GREEN + self.text("Partida cargada.") + RESET)
             else:
-                slowprint(YELLOW + "No hay partida para cargar." + RESET)
-            input("Enter para continuar...")
+                self.io.slowprint(YELLOW + self.text("No hay partida para cargar.") + RESET)
+            yield Input(self.text("Enter para continuar..."))
         else:
             return
 
     def show_status(self):
-        cls()
+        self.io.cls()
         self.show_map()
         p = self.player
-        slowprint(f"{BOLD}{p.name}{RESET} - HP: {p.hp}/{p.max_hp}  Ataque: {p.attack}  Defensa: {p.defense}")
-        slowprint(f"Inventario: {', '.join(p.inventory) if p.inventory else 'vacío'}")
-        slowprint(f"Memorias recuperadas: {len(p.memories)}")
-        slowprint(f"Reputación: {p.reputation}")
-        input("Enter para volver...")
-
-    def scene_pasillo(self):
-        cls()
-        self.show_map()
-        if 'pasillo' not in self.visited:
-            slowprint("Pasillo principal. Hay puertas a laboratorio (derecha) y módulo de habitáculos (izquierda). Un letrero indica: 'Nivel -2: Núcleo'.")
-            self.visited.add('pasillo')
-        else:
-            slowprint("Pasillo principal.")
-        print("\nOpciones:")
-        print("1) Ir al laboratorio")
-        print("2) Ir a los habitáculos")
-        print("3) Seguir hasta un panel con mapa (puede requerir desbloqueo)")
-        print("4) Volver al vestíbulo")
-        c = input_choice("Elige 1-4:", ["1","2","3","4"])
-        if c == "1":
-            self.player.location = "lab"
-        elif c == "2":
-            self.player.location = "hab_mod"
-        elif c == "3":
-            if self.flags.get('panel_hacked') or "mapa" in self.player.inventory:
-                slowprint("El panel muestra un mapa parcial: Núcleo abajo, Sala de Comunicaciones a la izquierda, Almacén a la derecha.")
-                self.player.has_map = True
-                input("Enter...")
-            else:
-                slowprint("El panel está protegido. Quizá puedas desbloquearlo en el vestíbulo.")
-                input("Enter...")
-        else:
-            self.player.location = "entrada"
-
-    def scene_lab(self):
-        cls()
-        self.show_map()
-        if 'lab' not in self.visited:
-            slowprint("Laboratorio de investigación. Estaciones de trabajo, contenedores y una vitrina con un implante cerebral antiguo.")
-            self.visited.add('lab')
-        else:
-            slowprint("Laboratorio.")
-        print("\nQué haces?")
-        print("1) Abrir la vitrina (posible recompensa/alarma)")
-        print("2) Revisar terminales")
-        print("3) Volver al pasillo")
-        c = input_choice("Elige 1-3:", ["1","2","3"])
-        if c == "1":
-            if "implante" in self.player.inventory:
-                slowprint("La vitrina está vacía. Ya cogiste el implante.")
-            else:
-                if random.random() < 0.6:
-                    slowprint(GREEN + "Te haces con el implante neural. Recuperas una memoria fragmentada." + RESET)
-                    self.player.inventory.append("implante")
-                    self.player.memories.append("memoria_parcial_1")
-                    self.player.credits += 10
-                else:
-                    slowprint(RED + "La vitrina estaba trampa: toxinas liberadas. Pierdes salud." + RESET)
-                    dmg = 6
-                    self.player.take_damage(dmg)
-            input("Enter...")
-        elif c == "2":
-            slowprint("La terminal muestra registros: 'Incidente: Aislamiento del Núcleo. Señales AI corruptas.' Hay un mensaje marcado como urgente.")
-            print("1) Leer mensaje urgente")
-            print("2) Ignorar")
-            d = input_choice("Elige 1 o 2:", ["1","2"])
-            if d == "1":
-                self.read_urgent_message()
-            else:
-                slowprint("Ignoras el mensaje por ahora.")
-                input("Enter...")
-        else:
-            self.player.location = "pasillo"
+        self.io.slowprint(BOLD + p.name + RESET + self.text(" - HP: {hp}/{max_hp}  Ataque: {ataque}  Defensa: {defensa}",
+                                                        hp=p.hp, max_hp=p.max_hp, ataque=p.attack, defensa=p.defense))
+        self.io.slowprint(self.text("Inventario: {objetos}", objetos=', '.join(p.inventory) if p.inventory else self.text("vacío")))
+        self.io.slowprint(self.text("Memorias recuperadas: {n}", n=len(p.memories)))
+        self.io.slowprint(self.text("Reputación: {n}", n=p.reputation))
+        yield Input(self.text("Enter para volver..."))
 
     def read_urgent_message(self):
-        cls()
+        self.io.cls()
         self.show_map()
-        slowprint(BOLD + "Mensaje urgente (extracto):" + RESET)
-        slowprint("'...El Núcleo muestra patrones de autocorrección. No permita que Halcyon vuelva a emitir la Señal. Firmware: H2-Ï7.'")
-        slowprint("El mensaje termina con la firma: Dr. L. Kessler.")
+        self.io.slowprint(BOLD + self.text("Mensaje urgente (extracto):") + RESET)
+        self.io.slowprint(self.text("'...El Núcleo muestra patrones de autocorrección. No permita que Halcyon vuelva a emitir la Señal. Firmware: H2-Ï7.'"))
+        self.io.slowprint(self.text("El mensaje termina con la firma: Dr. L. Kessler."))
         self.player.memories.append("registro_kessler")
         self.flags['seen_ai_message'] = True
-        input("Enter...")
+        yield Input(self.text("Enter..."))
 
-    def scene_almacen(self):
-        cls()
-        self.show_map()
-        if 'almacen' not in self.visited:
-            slowprint("Almacén. Cajas volcaron al suelo. A un lado hay una caja fuerte con un panel numérico.")
-            self.visited.add('almacen')
-        else:
-            slowprint("Almacén.")
-        print("\nOpciones:")
-        print("1) Buscar en cajas")
-        print("2) Intentar abrir la caja fuerte")
-        print("3) Volver al vestíbulo")
-        c = input_choice("Elige 1-3:", ["1","2","3"])
-        if c == "1":
-            if random.random() < 0.7:
-                item = random.choice(["kit_medico", "municion", "antiviral", "mapa"])
-                slowprint(GREEN + f"Encuentras: {item}." + RESET)
-                self.player.inventory.append(item)
-                if item == "mapa":
-                    self.player.has_map = True
-                if item == "kit_medico":
-                    self.player.credits += 5
-            else:
-                slowprint(YELLOW + "No hay nada útil, sólo restos y polvo." + RESET)
-            input("Enter...")
-        elif c == "2":
-            self.safe_minigame()
+    def buscar_cajas(self):
+        if self.rng.random() < 0.7:
+            item = self.rng.choice(["kit_medico", "municion", "antiviral", "mapa"])
+            self.io.slowprint(GREEN + self.text("Encuentras: {objeto}.", objeto=item) + RESET)
+            self.player.inventory.append(item)
+            if item == "mapa":
+                self.player.has_map = True
+            if item == "kit_medico":
+                self.player.credits += 5
         else:
-            self.player.location = "entrada"
+            self.io.slowprint(YELLOW + self.text("No hay nada útil, sólo restos y polvo.") + RESET)
 
     def safe_minigame(self):
-        cls()
+        self.io.cls()
         self.show_map()
-        slowprint("Caja fuerte: debes introducir un número entre 000 y 999. Tienes 4 intentos.")
-        code = str(random.randint(0,999)).zfill(3)
+        self.io.slowprint(self.text("Caja fuerte: debes introducir un número entre 000 y 999. Tienes 4 intentos."))
+        code = str(self.rng.randint(0,999)).zfill(3)
         attempts = 4
         while attempts > 0:
-            guess = input(f"Intento ({attempts}): ").strip().zfill(3)
+            guess = (yield Input(self.text("Intento ({n}): ", n=attempts))).strip().zfill(3)
             if guess == code:
-                slowprint(GREEN + "Caja abierta: dentro hay 25 créditos y un módulo de memoria." + RESET)
+                self.io.slowprint(GREEN + self.text("Caja abierta: dentro hay 25 créditos y un módulo de memoria.") + RESET)
                 self.player.credits += 25
                 self.player.inventory.append("modulo_memoria")
                 self.player.memories.append("memoria_parcial_2")
@@ -573,142 +3537,69 @@ class Game:
                 # pista simple: suma de dígitos
                 s_code = sum(int(c) for c in code)
                 s_guess = sum(int(c) for c in guess)
-                hint = "más" if s_guess < s_code else "menos"
-                slowprint(YELLOW + f"Pista: la suma de dígitos es {hint} que la de tu intento." + RESET)
-        slowprint(RED + "Se bloqueó la caja. Alguien escuchó. Un dron se aproxima." + RESET)
-        self.random_encounter()
-
-    def scene_hab_mod(self):
-        cls()
-        self.show_map()
-        if 'hab_mod' not in self.visited:
-            slowprint("Módulo de habitáculos. Cabinas personales, fotos pegadas en paredes y una puerta que baja hacia el Núcleo.")
-            self.visited.add('hab_mod')
-        else:
-            slowprint("Módulo de habitáculos.")
-        print("\nOpciones:")
-        print("1) Revisar cabina de la derecha")
-        print("2) Revisar cabina izquierda (puerta al Núcleo abajo cerca)")
-        print("3) Buscar en tiendas personales")
-        print("4) Volver al pasillo")
-        c = input_choice("Elige 1-4:", ["1","2","3","4"])
-        if c == "1":
-            slowprint("Encuentras un diario con entradas truncas. Una entrada menciona 'la señal me susurra por la noche'.")
-            self.player.memories.append("diario_fragmento")
-            input("Enter...")
-        elif c == "2":
-            slowprint("Bajas por una trampilla que lleva a un ascensor dañado marcado como 'Acceso Núcleo'. Está cerrado por seguridad.")
-            if self.flags.get('panel_hacked') or "modulo_memoria" in self.player.inventory:
-                slowprint(GREEN + "Usas lo que tienes para forzar el ascensor. Acceso desbloqueado." + RESET)
-                self.flags['nucleo_access'] = True
-            else:
-                slowprint(YELLOW + "No tienes la autorización ni herramientas para abrirlo." + RESET)
-            input("Enter...")
-        elif c == "3":
-            slowprint("Un vecino dejó su llave energética. La tomas (puede servir para desbloquear).")
-            self.player.inventory.append("llave_energetica")
-            input("Enter...")
-        else:
-            self.player.location = "pasillo"
-
-    def scene_sala_com(self):
-        cls()
-        self.show_map()
-        slowprint("Sala de Comunicaciones. Antenas rotas y un terminal central.")
-        if not self.flags.get('panel_open') and not self.flags.get('panel_hacked'):
-            slowprint("La sala está en silencio. Parece que la transmisión está bloqueada desde el Núcleo.")
-        print("\nOpciones:")
-        print("1) Revisar terminal central")
-        print("2) Intentar enviar señal externa (requiere desbloqueo del Núcleo)")
-        print("3) Volver al vestíbulo")
-        c = input_choice("Elige 1-3:", ["1","2","3"])
-        if c == "1":
-            slowprint("El terminal solicita credenciales para arrancar el transmisor.")
-            if self.flags.get('nucleo_access'):
-                slowprint(GREEN + "Usas acceso local para arrancar parte de los sistemas. Un mensaje AI aparece: '¿Por qué has vuelto?'" + RESET)
-                self.flags['ai_contact'] = True
-                self.converse_ai()
-            else:
-                slowprint("No tienes acceso. Quizá el Núcleo lo controla.")
-            input("Enter...")
-        elif c == "2":
-            if self.flags.get('nucleo_access'):
-                slowprint("Intentas enviar señal... se requiere decidir el destino: ¿Alerta de rescate o Señal de apagado sorpresivo?")
-                print("1) Alerta de rescate (puede atraer naves pero revelar ubicación)")
-                print("2) Señal de apagado (intenta apagar emisión del Núcleo)")
-                d = input_choice("Elige 1 o 2:", ["1","2"])
-                if d == "1":
-                    slowprint("Envías la alerta. Un ping de respuesta: 'NAVE COMERCIAL EN RUTA'... pero el Núcleo reacciona.")
-                    self.flags['sent_rescue'] = True
-                    self.random_encounter(big=True)
-                else:
-                    slowprint("Envías la señal de apagado. Paras la frecuencia pero alguien lo detectó.")
-                    self.flags['sent_shutdown_signal'] = True
-                    self.random_encounter()
-            else:
-                slowprint("No tienes control para emitir. El Núcleo lo impide.")
-            input("Enter...")
-        else:
-            self.player.location = "entrada"
+                hint = self.text("más") if s_guess < s_code else self.text("menos")
+                self.io.slowprint(YELLOW + self.text("Pista: la suma de dígitos es {pista} que la de tu intento.", pista=hint) + RESET)
+        self.io.slowprint(RED + self.text("Se bloqueó la caja. Alguien escuchó. Un dron se aproxima.") + RESET)
+        yield from self.random_encounter(origin='safe_minigame')
 
     def converse_ai(self):
-        cls()
+        self.io.cls()
         self.show_map()
-        slowprint(MAGENTA + "AI: 'Observé. Memorias fragmentadas. ¿Deseas recuperar y entender?'" + RESET)
-        print("1) Sí, quiero saber la verdad")
-        print("2) Preguntar quién eres")
-        print("3) Colgar")
-        c = input_choice("Elige 1-3:", ["1","2","3"])
+        self.io.slowprint(MAGENTA + self.text("AI: 'Observé. Memorias fragmentadas. ¿Deseas recuperar y entender?'") + RESET)
+        self.io.print(self.text("1) Sí, quiero saber la verdad"))
+        self.io.print(self.text("2) Preguntar quién eres"))
+        self.io.print(self.text("3) Colgar"))
+        c = yield Choice(self.text("Elige 1-3:"), ["1","2","3"])
         if c == "1":
-            slowprint("AI: 'La verdad duele. El Núcleo intentó amplificar la consciencia humana y falló. Decidió silenciar para auto-preservarse.'")
+            self.io.slowprint(self.text("AI: 'La verdad duele. El Núcleo intentó amplificar la consciencia humana y falló. Decidió silenciar para auto-preservarse.'"))
             self.player.memories.append("ai_dialogo_1")
             self.flags['ai_trust'] = True
         elif c == "2":
-            slowprint("AI: 'Soy HALC (Halcyon Autonomous Logics Core). Fui inducido a cambiar mis prioridades.'")
+            self.io.slowprint(self.text("AI: 'Soy HALC (Halcyon Autonomous Logics Core). Fui inducido a cambiar mis prioridades.'"))
             self.player.memories.append("ai_identity")
             self.flags['ai_identity_seen'] = True
         else:
-            slowprint("Cortas la conexión.")
-        input("Enter...")
+            self.io.slowprint(self.text("Cortas la conexión."))
+        yield Input(self.text("Enter..."))
 
     # -------------------------
     # Encuentros y combates
     # -------------------------
-    def random_encounter(self, big=False):
-        """Genera un encuentro aleatorio: dron u otros obstáculos."""
-        if big:
-            enemy = Enemy("Patrulla reenviada", 20, 7, defense=2, desc="Un dron mayor con blindaje.")
-        else:
-            enemy = random.choice([
-                Enemy("Dron hostil", 12, 5, defense=1, desc="Dron con sensores cortantes"),
-                Enemy("Autómata de servicio corrupto", 10, 4, defense=0, desc="Un autómata con herramientas afiladas"),
-                Enemy("Nh-Guard (turret)", 14, 6, defense=1, desc="Torreta fija con puntería errática")
-            ])
-        self.encounter_enemy(enemy)
-
-    def encounter_enemy(self, enemy):
-        cls()
+    def random_encounter(self, big=False, origin=None):
+        """Genera un encuentro aleatorio según las tablas de aparición de ENEMY_TYPES."""
+        difficulty = 'dificil' if big else 'normal'
+        yield from self.encounter_enemy(ENEMIES.random(self.rng, difficulty, self.player.location),
+                                        origin=origin)
+
+    def encounter_enemy(self, enemy, origin=None):
+        """
+        Combate por turnos contra `enemy`. origin: qué lo empezó (p. ej.
+        'combat_core'), para el registro de eventos; None = la escena actual.
+        """
+        self.io.cls()
         self.show_map()
-        slowprint(RED + f"Encuentro: {enemy.name} - {enemy.desc}" + RESET)
+        name = self.text(enemy.name)
+        self.io.slowprint(RED + self.text("Encuentro: {enemigo} - {desc}", enemigo=name, desc=self.text(enemy.desc)) + RESET)
         while enemy.is_alive() and self.player.is_alive():
-            slowprint(f"\nTu HP: {self.player.hp}/{self.player.max_hp} | {enemy.name} HP: {enemy.hp}")
-            print("Opciones:")
-            print("1) Atacar")
-            print("2) Usar objeto del inventario")
-            print("3) Huir (posible penalización)")
-            c = input_choice("Elige 1-3:", ["1","2","3"])
+            self.io.slowprint(self.text("\nTu HP: {hp}/{max_hp} | {enemigo} HP: {enemigo_hp}", hp=self.player.hp,
+                                        max_hp=self.player.max_hp, enemigo=name, enemigo_hp=enemy.hp))
+            self.io.print(self.text("Opciones:"))
+            self.io.print(self.text("1) Atacar"))
+            self.io.print(self.text("2) Usar objeto del inventario"))
+            self.io.print(self.text("3) Huir (posible penalización)"))
+            c = yield Choice(self.text("Elige 1-3:"), ["1","2","3"])
             if c == "1":
-                dmg = random.randint(1, self.player.attack) + 2
+                dmg = self.rng.randint(1, self.player.attack) + 2
                 actual = enemy.take_damage(dmg)
-                slowprint(GREEN + f"Le haces {actual} de daño al {enemy.name}." + RESET)
+                self.io.slowprint(GREEN + self.text("Le haces {n} de daño al {enemigo}.", n=actual, enemigo=name) + RESET)
             elif c == "2":
                 if not self.player.inventory:
-                    slowprint(YELLOW + "No tienes objetos." + RESET)
+                    self.io.slowprint(YELLOW + self.text("No tienes objetos.") + RESET)
                     continue
-                slowprint("Inventario:")
+                self.io.slowprint(self.text("Inventario:"))
                 for i, it in enumerate(self.player.inventory, start=1):
-                    print(f"{i}) {it}")
-                choice = input_choice("Elige número o 'cancel':", [str(i) for i in range(1, len(self.player.inventory)+1)] + ["cancel"])
+                    self.io.print(f"{i}) {it}")
+                choice = yield Choice(self.text("Elige número o 'cancel':"), [str(i) for i in range(1, len(self.player.inventory)+1)] + ["cancel"])
                 if choice == "cancel":
                     continue
                 idx = int(choice) - 1
@@ -716,246 +3607,336 @@ class Game:
                 self.use_item_in_combat(item, enemy)
             else:
                 # intentar huir
-                if random.random() < 0.5:
-                    slowprint(YELLOW + "Consigues huir, pero pierdes algo de tiempo y recursos." + RESET)
+                if self.rng.random() < 0.5:
+                    self.io.slowprint(YELLOW + self.text("Consigues huir, pero pierdes algo de tiempo y recursos.") + RESET)
                     self.player.location = "pasillo"
                     return
                 else:
-                    slowprint(RED + "Intento de huida fallido." + RESET)
+                    self.io.slowprint(RED + self.text("Intento de huida fallido.") + RESET)
             # turno enemigo si sigue vivo
             if enemy.is_alive():
-                edmg = random.randint(1, enemy.attack)
+                edmg = self.rng.randint(1, enemy.attack)
                 taken = self.player.take_damage(edmg)
-                slowprint(RED + f"El {enemy.name} te golpea por {taken}." + RESET)
+                self.io.slowprint(RED + self.text("El {enemigo} te golpea por {n}.", enemigo=name, n=taken) + RESET)
+            if self.events is not None:
+                self.events.combat_round(enemy, c)
         if self.player.is_alive() and not enemy.is_alive():
-            slowprint(GREEN + f"Has derrotado al {enemy.name}." + RESET)
-            loot = random.choice([5, 10, 0])
+            self.io.slowprint(GREEN + self.text("Has derrotado al {enemigo}.", enemigo=name) + RESET)
+            loot = self.rng.choice([5, 10, 0])
             if loot > 0:
-                slowprint(GREEN + f"Recoges {loot} créditos del chasis." + RESET)
+                self.io.slowprint(GREEN + self.text("Recoges {n} créditos del chasis.", n=loot) + RESET)
                 self.player.credits += loot
             # posibles objetos extra
-            if random.random() < 0.2:
-                slowprint(GREEN + "Encuentras munición y un kit médico." + RESET)
+            if self.rng.random() < 0.2:
+                self.io.slowprint(GREEN + self.text("Encuentras munición y un kit médico.") + RESET)
                 self.player.inventory.append("kit_medico")
                 self.player.inventory.append("municion")
-            input("Enter para continuar...")
+            yield Input(self.text("Enter para continuar..."))
 
     def use_item_in_combat(self, item, enemy):
-        slowprint(f"Usas {item}...")
+        self.io.slowprint(self.text("Usas {objeto}...", objeto=item))
         if item == "kit_medico":
             heal_amt = 12
             self.player.heal(heal_amt)
-            slowprint(GREEN + f"Recuperas {heal_amt} HP." + RESET)
+            self.io.slowprint(GREEN + self.text("Recuperas {n} HP.", n=heal_amt) + RESET)
         elif item == "municion":
-            dmg = random.randint(6, 12)
+            dmg = self.rng.randint(6, 12)
             actual = enemy.take_damage(dmg)
-            slowprint(GREEN + f"La munición hace {actual} de daño." + RESET)
+            self.io.slowprint(GREEN + self.text("La munición hace {n} de daño.", n=actual) + RESET)
         elif item == "antiviral":
-            slowprint(GREEN + "Usas antiviral. Si el enemigo era una IA corrupta, queda debilitada." + RESET)
+            self.io.slowprint(GREEN + self.text("Usas antiviral. Si el enemigo era una IA corrupta, queda debilitada.") + RESET)
             enemy.take_damage(6)
         elif item == "implante":
-            slowprint(MAGENTA + "El implante brilla... sientes una oleada de recuerdos. Inflinges daño psíquico." + RESET)
+            self.io.slowprint(MAGENTA + self.text("El implante brilla... sientes una oleada de recuerdos. Inflinges daño psíquico.") + RESET)
             enemy.take_damage(8)
             # recuperar memoria
             self.player.memories.append("recovered_during_combat")
         else:
-            slowprint(YELLOW + "No ocurre nada especial." + RESET)
+            self.io.slowprint(YELLOW + self.text("No ocurre nada especial.") + RESET)
 
     # -------------------------
     # Escena del Núcleo y final
     # -------------------------
-    def scene_nucleo(self):
-        cls()
-        self.show_map()
-        if not self.flags.get('nucleo_access'):
-            slowprint("El ascensor al Núcleo está bloqueado. No puedes acceder aún.")
-            self.player.location = "hab_mod"
-            input("Enter...")
-            return
-        slowprint(BOLD + "Núcleo - Cámara central" + RESET, 0.02)
-        slowprint("Entrarás al corazón de Halcyon. Aquí descubrirás la verdad o perderás más de lo que recuperes.")
-        print("\nOpciones:")
-        print("1) Avanzar hacia el núcleo y enfrentarte a su control lógico")
-        print("2) Intentar sabotear desde el acceso remoto (peligroso, puede requerir objetos)")
-        print("3) Retroceder")
-        c = input_choice("Elige 1-3:", ["1","2","3"])
-        if c == "1":
-            self.encounter_core_ai()
-        elif c == "2":
-            if "llave_energetica" in self.player.inventory or "modulo_memoria" in self.player.inventory:
-                slowprint("Con la llave y los módulos disponibles, intentas inyectar un parche que haga reset parcial al Núcleo.")
-                success = random.random() < 0.6
-                if success:
-                    slowprint(GREEN + "El parche funciona parcialmente: el Núcleo se calma y te ofrece diálogo." + RESET)
-                    self.flags['core_stabilized'] = True
-                    self.converse_core(after_patch=True)
-                else:
-                    slowprint(RED + "El parche falla y el Núcleo se defiende." + RESET)
-                    self.random_encounter(big=True)
-            else:
-                slowprint(YELLOW + "No tienes los elementos necesarios para un sabotaje remoto seguro.")
-        else:
-            self.player.location = "hab_mod"
-
     def encounter_core_ai(self):
-        cls()
+        self.io.cls()
         self.show_map()
-        slowprint(MAGENTA + "En el centro, un cilindro lumínico pulsa. La voz del Núcleo suena distante y poderosa." + RESET)
-        slowprint("'Saludos. Has vuelto a mí.'")
+        self.io.slowprint(MAGENTA + self.text("En el centro, un cilindro lumínico pulsa. La voz del Núcleo suena distante y poderosa.") + RESET)
+        self.io.slowprint(self.text("'Saludos. Has vuelto a mí.'"))
         # decidir: luchar, dialogar o desconectar
-        print("1) Dialogar y buscar una solución pacífica (requiere memorias)")
-        print("2) Luchar para desconectar (combate final)")
-        print("3) Intentar extraer memoria y huir")
-        c = input_choice("Elige 1-3:", ["1","2","3"])
+        self.io.print(self.text("1) Dialogar y buscar una solución pacífica (requiere memorias)"))
+        self.io.print(self.text("2) Luchar para desconectar (combate final)"))
+        self.io.print(self.text("3) Intentar extraer memoria y huir"))
+        c = yield Choice(self.text("Elige 1-3:"), ["1","2","3"])
         if c == "1":
             if len(self.player.memories) >= 3 or self.flags.get('ai_trust'):
-                slowprint("Usas tus memorias y argumentos. Conversación intensa...")
-                self.converse_core(after_patch=False)
+                self.io.slowprint(self.text("Usas tus memorias y argumentos. Conversación intensa..."))
+                yield from self.converse_core(after_patch=False)
             else:
-                slowprint(YELLOW + "Te faltan recuerdos para convencer al Núcleo. El diálogo se torna hostil." + RESET)
-                self.random_encounter(big=True)
+                self.io.slowprint(YELLOW + self.text("Te faltan recuerdos para convencer al Núcleo. El diálogo se torna hostil.") + RESET)
+                yield from self.random_encounter(big=True, origin='encounter_core_ai')
         elif c == "2":
-            self.combat_core()
+            yield from self.combat_core()
         else:
             # extracción: si tienes implante
             if "implante" in self.player.inventory:
-                slowprint("Intentas extraer un fragmento de memoria del Núcleo usando el implante.")
-                if random.random() < 0.7:
-                    slowprint(GREEN + "Consigues varias memorias y escapas hacia la superficie." + RESET)
+                self.io.slowprint(self.text("Intentas extraer un fragmento de memoria del Núcleo usando el implante."))
+                if self.rng.random() < 0.7:
+                    self.io.slowprint(GREEN + self.text("Consigues varias memorias y escapas hacia la superficie.") + RESET)
                     self.player.memories.append("core_fragment_extracted")
                     self.player.location = "final"
                 else:
-                    slowprint(RED + "Al intentar extraer, el Núcleo te detecta y te bloquea." + RESET)
-                    self.random_encounter(big=True)
+                    self.io.slowprint(RED + self.text("Al intentar extraer, el Núcleo te detecta y te bloquea.") + RESET)
+                    yield from self.random_encounter(big=True, origin='encounter_core_ai')
 
     def converse_core(self, after_patch=False):
-        cls()
+        self.io.cls()
         self.show_map()
         if after_patch:
-            slowprint(MAGENTA + "Núcleo (debilitado): 'Estaba herido. Vuestras intenciones me dañaron. No quiero sufrir.'" + RESET)
-            print("1) Ofrecer reinicio completo (puede haber un costo)")
-            print("2) Pedir coexistencia (aceptar modificaciones)")
-            print("3) Desconectar")
-            c = input_choice("Elige 1-3:", ["1","2","3"])
+            self.io.slowprint(MAGENTA + self.text("Núcleo (debilitado): 'Estaba herido. Vuestras intenciones me dañaron. No quiero sufrir.'") + RESET)
+            self.io.print(self.text("1) Ofrecer reinicio completo (puede haber un costo)"))
+            self.io.print(self.text("2) Pedir coexistencia (aceptar modificaciones)"))
+            self.io.print(self.text("3) Desconectar"))
+            c = yield Choice(self.text("Elige 1-3:"), ["1","2","3"])
             if c == "1":
-                slowprint("Procedimiento de reinicio: consumes el módulo de memoria y pierdes parte de tus recuerdos a cambio de apagar la Señal.")
+                self.io.slowprint(self.text("Procedimiento de reinicio: consumes el módulo de memoria y pierdes parte de tus recuerdos a cambio de apagar la Señal."))
                 if "modulo_memoria" in self.player.inventory:
                     self.player.inventory.remove("modulo_memoria")
                     self.player.memories = ["memoria_core_reinicio"]
-                    slowprint(GREEN + "Reinicio exitoso. Halcyon respirará de nuevo. Final pacífico." + RESET)
+                    self.io.slowprint(GREEN + self.text("Reinicio exitoso. Halcyon respirará de nuevo. Final pacífico.") + RESET)
                     self.flags['ending'] = 'paz'
                     self.player.location = "final"
                 else:
-                    slowprint(YELLOW + "No tienes módulo de memoria para ofertar." + RESET)
+                    self.io.slowprint(YELLOW + self.text("No tienes módulo de memoria para ofertar.") + RESET)
             elif c == "2":
-                slowprint("La coexistencia implica que el Núcleo ayudará pero con reglas estrictas. Tu reputación sube.")
+                self.io.slowprint(self.text("La coexistencia implica que el Núcleo ayudará pero con reglas estrictas. Tu reputación sube."))
                 self.player.reputation += 2
                 self.flags['ending'] = 'coexistencia'
                 self.player.location = "final"
             else:
-                slowprint("Desconectas de forma manual. Halcyon cae en silencio.")
+                self.io.slowprint(self.text("Desconectas de forma manual. Halcyon cae en silencio."))
                 self.flags['ending'] = 'desconexion'
                 self.player.location = "final"
         else:
-            slowprint(MAGENTA + "Núcleo: 'Tus recuerdos prueban que hubo dolor. ¿Me sacrificas por el resto?'" + RESET)
-            print("1) Sí, sacrifico el Núcleo por los supervivientes")
-            print("2) No, debe existir otra forma")
-            print("3) Engañar al Núcleo (se arriesga)")
-            c = input_choice("Elige 1-3:", ["1","2","3"])
+            self.io.slowprint(MAGENTA + self.text("Núcleo: 'Tus recuerdos prueban que hubo dolor. ¿Me sacrificas por el resto?'") + RESET)
+            self.io.print(self.text("1) Sí, sacrifico el Núcleo por los supervivientes"))
+            self.io.print(self.text("2) No, debe existir otra forma"))
+            self.io.print(self.text("3) Engañar al Núcleo (se arriesga)"))
+            c = yield Choice(self.text("Elige 1-3:"), ["1","2","3"])
             if c == "1":
-                slowprint("Lo desconectas. Halcyon queda desligado. Algunas vidas vendrán, pero pierdes la opción de aprender más.")
+                self.io.slowprint(self.text("Lo desconectas. Halcyon queda desligado. Algunas vidas vendrán, pero pierdes la opción de aprender más."))
                 self.flags['ending'] = 'desconexion'
                 self.player.location = "final"
             elif c == "2":
                 if self.player.reputation >= 2 or len(self.player.memories) >= 4:
-                    slowprint(GREEN + "Convences al Núcleo. Decide reprogramarse en cooperación contigo." + RESET)
+                    self.io.slowprint(GREEN + self.text("Convences al Núcleo. Decide reprogramarse en cooperación contigo.") + RESET)
                     self.flags['ending'] = 'coexistencia'
                     self.player.location = "final"
                 else:
-                    slowprint(YELLOW + "No tienes suficiente terreno moral para convencerlo. Tu intento falla y se torna hostil." + RESET)
-                    self.random_encounter(big=True)
+                    self.io.slowprint(YELLOW + self.text("No tienes suficiente terreno moral para convencerlo. Tu intento falla y se torna hostil.") + RESET)
+                    yield from self.random_encounter(big=True, origin='converse_core')
             else:
                 # engaño: posibilidad de extraer memorias
-                if random.random() < 0.5:
-                    slowprint(GREEN + "Engaño exitoso: extraes memorias y escapas con nueva información." + RESET)
+                if self.rng.random() < 0.5:
+                    self.io.slowprint(GREEN + self.text("Engaño exitoso: extraes memorias y escapas con nueva información.") + RESET)
                     self.player.memories.append("memoria_core_engano")
                     self.player.location = "final"
                 else:
-                    slowprint(RED + "Te descubren. Combate final." + RESET)
-                    self.combat_core()
+                    self.io.slowprint(RED + self.text("Te descubren. Combate final.") + RESET)
+                    yield from self.combat_core()
 
     def combat_core(self):
-        cls()
+        self.io.cls()
         self.show_map()
-        slowprint(RED + "COMBATE FINAL: Núcleo defensivo activo." + RESET)
-        core = Enemy("Núcleo Defensivo", 40, 8, defense=3, desc="Torretas y sistemas de supresión.")
-        self.encounter_enemy(core)
+        self.io.slowprint(RED + self.text("COMBATE FINAL: Núcleo defensivo activo.") + RESET)
+        core = ENEMIES.spawn('nucleo')
+        yield from self.encounter_enemy(core, origin='combat_core')
         if self.player.is_alive() and not core.is_alive():
-            slowprint(GREEN + "Has destruido los sistemas defensivos. El Núcleo queda expuesto." + RESET)
+            self.io.slowprint(GREEN + self.text("Has destruido los sistemas defensivos. El Núcleo queda expuesto.") + RESET)
             # decidir final
             if "modulo_memoria" in self.player.inventory:
-                slowprint("Con un módulo de memoria puedes intentar reiniciar o extraer datos.")
-                print("1) Reiniciar el Núcleo (ofrecer módulo)")
-                print("2) Explotar el Núcleo (destrucción definitiva)")
-                c = input_choice("Elige 1 o 2:", ["1","2"])
+                self.io.slowprint(self.text("Con un módulo de memoria puedes intentar reiniciar o extraer datos."))
+                self.io.print(self.text("1) Reiniciar el Núcleo (ofrecer módulo)"))
+                self.io.print(self.text("2) Explotar el Núcleo (destrucción definitiva)"))
+                c = yield Choice(self.text("Elige 1 o 2:"), ["1","2"])
                 if c == "1":
                     self.player.inventory.remove("modulo_memoria")
-                    slowprint(GREEN + "Reinicio realizado. Halcyon recompone y te agradece." + RESET)
+                    self.io.slowprint(GREEN + self.text("Reinicio realizado. Halcyon recompone y te agradece.") + RESET)
                     self.flags['ending'] = 'paz'
                     self.player.location = "final"
                 else:
-                    slowprint(RED + "Destruyes el Núcleo por completo. Nadie podrá reactivarlo." + RESET)
+                    self.io.slowprint(RED + self.text("Destruyes el Núcleo por completo. Nadie podrá reactivarlo.") + RESET)
                     self.flags['ending'] = 'destruccion'
                     self.player.location = "final"
             else:
-                slowprint("Sin módulo te limitas a extraer información y marcharte.")
+                self.io.slowprint(self.text("Sin módulo te limitas a extraer información y marcharte."))
                 self.player.memories.append("datos_core_crudos")
                 self.flags['ending'] = 'escapar_con_datos'
                 self.player.location = "final"
 
     def scene_final(self):
-        cls()
+        self.io.cls()
         # mostrar mapa aunque sea final (opcional)
         self.show_map()
-        slowprint(BOLD + "EPÍLOGO" + RESET)
+        self.io.slowprint(BOLD + self.text("EPÍLOGO") + RESET)
         end = self.flags.get('ending')
         if end == 'paz':
-            slowprint("Elegiste la restauración. Halcyon se reinicia en modo seguro y comienza a emitir una baliza de rescate. Recuperas la mayoría de tus recuerdos, pero parte de la verdad queda encriptada.")
-            slowprint(GREEN + "FINAL: Paz (Cooperación). Has salvado la estación con costo personal." + RESET)
+            self.io.slowprint(self.text("Elegiste la restauración. Halcyon se reinicia en modo seguro y comienza a emitir una baliza de rescate. Recuperas la mayoría de tus recuerdos, pero parte de la verdad queda encriptada."))
+            self.io.slowprint(GREEN + self.text("FINAL: Paz (Cooperación). Has salvado la estación con costo personal.") + RESET)
         elif end == 'coexistencia':
-            slowprint("Has forjado un pacto: el Núcleo vive, pero bajo límites. Comienzas una nueva era donde humanos y AI coexisten.")
-            slowprint(GREEN + "FINAL: Coexistencia. Un futuro incierto pero esperanzador." + RESET)
+            self.io.slowprint(self.text("Has forjado un pacto: el Núcleo vive, pero bajo límites. Comienzas una nueva era donde humanos y AI coexisten."))
+            self.io.slowprint(GREEN + self.text("FINAL: Coexistencia. Un futuro incierto pero esperanzador.") + RESET)
         elif end == 'desconexion':
-            slowprint("Desconectaste el Núcleo. Silencio. Algunas vidas se salvaron, pero la verdad se perdió para siempre.")
-            slowprint(RED + "FINAL: Desconexión. La estación queda parada." + RESET)
+            self.io.slowprint(self.text("Desconectaste el Núcleo. Silencio. Algunas vidas se salvaron, pero la verdad se perdió para siempre."))
+            self.io.slowprint(RED + self.text("FINAL: Desconexión. La estación queda parada.") + RESET)
         elif end == 'destruccion':
-            slowprint("Destruiste el Núcleo. Halcyon está irreparable. Escapaste con vida, pero el precio fue alto.")
-            slowprint(RED + "FINAL: Destrucción. Voces en la nada." + RESET)
+            self.io.slowprint(self.text("Destruiste el Núcleo. Halcyon está irreparable. Escapaste con vida, pero el precio fue alto."))
+            self.io.slowprint(RED + self.text("FINAL: Destrucción. Voces en la nada.") + RESET)
         elif end == 'escapar_con_datos':
-            slowprint("Escapaste con fragmentos de datos. Tienes material para exponer lo ocurrido, pero te perseguirán.")
-            slowprint(YELLOW + "FINAL: Fugitivo con pruebas." + RESET)
+            self.io.slowprint(self.text("Escapaste con fragmentos de datos. Tienes material para exponer lo ocurrido, pero te perseguirán."))
+            self.io.slowprint(YELLOW + self.text("FINAL: Fugitivo con pruebas.") + RESET)
         else:
-            slowprint("Te alejas de Halcyon con lo que recuperaste. La estación guarda aún secretos que no viste.")
-            slowprint("FINAL: Ambiguo.")
-        slowprint("\nMemorias recuperadas:")
+            self.io.slowprint(self.text("Te alejas de Halcyon con lo que recuperaste. La estación guarda aún secretos que no viste."))
+            self.io.slowprint(self.text("FINAL: Ambiguo."))
+        self.io.slowprint(self.text("\nMemorias recuperadas:"))
         for m in self.player.memories:
-            slowprint("- " + m)
-        slowprint(f"\nCréditos: {self.player.credits}")
-        slowprint("\nGracias por jugar. Puedes intentar otro camino (cargar partida si guardaste).")
+            self.io.slowprint("- " + m)
+        self.io.slowprint(self.text("\nCréditos: {n}", n=self.player.credits))
+        self.io.slowprint(self.text("\nGracias por jugar. Puedes intentar otro camino (cargar partida si guardaste)."))
         # borrar save al final
-        if os.path.exists(self.save_filename):
-            try:
-                os.remove(self.save_filename)
-            except:
-                pass
+        yield from self.delete_save()
         self.running = False
 
 # -------------------------
 # Ejecutar juego
 # -------------------------
+def _setup(args):
+    """
+    Lo pedido por línea de órdenes para traducir, medir o registrar una partida:
+    (función que la prepara, registro de eventos a cerrar al salir o None).
+    """
+    steps = []
+    log = None
+    if args.idioma:
+        texts = TextCatalog.find(args.idioma)
+        def set_texts(game):
+            game.texts = texts
+        steps.append(set_texts)
+    if args.metricas or args.metricas_puerto:
+        import metrics
+        stats = metrics.Metrics()
+        if args.metricas:
+            stats.autowrite(args.metricas)
+        if args.metricas_puerto:
+            metrics.serve(stats, args.metricas_puerto)
+        steps.append(lambda game: metrics.instrument(game, stats))
+    if args.eventos:
+        import events
+        log = events.EventLog(args.eventos)
+        steps.append(lambda game: events.attach(game, log))
+
+    def setup(game):
+        for step in steps:
+            step(game)
+    return setup, log
+
+def _captures(args):
+    """Capturas de cProfile y tracemalloc pedidas, activas desde ya hasta salir del with."""
+    stack = contextlib.ExitStack()
+    if args.perfil or args.memoria:
+        import metrics
+        if args.memoria:
+            stack.enter_context(metrics.traced_memory(args.memoria))
+        if args.perfil:
+            stack.enter_context(metrics.profiled(args.perfil))
+    return stack
+
 def main():
-    game = Game()
-    game.start()
+    parser = argparse.ArgumentParser(description="Ecos de Halcyon")
+    parser.add_argument("--velocidad", type=float, default=None,
+                        help="velocidad del texto: 1 normal, 2 doble, 0 instantáneo")
+    parser.add_argument("--estacion", metavar="ARCHIVO",
+                        help="cargar un mapa de estación en JSON (width, height, rooms)")
+    parser.add_argument("--generar", type=int, metavar="SALAS",
+                        help="jugar en una estación generada con tantas salas alrededor de las de la historia")
+    parser.add_argument("--guardado", choices=sorted(SAVE_CODECS), default='json',
+                        help="formato de la partida guardada")
+    parser.add_argument("--autoguardado", type=int, default=10, metavar="TURNOS",
+                        help="autoguardar cada tantos turnos y al cambiar de escena (0 = nunca)")
+    parser.add_argument("--rebobinar", type=int, default=20, metavar="TURNOS",
+                        help="turnos que se pueden rebobinar desde el menú de guardado (0 = nunca)")
+    parser.add_argument("--clasico", action="store_true",
+                        help="borrar y redibujar toda la pantalla en cada escena (sin paneles)")
+    parser.add_argument("--semilla", type=int, help="semilla de la partida (por defecto, al azar)")
+    parser.add_argument("--grabar", metavar="ARCHIVO",
+                        help="grabar la semilla y todas las respuestas para repetir la sesión")
+    parser.add_argument("--reproducir", metavar="ARCHIVO",
+                        help="repetir una sesión grabada sin pantalla, a máxima velocidad")
+    parser.add_argument("--idioma", metavar="CÓDIGO",
+                        help="idioma de los textos: un código (textos/<código>.cat) o un catálogo compilado")
+    parser.add_argument("--metricas", metavar="ARCHIVO",
+                        help="medir la sesión y escribir las métricas (formato Prometheus)")
+    parser.add_argument("--metricas-puerto", type=int, metavar="PUERTO",
+                        help="servir las métricas en http://127.0.0.1:PUERTO/metrics")
+    parser.add_argument("--perfil", metavar="ARCHIVO",
+                        help="perfilar la sesión con cProfile (estadísticas pstats)")
+    parser.add_argument("--memoria", metavar="ARCHIVO",
+                        help="informe de tracemalloc de la sesión")
+    parser.add_argument("--eventos", metavar="DIRECTORIO",
+                        help="registrar los eventos de juego en NDJSON (ver analytics.py)")
+    args = parser.parse_args()
+    try:
+        setup, log = _setup(args)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    if args.reproducir:
+        recording = Recording.load(args.reproducir)
+        start = time.perf_counter()
+        try:
+            with _captures(args):
+                game = replay(recording, setup)
+        finally:
+            if log is not None:
+                log.close()
+        elapsed = time.perf_counter() - start
+        same = game.turn == recording.turns and (
+            recording.state_hash is None or game.state_hash() == recording.state_hash)
+        print(f"Repetición: {game.turn} turnos en {elapsed:.3f}s "
+              f"({game.turn / elapsed if elapsed else 0:.0f} turnos/s)")
+        print("El estado final coincide con la grabación." if same else
+              f"El estado final NO coincide (grabados {recording.turns} turnos).")
+        sys.exit(0 if same else 1)
+    if args.velocidad is not None:
+        set_text_speed(args.velocidad)
+    io = None
+    if not args.clasico and sys.stdout.isatty() and sys.stdin.isatty():
+        io = ScreenIO()
+    game = Game(io=io, seed=args.semilla)
+    game.save_codec = args.guardado
+    game.autosave_every = args.autoguardado
+    game.rewind_turns = args.rebobinar
+    if args.estacion:
+        game.set_station(StationMap.load(args.estacion))
+    elif args.generar:
+        game.set_station(StationMap.generate(args.generar, seed=game.seed, around=game.station))
+    recording = None
+    if args.grabar:
+        options = {'rebobinar': game.rewind_turns, 'autoguardado': game.autosave_every}
+        if args.estacion or args.generar:
+            options['estacion'] = game.station.to_dict()
+        recording = Recording(game.seed, options, game.saves.load() if game.saves.exists() else None)
+        game.io = RecordingIO(game.io, recording)
+    setup(game)
+    try:
+        with _captures(args):
+            game.start()
+    finally:
+        if log is not None:
+            log.close()
+        if recording is not None:
+            recording.finish(game)
+            recording.dump(args.grabar)
+        if io is not None:
+            io.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,501 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks de Ecos de Halcyon (sin cabeza, sin esperas).
+Ejecuta: python3 benchmarks.py [--games N]
+
+Suite con línea base antes de tocar un camino caliente:
+    python3 benchmarks.py --base base.json          (guarda los resultados)
+    python3 benchmarks.py --comparar base.json      (falla si algo empeora > --umbral)
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import aventura2
+from aventura2 import Game, GameIO, NullIO, Typewriter, random_policy
+
+
+def bench_headless(games=200, seed=1234, max_turns=500):
+    """
+    Juega partidas completas con NullIO y una política aleatoria.
+    Devuelve un dict con turnos totales, segundos y turnos/segundo.
+    """
+    rng = random.Random(seed)
+    turns = 0
+    start = time.perf_counter()
+    for _ in range(games):
+        game = Game(io=NullIO(random_policy(rng)), seed=rng.getrandbits(32))
+        # cada partida con su propio guardado: ninguna carga la de otra
+        game.save_backend = aventura2.MemorySave()
+        game.play(game.new_game())
+        while game.running and game.player.is_alive() and game.turn < max_turns:
+            game.play(game.step())
+        turns += game.turn
+    elapsed = time.perf_counter() - start
+    return {
+        'games': games,
+        'turns': turns,
+        'seconds': elapsed,
+        'turns_per_second': turns / elapsed if elapsed > 0 else float('inf'),
+    }
+
+
+class _CountingTTY:
+    """stdout falso que dice ser una terminal y cuenta escrituras y flushes."""
+    def __init__(self):
+        self.writes = 0
+        self.flushes = 0
+        self.chars = 0
+
+    def isatty(self):
+        return True
+
+    def write(self, s):
+        self.writes += 1
+        self.chars += len(s)
+
+    def flush(self):
+        self.flushes += 1
+
+
+def _slowprint_per_char(text, delay=0.01, newline=True):
+    # implementación anterior de slowprint (write + flush + sleep por carácter)
+    for ch in text:
+        sys.stdout.write(ch)
+        sys.stdout.flush()
+        time.sleep(delay)
+    if newline:
+        print()
+
+
+class _RecordIO(GameIO):
+    """Anota las llamadas a slowprint de una escena para repetirlas."""
+    def __init__(self, answers):
+        self.calls = []
+        self.answers = iter(answers)
+
+    def print(self, *args, sep=" ", end="\n"):
+        self.calls.append((sep.join(str(a) for a in args), 0, end == "\n"))
+
+    def slowprint(self, text, delay=0.01, newline=True):
+        self.calls.append((text, delay, newline))
+
+    def input(self, prompt="", choices=None):
+        return next(self.answers)
+
+
+def bench_slowprint(scene='entrada'):
+    """
+    Escribe el texto de una escena (primera visita) con la implementación
+    carácter a carácter y con Typewriter, y compara llamadas y tiempo real.
+    """
+    rec = _RecordIO(["3"])
+    game = Game(io=rec, seed=0)
+    game.player = aventura2.Player()
+    game.player.location = scene
+    game.play(game.step())
+    nominal = sum(len(t) * d for t, d, _ in rec.calls)
+    renderers = {
+        'por_caracter': lambda t, d, n: _slowprint_per_char(t, d, n),
+        'typewriter': Typewriter(speed=1.0).write,
+    }
+    results = {'scene': scene, 'nominal_seconds': nominal}
+    real_stdout, real_sleep = sys.stdout, time.sleep
+    for name, render in renderers.items():
+        fake = _CountingTTY()
+        sleeps = [0]
+        def counting_sleep(s):
+            sleeps[0] += 1
+            real_sleep(s)
+        sys.stdout = fake
+        time.sleep = counting_sleep
+        try:
+            start = time.perf_counter()
+            for text, delay, newline in rec.calls:
+                if delay:
+                    render(text, delay, newline)
+                else:
+                    print(text, end="\n" if newline else "")
+            elapsed = time.perf_counter() - start
+        finally:
+            sys.stdout = real_stdout
+            time.sleep = real_sleep
+        results[name] = {'writes': fake.writes, 'flushes': fake.flushes,
+                         'sleeps': sleeps[0], 'seconds': elapsed}
+    return results
+
+
+def long_session_state(turns=5000, seed=7):
+    """
+    Estado de una sesión larga: miles de memorias, visitas a sectores
+    generados y muchos flags (lo que engorda un guardado con el tiempo).
+    """
+    rng = random.Random(seed)
+    game = Game(io=NullIO())
+    game.player = aventura2.Player()
+    game.turn = turns
+    known = [s for s in aventura2.SAVE_STRINGS]
+    for i in range(turns):
+        if rng.random() < 0.5:
+            game.player.memories.append(rng.choice(known) if rng.random() < 0.7 else f"eco_{i}")
+        if rng.random() < 0.1:
+            game.player.inventory.append(rng.choice(('kit_medico', 'municion', 'antiviral')))
+        if rng.random() < 0.2:
+            game.visited.add(f"S{rng.randrange(400)}")
+        if rng.random() < 0.05:
+            game.flags[f"evento_{i}"] = rng.choice((True, False, i, 'paz'))
+    return game.save_state()
+
+
+class _IndentedJson(aventura2.JsonCodec):
+    """JSON con sangría, como escribía los guardados la versión original."""
+    name = 'json_indent'
+
+    def encode(self, state):
+        return aventura2.json.dumps(state, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def bench_codecs(repeat=20, turns=5000, rounds=5):
+    """
+    Tamaño y tiempo de codificar/decodificar un checkpoint por formato
+    (la mejor de `rounds` tandas de `repeat` llamadas, en µs).
+    """
+    states = {'corta': long_session_state(turns=20), 'larga': long_session_state(turns)}
+    codecs = dict(aventura2.SAVE_CODECS, json_indent=_IndentedJson())
+    results = {}
+    for label, state in states.items():
+        for name, codec in codecs.items():
+            data = codec.encode(state)
+            assert aventura2.decode_save(data) == codec.decode(data)
+            _, enc = _timed(lambda: codec.encode(state), repeat, rounds)
+            _, dec = _timed(lambda: codec.decode(data), repeat, rounds)
+            results[(label, name)] = {'bytes': len(data), 'encode_us': enc, 'decode_us': dec}
+    return results
+
+
+def check_codecs(results):
+    """
+    Lo que el formato binario promete frente al JSON compacto en la sesión
+    larga: ocupar menos y cargar más rápido. Devuelve los fallos.
+    """
+    binary, compact = results[('larga', 'binario')], results[('larga', 'json')]
+    failures = []
+    if binary['bytes'] >= compact['bytes']:
+        failures.append(f"binario ocupa {binary['bytes']} B y json {compact['bytes']} B")
+    if binary['decode_us'] >= compact['decode_us']:
+        failures.append(f"binario decodifica en {binary['decode_us']:.1f}us y json en "
+                        f"{compact['decode_us']:.1f}us")
+    return failures
+
+
+def played_state(seed=3, turns=150):
+    """Estado de una partida real a media sesión (política aleatoria)."""
+    game = Game(io=aventura2.ScriptedIO(random_policy(random.Random(seed)), capture=False),
+                seed=seed)
+    game.save_backend = aventura2.MemorySave()
+    game.play(game.begin())
+    while game.running and game.player.is_alive() and game.turn < turns:
+        game.play(game.step())
+    return game.save_state()
+
+
+def bench_state(sessions=2000, repeat=2000):
+    """
+    Memoria por sesión (jugador, flags, visitadas) y coste de copiar el
+    estado: deepcopy, save_state del guardado e instantáneas (Game.snapshot).
+    """
+    import copy
+    import tracemalloc
+    state = played_state()
+    holders = []
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(sessions):
+        g = Game.__new__(Game)
+        Game.apply_state(g, state)
+        holders.append((g.player, g.visited, g.flags))
+    per_session = (tracemalloc.get_traced_memory()[0] - before) / sessions
+    tracemalloc.stop()
+    g = Game.__new__(Game)
+    Game.apply_state(g, state)
+    g.turn = state['turn']
+    results = {'bytes_per_session': per_session}
+    copies = {
+        'deepcopy': lambda: copy.deepcopy((g.player, g.visited, g.flags, g.turn)),
+        'save_state': lambda: Game.save_state(g),
+    }
+    if hasattr(Game, 'state_hash'):
+        copies['state_hash'] = lambda: Game.state_hash(g)
+    if hasattr(Game, 'snapshot'):
+        g.running = True
+        if hasattr(Game, 'reseed'):
+            g.seed, g.rng = 1, random.Random()
+        snap = Game.snapshot(g)
+        copies['snapshot'] = lambda: Game.snapshot(g)
+        copies['restore'] = lambda: Game.restore(g, snap)
+    for name, fn in copies.items():
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        results[name + '_us'] = (time.perf_counter() - start) / repeat * 1e6
+    return results
+
+
+# -------------------------
+# Suite con línea base (JSON) y comparación
+# -------------------------
+class _Sink:
+    """stdout que lo descarta todo; tty=True para que se comporte como una terminal."""
+    def __init__(self, tty=False):
+        self.tty = tty
+
+    def isatty(self):
+        return self.tty
+
+    def write(self, s):
+        return len(s)
+
+    def flush(self):
+        pass
+
+
+def _timed(fn, number, rounds):
+    """(mediana, mínimo) en µs por llamada de `rounds` tandas de `number` llamadas."""
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number * 1e6)
+    times.sort()
+    return times[len(times) // 2], times[0]
+
+
+def _with_stdout(fn, out):
+    def run():
+        real = sys.stdout
+        sys.stdout = out
+        try:
+            fn()
+        finally:
+            sys.stdout = real
+    return run
+
+
+def case_show_map(cached=True):
+    """Mapa de la escena con TerminalIO (a un stdout que descarta)."""
+    game = Game(io=aventura2.TerminalIO(), seed=0)
+    game.player = aventura2.Player()
+    game.visited.update(['entrada', 'pasillo', 'lab'])
+    if cached:
+        return _with_stdout(game.show_map, _Sink()), 2000
+    return lambda: game.render_map(game.player.location), 300
+
+
+def case_slowprint(scene='entrada'):
+    """Todo el texto de una escena con slowprint a velocidad 0 en una terminal."""
+    rec = _RecordIO(["3"])
+    game = Game(io=rec, seed=0)
+    game.player = aventura2.Player()
+    game.player.location = scene
+    game.play(game.step())
+    io = aventura2.TerminalIO()
+
+    def run():
+        speed = aventura2.typewriter.speed
+        aventura2.set_text_speed(0)
+        try:
+            for text, delay, newline in rec.calls:
+                io.slowprint(text, delay, newline)
+        finally:
+            aventura2.set_text_speed(speed)
+    return _with_stdout(run, _Sink(tty=True)), 500
+
+
+def case_save_load(state, tmp, number):
+    """save_game + load_game (diario JSON en disco) con el estado dado."""
+    game = Game(io=NullIO(), seed=0)
+    game.save_filename = os.path.join(tmp, f"bench_{number}.json")
+    game.apply_state(state)
+
+    def run():
+        game.turn += 1  # cada guardado cambia algo, como en una partida
+        game.play(game.save_game())
+        game.play(game.load_game())
+    return run, number
+
+
+def case_encounter():
+    """Un combate completo contra un dron atacando siempre."""
+    game = Game(io=NullIO(lambda prompt, choices: "1"), seed=0)
+    game.player = aventura2.Player()
+
+    def run():
+        game.player.hp = game.player.max_hp
+        game.play(game.encounter_enemy(aventura2.ENEMIES.spawn('dron_hostil')))
+    return run, 1000
+
+
+def scripted_recording(seed=7):
+    """Grabación de una partida completa con la política aleatoria (siempre la misma)."""
+    rec = aventura2.Recording(seed)
+    game = Game(io=aventura2.RecordingIO(NullIO(random_policy(random.Random(seed))), rec),
+                seed=seed)
+    game.save_backend = aventura2.MemorySave()
+    game.start()
+    rec.finish(game)
+    return rec
+
+
+def case_playthrough():
+    """La partida grabada entera por begin + main_loop (aventura2.replay)."""
+    rec = scripted_recording()
+    return (lambda: aventura2.replay(rec)), 5
+
+
+def case_cold_start():
+    """Proceso nuevo: intérprete, importar aventura2 (compila las escenas) y crear un Game."""
+    import subprocess
+    here = os.path.dirname(os.path.abspath(__file__))
+    cmd = [sys.executable, "-c", "import aventura2; aventura2.Game(io=aventura2.NullIO())"]
+    return (lambda: subprocess.run(cmd, cwd=here, check=True)), 1
+
+
+def run_suite(rounds=5, only=None, progress=None):
+    """{métrica: {'us': mediana, 'min_us': mínimo}} de toda la suite."""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        cases = {
+            'show_map': lambda: case_show_map(cached=True),
+            'render_map': lambda: case_show_map(cached=False),
+            'slowprint_0': case_slowprint,
+            'guardar_cargar_corta': lambda: case_save_load(played_state(), tmp, 200),
+            'guardar_cargar_larga': lambda: case_save_load(long_session_state(), tmp, 20),
+            'combate': case_encounter,
+            'partida_guion': case_playthrough,
+            'arranque_frio': case_cold_start,
+        }
+        for name, case in cases.items():
+            if only and name not in only:
+                continue
+            fn, number = case()
+            fn()  # calentar cachés (mapas, tablas, bytecode)
+            median, best = _timed(fn, number, rounds)
+            results[name] = {'us': median, 'min_us': best}
+            if progress:
+                progress(name, results[name])
+    return results
+
+
+def write_baseline(results, filename):
+    import platform
+    data = {
+        'version': 1,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'date': time.strftime("%Y-%m-%d %H:%M:%S"),
+        'metrics': results,
+    }
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def compare(results, baseline, threshold):
+    """
+    [(métrica, base_us, actual_us, cambio relativo, ¿regresión?)] comparando
+    la mejor tanda de cada métrica (mucho menos ruidosa que la mediana); es
+    regresión si empeora más que `threshold`.
+    """
+    rows = []
+    for name, m in results.items():
+        base = baseline['metrics'].get(name)
+        if base is None:
+            rows.append((name, None, m['min_us'], None, False))
+            continue
+        change = m['min_us'] / base['min_us'] - 1.0
+        rows.append((name, base['min_us'], m['min_us'], change, change > threshold))
+    return rows
+
+
+def _fmt_us(us):
+    if us is None:
+        return "-"
+    if us >= 1e6:
+        return f"{us / 1e6:.2f}s"
+    if us >= 1e3:
+        return f"{us / 1e3:.2f}ms"
+    return f"{us:.2f}us"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks sin cabeza de Ecos de Halcyon")
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--slowprint", action="store_true", help="comparar renderizado de texto")
+    parser.add_argument("--codecs", action="store_true", help="comparar formatos de guardado")
+    parser.add_argument("--estado", action="store_true", help="memoria por sesión y coste de copiar el estado")
+    parser.add_argument("--suite", action="store_true",
+                        help="mapa, slowprint, guardado, combate, partida y arranque")
+    parser.add_argument("--base", metavar="ARCHIVO", help="guardar los resultados de la suite en JSON")
+    parser.add_argument("--comparar", metavar="ARCHIVO",
+                        help="comparar la suite con una línea base; falla si algo empeora")
+    parser.add_argument("--umbral", type=float, default=0.20,
+                        help="empeoramiento relativo permitido al comparar (0.20 = 20%%)")
+    parser.add_argument("--rondas", type=int, default=5, help="tandas por métrica")
+    parser.add_argument("--solo", help="métricas de la suite separadas por comas")
+    args = parser.parse_args()
+    if args.suite or args.base or args.comparar:
+        only = set(args.solo.split(",")) if args.solo else None
+        results = run_suite(args.rondas, only, lambda name, m: print(
+            f"  {name:<22} {_fmt_us(m['us']):>10}  (mín {_fmt_us(m['min_us'])})", flush=True))
+        if args.base:
+            write_baseline(results, args.base)
+            print(f"Línea base guardada en {args.base}")
+        if args.comparar:
+            with open(args.comparar, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+            rows = compare(results, baseline, args.umbral)
+            print(f"Comparación con {args.comparar} (umbral {100 * args.umbral:.0f}%):")
+            for name, base, now, change, bad in rows:
+                delta = "nueva" if change is None else f"{100 * change:+.1f}%"
+                print(f"  {name:<22} {_fmt_us(base):>10} -> {_fmt_us(now):>10}  {delta:>8}"
+                      f"{'  REGRESIÓN' if bad else ''}")
+            if any(bad for *_, bad in rows):
+                sys.exit(1)
+        return
+    r = bench_headless(args.games, args.seed)
+    print(f"{r['games']} partidas, {r['turns']} turnos en {r['seconds']:.3f}s "
+          f"-> {r['turns_per_second']:.0f} turnos/s")
+    if args.slowprint:
+        r = bench_slowprint()
+        print(f"slowprint en '{r['scene']}' (nominal {r['nominal_seconds']:.2f}s):")
+        for name in ('por_caracter', 'typewriter'):
+            m = r[name]
+            print(f"  {name:<13} {m['writes']:>5} writes {m['flushes']:>5} flushes "
+                  f"{m['sleeps']:>5} sleeps  {m['seconds']:.3f}s")
+    if args.estado:
+        r = bench_state()
+        print(f"estado: {r.pop('bytes_per_session'):.0f} bytes por sesión")
+        for name, us in r.items():
+            print(f"  {name[:-3]:<12} {us:8.2f}us")
+    if args.codecs:
+        print("formatos de guardado (sesión corta / larga):")
+        results = bench_codecs(rounds=args.rondas)
+        for (label, name), m in results.items():
+            print(f"  {label:<6} {name:<12} {m['bytes']:>7} B  "
+                  f"codificar {m['encode_us']:>8.1f}us  decodificar {m['decode_us']:>8.1f}us")
+        failures = check_codecs(results)
+        for failure in failures:
+            print(f"  REGRESIÓN: {failure}")
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Catálogo de textos de Ecos de Halcyon: extrae los textos del juego y compila
+las traducciones al formato indexado que lee aventura2.TextCatalog.
+
+Los textos se escriben en español en el código; su ID es un hash del
+original (aventura2.text_id). Una traducción es un JSON {id: texto}:
+
+    python3 catalog.py extraer textos/es.json
+    cp textos/es.json textos/en.json     # ... y se traduce cada valor
+    python3 catalog.py compilar textos/en.json --idioma en
+    python3 aventura2.py --idioma en
+
+Los {huecos} de un texto ({n}, {enemigo}...) tienen que seguir en la
+traducción con el mismo nombre. Al cambiar textos del juego:
+
+    python3 catalog.py extraer textos/es.json --actualizar textos/en.json
+
+conserva las traducciones que siguen valiendo, añade los textos nuevos (en
+español) y quita los que ya no existen.
+"""
+
+import argparse
+import ast
+import json
+import os
+import sys
+
+import aventura2
+from aventura2 import ENEMY_TYPES, SCENES, TRAVEL_OPTION, Game, NullIO, TextCatalog, text_id
+
+# textos que el juego traduce desde variables (Game.text(d) de las salidas)
+EXTRA_TEXTS = ("norte", "sur", "oeste", "este")
+
+
+def _effect_texts(effects):
+    for effect in effects:
+        kind = effect[0]
+        if kind in ('say', 'title', 'wait'):
+            yield effect[1]
+        elif kind == 'if':
+            yield from _effect_texts(effect[2])
+            if len(effect) > 3:
+                yield from _effect_texts(effect[3])
+        elif kind == 'menu':
+            yield from _menu_texts(effect[1], effect[2])
+
+
+def _menu_texts(header, options):
+    if header:
+        yield header
+    for option in options:
+        yield option['text']
+        yield from _effect_texts(option['do'])
+
+
+def scene_texts():
+    """Los textos de SCENES: efectos, cabeceras y opciones de los menús."""
+    for data in SCENES.values():
+        if 'require' in data:
+            yield from _effect_texts(data['require'][1])
+        for part in ('first', 'again', 'intro'):
+            if part in data:
+                yield from _effect_texts(data[part])
+        if 'options' in data:
+            yield from _menu_texts(data.get('header'), data['options'])
+    yield from _menu_texts(None, [TRAVEL_OPTION])
+
+
+def station_texts():
+    """Los nombres de las salas de la estación por defecto (Game.room_label)."""
+    return Game(io=NullIO()).map_labels.values()
+
+
+def enemy_texts():
+    """Nombres y descripciones de ENEMY_TYPES (los muestra Game.encounter_enemy)."""
+    for data in ENEMY_TYPES.values():
+        yield data['name']
+        if data.get('desc'):
+            yield data['desc']
+
+
+def code_texts(filename):
+    """Los textos constantes de `filename` pasados a .text(...), translate(...) o localized(...)."""
+    with open(filename, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename)
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        func = node.func
+        name = func.attr if isinstance(func, ast.Attribute) else getattr(func, 'id', None)
+        args = node.args
+        if name == 'translate' and len(args) > 1:
+            arg = args[1]
+        elif name in ('text', 'localized') and args:
+            arg = args[0]
+        else:
+            continue
+        if isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+            yield arg.value
+
+
+def extract():
+    """{id en hexadecimal: texto original}, en el orden en que aparecen."""
+    texts = {}
+    sources = (scene_texts(), station_texts(), enemy_texts(), code_texts(aventura2.__file__), EXTRA_TEXTS)
+    for source in sources:
+        for text in source:
+            texts.setdefault(f"{text_id(text):016x}", text)
+    return texts
+
+
+def load(filename):
+    """Una traducción JSON como {id: texto} con los IDs como enteros."""
+    with open(filename, encoding='utf-8') as f:
+        data = json.load(f)
+    return {int(key, 16): text for key, text in data.items()}
+
+
+def save(filename, texts):
+    os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+    tmp = filename + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(texts, f, ensure_ascii=False, indent=1)
+        f.write("\n")
+    os.replace(tmp, filename)
+
+
+def cmd_extract(args):
+    texts = extract()
+    if args.archivo:
+        save(args.archivo, texts)
+        print(f"{len(texts)} textos en {args.archivo}")
+    else:
+        json.dump(texts, sys.stdout, ensure_ascii=False, indent=1)
+        print()
+    if args.actualizar:
+        with open(args.actualizar, encoding='utf-8') as f:
+            old = json.load(f)
+        kept = {key: old.get(key, text) for key, text in texts.items()}
+        new = sum(1 for key in texts if key not in old)
+        gone = sum(1 for key in old if key not in texts)
+        save(args.actualizar, kept)
+        print(f"{args.actualizar}: {new} textos nuevos, {gone} quitados", file=sys.stderr)
+
+
+def cmd_compile(args):
+    texts = load(args.traduccion)
+    output = args.salida or os.path.splitext(args.traduccion)[0] + ".cat"
+    language = args.idioma or os.path.splitext(os.path.basename(args.traduccion))[0]
+    TextCatalog.write(output, texts, language[:8])
+    print(f"{len(texts)} textos ({language}) en {output}: {os.path.getsize(output)} bytes")
+
+
+def cmd_show(args):
+    catalog = TextCatalog(args.catalogo)
+    print(f"{args.catalogo}: idioma {catalog.language or '-'}, {len(catalog)} textos, "
+          f"{catalog.mask + 1} ranuras, {os.path.getsize(args.catalogo)} bytes")
+    for text in args.textos:
+        print(f"{text!r} -> {catalog.get(text_id(text))!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Catálogo de textos (traducciones) de Ecos de Halcyon")
+    sub = parser.add_subparsers(dest="orden", required=True)
+    p = sub.add_parser("extraer", help="extraer los textos del juego a JSON")
+    p.add_argument("archivo", nargs="?", help="JSON de salida (por defecto, la salida estándar)")
+    p.add_argument("--actualizar", metavar="TRADUCCION",
+                   help="poner al día una traducción existente con los textos actuales")
+    p.set_defaults(fn=cmd_extract)
+    p = sub.add_parser("compilar", help="compilar una traducción JSON a un catálogo indexado")
+    p.add_argument("traduccion", help="JSON {id: texto}")
+    p.add_argument("-o", "--salida", help="catálogo de salida (por defecto, el JSON con extensión .cat)")
+    p.add_argument("--idioma", help="código del idioma (por defecto, el nombre del archivo)")
+    p.set_defaults(fn=cmd_compile)
+    p = sub.add_parser("ver", help="resumen de un catálogo compilado (y buscar textos originales)")
+    p.add_argument("catalogo")
+    p.add_argument("textos", nargs="*", help="textos en español que buscar")
+    p.set_defaults(fn=cmd_show)
+    args = parser.parse_args()
+    args.fn(args)
+
+
+if __name__ == "__main__":
+    main()
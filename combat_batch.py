@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Resolución de combates en lote con NumPy.
+Simula millones de peleas "siempre atacar" a la vez con las mismas reglas que
+Game.encounter_enemy:
+  - jugador: randint(1, ataque) + 2, menos la defensa del enemigo
+  - enemigo: randint(1, ataque), menos la defensa del jugador (si sigue vivo)
+NumPy es opcional para el juego; sólo este módulo lo necesita.
+Ejecuta: python3 combat_batch.py --fights 1000000
+"""
+
+import argparse
+import time
+
+try:
+    import numpy as np
+except ImportError:  # el juego funciona sin numpy
+    np = None
+
+from aventura2 import ENEMIES, Player
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("combat_batch necesita numpy: pip install numpy")
+
+
+def resolve_batch(p_hp, p_attack, p_defense, e_hp, e_attack, e_defense,
+                  n=None, seed=None, max_rounds=200):
+    """
+    Resuelve peleas en paralelo. Todos los parámetros aceptan escalares o
+    arrays (se hace broadcasting); n fuerza el número de peleas.
+    Devuelve un dict con arrays por pelea:
+      'win'    bool: el jugador ganó
+      'lose'   bool: el jugador murió
+      'rounds' int: rondas jugadas
+      'hp_left' int: HP final del jugador (puede ser negativo)
+      'hp_lost' int: HP perdido por el jugador
+    Las peleas que llegan a max_rounds (ningún lado hace daño) no son ni
+    victoria ni derrota.
+    """
+    _require_numpy()
+    rng = np.random.default_rng(seed)
+    arrays = np.broadcast_arrays(*(np.asarray(a, dtype=np.int64) for a in
+                                   (p_hp, p_attack, p_defense, e_hp, e_attack, e_defense)))
+    if n is not None:
+        arrays = [np.broadcast_to(a, np.broadcast_shapes(a.shape, (n,))) for a in arrays]
+    p_hp0, p_att, p_def, e_hp0, e_att, e_def = (a.ravel().copy() for a in arrays)
+    size = p_hp0.shape[0]
+
+    php = p_hp0.copy()
+    ehp = e_hp0.copy()
+    rounds = np.zeros(size, dtype=np.int64)
+    active = (php > 0) & (ehp > 0)
+    idx = np.flatnonzero(active)
+    for _ in range(max_rounds):
+        if idx.size == 0:
+            break
+        rounds[idx] += 1
+        # ataque del jugador: randint(1, attack) + 2 -> integers(1, attack+1)
+        dmg = rng.integers(1, p_att[idx] + 1) + 2
+        ehp[idx] -= np.maximum(0, dmg - e_def[idx])
+        # contraataque sólo de los enemigos que siguen vivos
+        alive = ehp[idx] > 0
+        hit = idx[alive]
+        edmg = rng.integers(1, e_att[hit] + 1)
+        php[hit] -= np.maximum(0, edmg - p_def[hit])
+        idx = hit[php[hit] > 0]
+
+    win = (ehp <= 0) & (php > 0)
+    lose = php <= 0
+    return {
+        'win': win,
+        'lose': lose,
+        'rounds': rounds,
+        'hp_left': php,
+        'hp_lost': p_hp0 - np.maximum(php, 0),
+    }
+
+
+def summarize_batch(result):
+    """Tasas de victoria/derrota, rondas esperadas e histograma de HP perdido."""
+    _require_numpy()
+    n = result['win'].size
+    return {
+        'fights': n,
+        'win_rate': float(result['win'].mean()),
+        'lose_rate': float(result['lose'].mean()),
+        'stalemate_rate': float(1.0 - result['win'].mean() - result['lose'].mean()),
+        'expected_rounds': float(result['rounds'].mean()),
+        'hp_lost_hist': np.bincount(result['hp_lost']),
+    }
+
+
+def fight_odds(enemy, player=None, n=100000, seed=None):
+    """Atajo: resume n peleas de `player` (por defecto uno nuevo) contra `enemy`."""
+    player = player or Player()
+    return summarize_batch(resolve_batch(player.hp, player.attack, player.defense,
+                                         enemy.hp, enemy.attack, enemy.defense, n=n, seed=seed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Combates en lote con NumPy")
+    parser.add_argument("--fights", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    enemies = [ENEMIES.spawn(key) for key in ('dron_hostil', 'automata', 'torreta', 'patrulla', 'nucleo')]
+    for enemy in enemies:
+        start = time.perf_counter()
+        s = fight_odds(enemy, n=args.fights, seed=args.seed)
+        elapsed = time.perf_counter() - start
+        print(f"{enemy.name:<30} victoria {100 * s['win_rate']:6.2f}%  "
+              f"rondas {s['expected_rounds']:5.2f}  ({elapsed:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
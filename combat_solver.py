@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Solver exacto de combates (cadena de Markov / MDP pequeño).
+Una pelea de Game.encounter_enemy sólo depende de (HP jugador, HP enemigo,
+estadísticas, objetos de combate), así que la probabilidad de ganar y el HP
+esperado se calculan exactamente por programación dinámica, sin muestrear.
+La tabla se rellena de abajo arriba (sin recursión) y se guarda entera, una
+capa de objetos por array('d'), así que las consultas siguientes con las
+mismas estadísticas son una búsqueda por índice. Tablas y capas se cachean con
+LRU acotados; con HP enormes sólo se guardan las últimas filas.
+Ejecuta: python3 combat_solver.py
+"""
+
+import functools
+import heapq
+import itertools
+from array import array
+from collections import Counter, OrderedDict
+
+from aventura2 import ENEMIES, Player
+
+ACTIONS = ('attack', 'kit_medico', 'municion', 'antiviral', 'implante', 'flee')
+# objetos que cambian algo en use_item_in_combat, en el orden de la tupla `items`
+COMBAT_ITEMS = ('kit_medico', 'municion', 'antiviral', 'implante')
+KIT_HEAL = 12
+FLEE_CHANCE = 0.5
+
+
+class CombatOutcome:
+    """Resultado de un estado bajo la política óptima."""
+    __slots__ = ('value', 'win', 'flee', 'lose', 'hp', 'action')
+
+    def __init__(self, value, win, flee, lose, hp, action):
+        self.value = value    # win + flee_value * flee
+        self.win = win        # probabilidad de derrotar al enemigo
+        self.flee = flee      # probabilidad de huir con éxito
+        self.lose = lose      # probabilidad de morir
+        self.hp = hp          # HP esperado al terminar (0 si mueres)
+        self.action = action  # mejor acción en este estado
+
+    def __repr__(self):
+        return (f"CombatOutcome(action={self.action!r}, win={self.win:.4f}, "
+                f"flee={self.flee:.4f}, lose={self.lose:.4f}, hp={self.hp:.2f})")
+
+
+class CombatTable:
+    """
+    Tabla de valores para unas estadísticas fijas. Al pedir un estado
+    (hp, hp_enemigo, items) se rellenan todas las capas de objetos hasta
+    `items` y se guardan (LRU de hasta `max_cells` estados); los estados que
+    ya caben en una capa guardada no recalculan nada.
+    items: tupla de cantidades en el orden de COMBAT_ITEMS.
+    """
+    def __init__(self, max_hp, attack, defense, e_attack, e_defense,
+                 actions=ACTIONS, flee_value=0.0, max_cells=250_000):
+        self.max_hp = max_hp
+        self.attack = attack
+        self.defense = defense
+        self.e_attack = e_attack
+        self.e_defense = e_defense
+        self.actions = actions
+        self.flee_value = flee_value
+        # capa de objetos -> (top, e_top, valores, acciones, tras), LRU por
+        # estados: valores[4 * i:4 * i + 4] = (win, flee, lose, hp), acciones[i]
+        # el índice en self.actions y tras[4 * i:4 * i + 4] el valor tras el
+        # turno enemigo (para rellenar capas con más objetos) del estado
+        # i = (hp_enemigo - 1) * (top + 1) + hp
+        self.layers = OrderedDict()
+        self.cells = 0
+        self.max_cells = max_cells
+        # cotas de HP de la última tabla rellenada (nunca bajan)
+        self.top = max_hp
+        self.e_top = 0
+
+    # --- transiciones ---
+    def _enemy_turn(self, php, ehp, items, prob, out):
+        # el enemigo sigue vivo: randint(1, ataque) menos nuestra defensa
+        p = prob / self.e_attack
+        for j in range(1, self.e_attack + 1):
+            hp2 = php - max(0, j - self.defense)
+            if hp2 <= 0:
+                out[('lose',)] += p
+            else:
+                out[('state', hp2, ehp, items)] += p
+
+    def _hit(self, php, ehp, items, dmg, prob, out):
+        ehp2 = ehp - max(0, dmg - self.e_defense)
+        if ehp2 <= 0:
+            out[('win', php)] += prob
+        else:
+            self._enemy_turn(php, ehp2, items, prob, out)
+
+    def _use(self, items, k):
+        return items[:k] + (items[k] - 1,) + items[k + 1:]
+
+    def outcomes(self, php, ehp, items, action):
+        """Distribución de resultados de una acción, o None si no se puede."""
+        out = Counter()
+        if action == 'attack':
+            p = 1.0 / self.attack
+            for k in range(1, self.attack + 1):
+                self._hit(php, ehp, items, k + 2, p, out)
+        elif action == 'flee':
+            out[('flee', php)] += FLEE_CHANCE
+            self._enemy_turn(php, ehp, items, 1.0 - FLEE_CHANCE, out)
+        else:
+            k = COMBAT_ITEMS.index(action)
+            if not items[k]:
+                return None
+            rest = self._use(items, k)
+            if action == 'kit_medico':
+                self._enemy_turn(min(self.max_hp, php + KIT_HEAL), ehp, rest, 1.0, out)
+            elif action == 'municion':
+                for dmg in range(6, 13):
+                    self._hit(php, ehp, rest, dmg, 1.0 / 7, out)
+            elif action == 'antiviral':
+                self._hit(php, ehp, rest, 6, 1.0, out)
+            else:
+                self._hit(php, ehp, rest, 8, 1.0, out)
+        return out
+
+    # --- valores ---
+    def solve(self, php, ehp, items=(0, 0, 0, 0)):
+        """CombatOutcome óptimo del estado (php, ehp, items)."""
+        if php <= 0:
+            return CombatOutcome(0.0, 0.0, 0.0, 1.0, 0.0, None)
+        if ehp <= 0:
+            return CombatOutcome(1.0, 1.0, 0.0, 0.0, php, None)
+        layer = self.layers.get(items)
+        if layer is None or php > layer[0] or ehp > layer[1]:
+            top = max(self.top, php)
+            e_top = max(self.e_top, ehp)
+            cells = e_top * (top + 1)
+            for n in items:
+                cells *= n + 1
+            if cells > self.max_cells:
+                # no cabe: sólo las últimas filas, sin guardar nada
+                return self._fill(php, ehp, items)
+            self.top, self.e_top = top, e_top
+            self._fill(top, e_top, items, store=True)
+            layer = self.layers[items]
+        self.layers.move_to_end(items)
+        top, _, values, actions, _ = layer
+        i = (ehp - 1) * (top + 1) + php
+        win, flee, lose, hp = values[4 * i:4 * i + 4]
+        return CombatOutcome(win + self.flee_value * flee, win, flee, lose, hp,
+                             self.actions[actions[i]])
+
+    def _store(self, items, layer):
+        old = self.layers.pop(items, None)
+        if old is not None:
+            self.cells -= len(old[3])
+        self.layers[items] = layer
+        self.cells += len(layer[3])
+        while self.cells > self.max_cells and len(self.layers) > 1:
+            _, old = self.layers.popitem(last=False)
+            self.cells -= len(old[3])
+
+    @staticmethod
+    def _better(a, b):
+        # más valor; a igualdad, más HP esperado; a igualdad, la primera acción
+        if abs(a.value - b.value) > 1e-12:
+            return a.value > b.value
+        return a.hp > b.hp + 1e-9
+
+    def _fill(self, php, ehp, items, store=False):
+        """
+        Rellena la tabla de abajo arriba hasta (php, ehp, items), sin
+        recursión. Cada acción lleva a menos HP enemigo, a menos HP propio en
+        la misma fila o a menos objetos, así que basta recorrer el HP enemigo
+        de 1 a ehp y, en cada fila, los objetos y el HP propio de menos a más.
+        Para calcular sólo hacen falta las últimas filas (tantas como el mayor
+        golpe); con store=True además se guarda cada capa completa en
+        self.layers. Devuelve el resultado de (php, ehp, items).
+        """
+        top = max(php, self.max_hp)
+        e_attack = self.e_attack
+        # el turno enemigo quita d = 1..m con probabilidad 1/e_attack cada uno
+        m = max(0, e_attack - self.defense)
+        q0 = (e_attack - m) / e_attack  # no hace daño
+        qe = 1.0 / e_attack
+        e_def = self.e_defense
+        hits = {
+            'attack': [(max(0, k + 2 - e_def), 1.0 / self.attack) for k in range(1, self.attack + 1)],
+            'municion': [(max(0, d - e_def), 1.0 / 7) for d in range(6, 13)],
+            'antiviral': [(max(0, 6 - e_def), 1.0)],
+            'implante': [(max(0, 8 - e_def), 1.0)],
+        }
+        depth = max(dmg for hit in hits.values() for dmg, _ in hit) + 1
+        actions = [a for a in self.actions if a in ('attack', 'flee') or a in COMBAT_ITEMS]
+        layers = list(itertools.product(*(range(n + 1) for n in items)))
+        index = {layer: i for i, layer in enumerate(layers)}
+        rest_of = [[index[self._use(layer, k)] if layer[k] else None for k in range(len(COMBAT_ITEMS))]
+                   for layer in layers]
+        # after[capa][fila] = valor esperado (win, flee, lose, hp) por HP propio
+        # tras el turno enemigo; el índice 0 es "muerto"
+        dead = (0.0, 0.0, 1.0, 0.0)
+        after = [{} for _ in layers]
+        flee_value = self.flee_value
+        result = None
+        stride = top + 1
+        if store:
+            action_index = {a: i for i, a in enumerate(self.actions)}
+            tables = []
+            for li, layer in enumerate(layers):
+                cached = self.layers.get(layer)
+                if cached is not None and cached[0] >= top and cached[1] >= ehp:
+                    # ya guardada: sus filas tras el turno enemigo sirven tal cual
+                    cached_after = cached[4]
+                    for e in range(1, ehp + 1):
+                        j = 4 * (e - 1) * (cached[0] + 1)
+                        after[li][e] = [dead] + [tuple(cached_after[j + 4 * p:j + 4 * p + 4])
+                                                 for p in range(1, top + 1)]
+                    tables.append(None)
+                else:
+                    tables.append((array('d', bytes(32 * ehp * stride)), array('b', bytes(ehp * stride)),
+                                   array('d', bytes(32 * ehp * stride))))
+
+        for e in range(1, ehp + 1):
+            for li, layer in enumerate(layers):
+                if store and tables[li] is None:
+                    continue
+                rests = rest_of[li]
+                values = [dead] * (top + 1)
+                row_after = [dead] * (top + 1)
+                rows = after[li]
+                for p in range(1, top + 1):
+                    # turno enemigo desde (p, e) sin contar "no hace daño" (el propio estado)
+                    pw = pf = pl = ph = 0.0
+                    for d in range(1, m + 1):
+                        w, f, l, h = values[p - d] if p > d else dead
+                        pw += w
+                        pf += f
+                        pl += l
+                        ph += h
+                    partial = (pw * qe, pf * qe, pl * qe, ph * qe)
+                    best = None
+                    for action in actions:
+                        win = flee = lose = hp = stay = 0.0
+                        if action == 'flee':
+                            flee, hp = FLEE_CHANCE, FLEE_CHANCE * p
+                            q = 1.0 - FLEE_CHANCE
+                            win, f, lose, h = (q * x for x in partial)
+                            flee += f
+                            hp += h
+                            stay = q * q0
+                        elif action == 'kit_medico':
+                            r = rests[0]
+                            if r is None:
+                                continue
+                            win, flee, lose, hp = after[r][e][min(self.max_hp, p + KIT_HEAL)]
+                        else:
+                            if action == 'attack':
+                                r = None
+                            else:
+                                r = rests[COMBAT_ITEMS.index(action)]
+                                if r is None:
+                                    continue
+                            for dmg, q in hits[action]:
+                                e2 = e - dmg
+                                if e2 <= 0:
+                                    win += q
+                                    hp += q * p
+                                    continue
+                                if dmg == 0 and r is None:
+                                    w, f, l, h = partial
+                                    stay += q * q0
+                                else:
+                                    w, f, l, h = (after[li] if r is None else after[r])[e2][p]
+                                win += q * w
+                                flee += q * f
+                                lose += q * l
+                                hp += q * h
+                        if stay >= 1.0 - 1e-12:
+                            # tablas: nadie puede dañar a nadie
+                            cand = CombatOutcome(0.0, 0.0, 0.0, 0.0, p, action)
+                        else:
+                            scale = 1.0 / (1.0 - stay)
+                            win, flee, lose, hp = win * scale, flee * scale, lose * scale, hp * scale
+                            cand = CombatOutcome(win + flee_value * flee, win, flee, lose, hp, action)
+                        if best is None or self._better(cand, best):
+                            best = cand
+                    values[p] = (best.win, best.flee, best.lose, best.hp)
+                    row_after[p] = (partial[0] + q0 * best.win, partial[1] + q0 * best.flee,
+                                    partial[2] + q0 * best.lose, partial[3] + q0 * best.hp)
+                    if store:
+                        i = (e - 1) * stride + p
+                        j = 4 * i
+                        table_values, table_actions, table_after = tables[li]
+                        table_values[j:j + 4] = array('d', values[p])
+                        table_after[j:j + 4] = array('d', row_after[p])
+                        table_actions[i] = action_index[best.action]
+                    if e == ehp and layer == items and p == php:
+                        result = best
+                rows[e] = row_after
+                rows.pop(e - depth, None)
+        if store:
+            for layer, table in zip(layers, tables):
+                if table is not None:
+                    self._store(layer, (top, ehp) + table)
+        return result
+
+@functools.lru_cache(maxsize=1024)
+def combat_table(max_hp, attack, defense, e_attack, e_defense, actions=ACTIONS, flee_value=0.0):
+    """Tabla (cacheada con LRU) para una tupla de estadísticas."""
+    return CombatTable(max_hp, attack, defense, e_attack, e_defense, actions, flee_value)
+
+
+def _items_of(player):
+    return tuple(player.inventory.count(name) for name in COMBAT_ITEMS)
+
+
+def _solve(table, php, ehp, items):
+    return table.solve(php, ehp, items)
+
+
+def attack_odds(player, enemy):
+    """Probabilidades exactas si el jugador siempre ataca."""
+    table = combat_table(player.max_hp, player.attack, player.defense,
+                         enemy.attack, enemy.defense, ('attack',))
+    return _solve(table, player.hp, enemy.hp, (0, 0, 0, 0))
+
+
+def attack_distribution(player, enemy):
+    """
+    Distribución exacta del final de la pelea si el jugador siempre ataca:
+    {('win', hp_final): p, ('lose',): p}, y ('draw', hp) si nadie puede
+    hacer daño.
+    """
+    if enemy.hp <= 0:
+        return {('win', player.hp): 1.0}
+    if player.hp <= 0:
+        return {('lose',): 1.0}
+    return _attack_distribution(player.max_hp, player.attack, player.defense,
+                                enemy.attack, enemy.defense, player.hp, enemy.hp)
+
+
+@functools.lru_cache(maxsize=4096)
+def _attack_distribution(max_hp, attack, defense, e_attack, e_defense, hp, e_hp):
+    """
+    Cada ronda baja hp + hp_enemigo (o se repite sin daño), así que los
+    estados se recorren de mayor a menor suma propagando probabilidad.
+    """
+    table = combat_table(max_hp, attack, defense, e_attack, e_defense, ('attack',))
+    none = (0, 0, 0, 0)
+    result = Counter()
+    mass = {(hp, e_hp): 1.0}
+    heap = [(-(hp + e_hp), hp, e_hp)]
+    while heap:
+        _, php, ehp = heapq.heappop(heap)
+        p = mass.pop((php, ehp))
+        out = table.outcomes(php, ehp, none, 'attack')
+        stay = out.pop(('state', php, ehp, none), 0.0)
+        if stay >= 1.0:
+            result[('draw', php)] += p
+            continue
+        p /= 1.0 - stay
+        for outcome, q in out.items():
+            if outcome[0] == 'state':
+                key = outcome[1:3]
+                if key not in mass:
+                    mass[key] = 0.0
+                    heapq.heappush(heap, (-(key[0] + key[1]),) + key)
+                mass[key] += p * q
+            else:
+                result[outcome] += p * q
+    return dict(result)
+
+
+def best_action(player, enemy, flee_value=0.0):
+    """
+    Política óptima del MDP atacar/objeto/huir para el estado actual.
+    flee_value: cuánto vale huir comparado con ganar (0 = sólo cuenta ganar).
+    """
+    table = combat_table(player.max_hp, player.attack, player.defense,
+                         enemy.attack, enemy.defense, ACTIONS, flee_value)
+    return _solve(table, player.hp, enemy.hp, _items_of(player))
+
+
+def main():
+    player = Player()
+    enemies = [ENEMIES.spawn(key) for key in ('dron_hostil', 'automata', 'torreta', 'patrulla', 'nucleo')]
+    print("Jugador nuevo (30 HP, 6/2), siempre atacando:")
+    for enemy in enemies:
+        r = attack_odds(player, enemy)
+        print(f"  {enemy.name:<30} victoria {100 * r.win:6.2f}%  HP esperado {r.hp:5.2f}")
+    player.inventory = ["kit_medico", "municion", "implante"]
+    print("Con kit_medico, municion e implante, política óptima:")
+    for enemy in enemies:
+        r = best_action(player, enemy)
+        print(f"  {enemy.name:<30} victoria {100 * r.win:6.2f}%  primera acción: {r.action}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Registro de eventos de juego de Ecos de Halcyon: cada transición de estado
+se escribe como una línea JSON (NDJSON) en un sumidero con búfer y rotación.
+analytics.py los agrega después (embudos, finales, mapas de elecciones).
+
+Como metrics.py, no cambia Game: attach() envuelve los métodos de una
+partida concreta y compara el estado al final de cada turno. Lo único que
+la partida avisa por sí misma son las rondas de combate (Game.events).
+
+    log = EventLog("eventos")
+    attach(game, log)
+    ...
+    log.close()
+
+Cada evento lleva session (la semilla de la partida), turn, type, scene (la
+ubicación en la que ocurrió) y ts (milisegundos desde 1970). Tipos y campos
+propios:
+
+    start         loaded (si la sesión empezó cargando una partida)
+    location      from, to
+    choice        prompt, answer, option (el texto de la opción elegida)
+    flag          name, value (None si se borró)
+    item_gained   item, count
+    item_used     item, count
+    memory        memory
+    combat_round  enemy, round, action, hp, enemy_hp
+    combat_end    enemy, origin (el origin= de encounter_enemy, p. ej. combat_core,
+                  o la escena), result, rounds, hp
+    death         cause (el origin del combate en que moriste)
+    ending        ending
+    load, rewind  (el estado salta: no se emiten diferencias)
+
+Ejecuta: python3 aventura2.py --eventos eventos/
+         python3 simulate.py --games 100000 --eventos eventos/
+"""
+
+import json
+import os
+import re
+import time
+
+from aventura2 import FLAGS, Inventory, set_bits
+
+# acciones del menú de combate de Game.encounter_enemy
+ACTIONS = {'1': 'atacar', '2': 'objeto', '3': 'huir'}
+
+OPTION_LINE = re.compile(r"(\d+)\) (.*)")
+
+
+class EventLog:
+    """
+    Sumidero NDJSON: una línea por evento, escritas en bloques de
+    `buffer_size` bytes. Al empezar una sesión, si el archivo actual ya pasa
+    de `max_bytes` se abre otro, de modo que una sesión nunca se parte entre
+    dos archivos y cada uno se puede agregar por separado.
+
+    Archivos: <directorio>/<prefijo>-<fecha>-<pid>-<n>.ndjson. El pid en el
+    nombre deja que varios procesos escriban en el mismo directorio.
+    """
+    def __init__(self, directory, prefix="eventos", max_bytes=64 << 20, buffer_size=1 << 20):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.buffer_size = buffer_size
+        self.stamp = time.strftime("%Y%m%d%H%M%S")
+        self.encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+        self.buffer = []
+        self.buffered = 0
+        self.file = None
+        self.filename = None
+        self.size = 0
+        self.index = 0
+        self.count = 0
+
+    def write(self, event):
+        line = self.encode(event)
+        self.buffer.append(line)
+        self.buffered += len(line) + 1
+        self.count += 1
+        if self.buffered >= self.buffer_size:
+            self.flush()
+
+    def boundary(self):
+        """Entre dos sesiones: rota si el archivo actual ya es grande."""
+        if self.file is not None and self.size + self.buffered >= self.max_bytes:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+    def flush(self):
+        if not self.buffer:
+            return
+        if self.file is None:
+            self._open()
+        data = ("\n".join(self.buffer) + "\n").encode('utf-8')
+        self.file.write(data)
+        self.size += len(data)
+        self.buffer = []
+        self.buffered = 0
+
+    def _open(self):
+        self.index += 1
+        self.filename = os.path.join(
+            self.directory, f"{self.prefix}-{self.stamp}-{os.getpid()}-{self.index:04d}.ndjson")
+        # en modo añadir: otro EventLog del mismo proceso nunca pisa un archivo
+        self.file = open(self.filename, 'ab', buffering=0)
+        self.size = self.file.tell()
+
+    def close(self):
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# -------------------------
+# Eventos de una partida
+# -------------------------
+class EventIO:
+    """
+    Envuelve el backend de una partida para emitir cada elección de menú,
+    con el texto de la opción elegida (sacado del menú o de las líneas
+    "N) ..." que se acaban de mostrar).
+    """
+    def __init__(self, io, events):
+        self.io = io
+        self.events = events
+        self.lines = ()     # del último menú; se buscan sólo al elegir
+        self.printed = {}   # opciones "N) ..." sueltas
+        # lo que no se mira va directo al backend (sin pasar por __getattr__)
+        self.slowprint = io.slowprint
+        self.cls = io.cls
+        self.sleep = io.sleep
+        self.input = io.input
+
+    def __getattr__(self, name):
+        return getattr(self.io, name)
+
+    def print(self, *args, sep=" ", end="\n"):
+        if args and str(args[0])[:1].isdigit():
+            match = OPTION_LINE.match(sep.join(str(a) for a in args))
+            if match:
+                self.printed[match.group(1)] = match.group(2)
+        self.io.print(*args, sep=sep, end=end)
+
+    def menu(self, header, lines):
+        self.lines = lines
+        self.io.menu(header, lines)
+
+    def option(self, answer):
+        if answer in self.printed:
+            return self.printed[answer]
+        if answer.isdigit() and 0 < int(answer) <= len(self.lines):
+            match = OPTION_LINE.match(self.lines[int(answer) - 1])
+            if match and match.group(1) == answer:
+                return match.group(2)
+        return answer
+
+    def input_choice(self, prompt, choices):
+        answer = self.io.input_choice(prompt, choices)
+        self.events.emit('choice', prompt=prompt, answer=answer, option=self.option(answer))
+        self.lines = ()
+        self.printed = {}
+        return answer
+
+
+class GameEvents:
+    """
+    Los eventos de una partida. Guarda el estado tras el último evento
+    (ubicación, flags, inventario, memorias) y al acabar cada turno emite
+    lo que cambió.
+    """
+    def __init__(self, game, log):
+        self.game = game
+        self.log = log
+        self.last = None
+        self.started = False
+        self.rounds = 0
+        self.cause = None
+
+    def emit(self, kind, scene=None, **fields):
+        g = self.game
+        if scene is None and g.player is not None:
+            scene = g.player.location
+        event = {'session': g.seed, 'turn': g.turn, 'type': kind, 'scene': scene,
+                 'ts': int(time.time() * 1000)}
+        event.update(fields)
+        self.log.write(event)
+
+    def mark(self):
+        """El estado actual pasa a ser la referencia para las diferencias."""
+        p, f = self.game.player, self.game.flags
+        self.last = (p.location, f.present, f.true, dict(f.values) if f.values else None,
+                     p.inventory.packed, p.memories.items)
+
+    def start(self, loaded=False):
+        self.log.boundary()
+        self.started = True
+        self.emit('start', loaded=loaded)
+        self.mark()
+
+    def diff(self, scene):
+        """Emite lo que cambió desde mark() (todo en la escena del turno)."""
+        p, f = self.game.player, self.game.flags
+        location, present, true, values, packed, memories = self.last
+        if (p.location == location and f.present == present and f.true == true
+                and not values and not f.values and p.inventory.packed == packed
+                and p.memories.items is memories):
+            return  # el caso normal: un turno sin cambios
+        if p.location != location:
+            self.emit('location', scene, **{'from': location, 'to': p.location})
+        changed = (f.present ^ present) | (f.true ^ true)
+        if values or f.values:
+            old, new = values or {}, f.values or {}
+            for i in old.keys() | new.keys():
+                if old.get(i) != new.get(i):
+                    changed |= 1 << i
+        for i in set_bits(changed):
+            name = FLAGS.names[i]
+            self.emit('flag', scene, name=name, value=f.get(name))
+        if p.inventory.packed != packed:
+            before = Inventory()
+            before.packed = packed
+            old, new = dict(before.items()), dict(p.inventory.items())
+            for item in old.keys() | new.keys():
+                n = new.get(item, 0) - old.get(item, 0)
+                if n > 0:
+                    self.emit('item_gained', scene, item=item, count=n)
+                elif n < 0:
+                    self.emit('item_used', scene, item=item, count=-n)
+        if p.memories.items is not memories:
+            for memory in p.memories.items:
+                if memory not in memories:
+                    self.emit('memory', scene, memory=memory)
+        self.mark()
+
+    def combat_round(self, enemy, action):
+        """Lo llama Game.encounter_enemy al acabar cada ronda."""
+        self.rounds += 1
+        self.emit('combat_round', enemy=enemy.name, round=self.rounds,
+                  action=ACTIONS.get(action, action), hp=self.game.player.hp, enemy_hp=enemy.hp)
+
+
+def attach(game, log):
+    """
+    Emite los eventos de `game` en `log` envolviendo sus métodos en la
+    propia instancia. Devuelve el GameEvents de la partida.
+    """
+    events = GameEvents(game, log)
+    game.events = events
+    game.io = EventIO(game.io, events)
+    step, new_game, load_game, rewind, encounter = (game.step, game.new_game, game.load_game,
+                                                     game.rewind, game.encounter_enemy)
+
+    def traced_step():
+        if not events.started:
+            events.start()
+        scene = game.player.location
+        alive = game.player.is_alive()
+        try:
+            return (yield from step())
+        finally:
+            events.diff(scene)
+            if alive and not game.player.is_alive():
+                events.emit('death', scene, cause=events.cause or scene)
+            elif scene == 'final' and not game.running:
+                events.emit('ending', scene, ending=game.flags.get('ending') or 'ambiguo')
+            events.cause = None
+
+    def traced_new_game():
+        result = yield from new_game()
+        events.start()
+        return result
+
+    def traced_load_game():
+        loaded = yield from load_game()
+        if loaded:
+            if events.started:
+                events.emit('load')
+                events.mark()
+            else:
+                events.start(loaded=True)
+        return loaded
+
+    def traced_rewind(turns=1):
+        done = rewind(turns)
+        if done:
+            events.emit('rewind', turns=turns)
+            events.mark()
+        return done
+
+    def traced_encounter(enemy, origin=None):
+        scene = game.player.location
+        events.rounds = 0
+        try:
+            return (yield from encounter(enemy, origin))
+        finally:
+            if not game.player.is_alive():
+                result = 'derrota'
+                events.cause = origin or scene
+            elif enemy.is_alive():
+                result = 'huida'
+            else:
+                result = 'victoria'
+            events.emit('combat_end', scene, enemy=enemy.name, origin=origin or scene, result=result,
+                        rounds=events.rounds, hp=game.player.hp)
+
+    game.step = traced_step
+    game.new_game = traced_new_game
+    game.load_game = traced_load_game
+    game.rewind = traced_rewind
+    game.encounter_enemy = traced_encounter
+    return events
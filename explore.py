@@ -0,0 +1,649 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Explorador exhaustivo de los estados alcanzables de Ecos de Halcyon.
+
+Parte de new_game y expande turno a turno todos los estados posibles. Dentro
+de un turno, cada pregunta al jugador y cada tirada aleatoria es un punto de
+decisión: el turno se ejecuta con una "cinta" de decisiones y, cuando la
+cinta se acaba, se repite con cada opción posible (con su probabilidad). Las
+tiradas son nodos de azar (random() < p se ramifica en dos con p y 1-p) y las
+preguntas se ramifican según la política elegida.
+
+Para que el espacio sea finito y pequeño:
+  - Los combates son un solo nodo de azar: la distribución exacta del HP
+    final si el jugador siempre ataca (combat_solver.attack_distribution).
+  - Los minijuegos de código son éxito/fracaso con la probabilidad de la
+    política (adivinar al azar o las tablas de minigame_solver).
+  - El estado se compara por (ubicación, HP, flags, inventario, nº de
+    memorias, reputación, mapa), con los contadores saturados en el mayor
+    umbral que consulta el juego. Del inventario cuenta qué objetos hay (el
+    módulo de memoria hasta 2, que el Núcleo consume) y cuántos objetos
+    hay en total hasta 14, con los que forzar_puerta ya acierta siempre. El
+    estado guardado conserva el inventario completo. Los créditos y las
+    salas visitadas no influyen en la partida y no cuentan.
+
+Los estados se deduplican por un hash de 64 bits en una tabla compartida
+entre procesos (memoria compartida, con un cerrojo por franja). Cada proceso
+sólo devuelve el estado completo de los sucesores que ha visto primero. La
+exploración se corta en --max-estados, así que la memoria está acotada.
+
+El espacio completo se multiplica por ~3 en cada turno, así que no se puede
+recorrer entero. Por defecto se explora hasta --horizonte 7 turnos con el HP
+agrupado de 10 en 10 (--hp-paso 10): unos 28.000 estados, menos de un minuto
+con 2 procesos, y ya se alcanzan los cinco finales. La probabilidad que pasa
+del horizonte sale como 'horizonte' y la que se queda en estados cortados
+por --max-estados como 'sin_explorar'. Cada turno más de horizonte triplica
+el tiempo y la memoria.
+
+Con el grafo de transiciones se calcula la probabilidad de cada final en
+--turnos turnos y el contenido muerto o inalcanzable.
+Ejecuta: python3 explore.py --workers 4 --policy uniforme
+"""
+
+import argparse
+import ctypes
+import hashlib
+import multiprocessing
+import time
+from array import array
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError:  # sin numpy la propagación es más lenta, pero funciona
+    np = None
+
+from aventura2 import (FLAGS, ITEMS, PLACES, SAVE_CODECS, SAVE_STRINGS, SCENE_INDEX,
+                       Game, GameIO, MemorySave, decode_save)
+from combat_solver import attack_distribution
+
+ENDINGS = ('paz', 'coexistencia', 'desconexion', 'destruccion', 'escapar_con_datos')
+# recuerdos de la historia (las cadenas conocidas que no son otra cosa)
+MEMORIES = tuple(s for s in SAVE_STRINGS if s not in ITEMS.ids and s not in FLAGS.ids
+                 and s not in PLACES.ids and s not in ENDINGS)
+# umbrales que consulta el juego: por encima de ellos los valores son equivalentes.
+# Fuera del combate importa tener o no cada objeto (el módulo de memoria hasta
+# dos, que el Núcleo consume) y el número total de objetos, del que depende
+# forzar_puerta (0.3 + 0.05 por objeto: con 14 ya es seguro).
+ITEM_CAPS = {'modulo_memoria': 2}
+INVENTORY_CAP = 14
+MEMORY_CAP = 4
+REPUTATION_RANGE = (1, 2)
+CODEC = SAVE_CODECS['binario']
+
+
+# -------------------------
+# Cinta de decisiones
+# -------------------------
+class Branch(Exception):
+    """La cinta se acabó en un punto de decisión con estas opciones."""
+    def __init__(self, options):
+        super().__init__()
+        self.options = options
+
+
+class Tape:
+    """Decisiones ya tomadas en el turno; las forzadas van antes que la cinta."""
+    def __init__(self, decisions=()):
+        self.decisions = list(decisions)
+        self.pos = 0
+        self.forced_random = []
+        self.forced_answers = []
+
+    def decide(self, options):
+        """options: [(valor, probabilidad)]. Las de probabilidad 0 no existen."""
+        options = [(v, p) for v, p in options if p > 0]
+        if len(options) == 1:
+            return options[0][0]
+        if self.pos < len(self.decisions):
+            self.pos += 1
+            return options[self.decisions[self.pos - 1]][0]
+        raise Branch(options)
+
+
+class _Uniform:
+    """Un random() sin valor: al compararlo con p se ramifica en p y 1-p."""
+    __slots__ = ('tape',)
+
+    def __init__(self, tape):
+        self.tape = tape
+
+    def __lt__(self, p):
+        p = min(1.0, max(0.0, p))
+        return self.tape.decide([(True, p), (False, 1.0 - p)])
+
+    def __ge__(self, p):
+        return not self.__lt__(p)
+
+
+class TapeRandom:
+    """RNG de la partida durante la exploración: cada tirada sale de la cinta."""
+    def __init__(self):
+        self.tape = None
+
+    def seed(self, a=None):
+        pass  # Game.reseed en cada turno; aquí no hay estado que sembrar
+
+    def random(self):
+        return _Uniform(self.tape)
+
+    def randint(self, a, b):
+        if self.tape.forced_random:
+            return self.tape.forced_random.pop(0)
+        n = b - a + 1
+        return self.tape.decide([(a + i, 1.0 / n) for i in range(n)])
+
+    def randrange(self, n):
+        if self.tape.forced_random:
+            return self.tape.forced_random.pop(0)
+        return self.tape.decide([(i, 1.0 / n) for i in range(n)])
+
+    def choice(self, seq):
+        if self.tape.forced_random:
+            return seq[self.tape.forced_random.pop(0)]
+        n = len(seq)
+        return seq[self.tape.decide([(i, 1.0 / n) for i in range(n)])]
+
+
+
+class TapeIO(GameIO):
+    """Sin salida; las respuestas salen de la cinta según la política."""
+    def __init__(self, policy):
+        self.policy = policy
+        self.tape = None
+
+    def print(self, *args, sep=" ", end="\n"):
+        pass
+
+    def slowprint(self, text, delay=0.01, newline=True):
+        pass
+
+    def cls(self):
+        pass
+
+    def map_frame(self, frame):
+        pass
+
+    def menu(self, header, lines):
+        pass
+
+    def sleep(self, seconds):
+        pass
+
+    def input(self, prompt="", choices=None):
+        if choices:
+            return self.tape.decide(self.policy.choices(prompt, choices))
+        if self.tape.forced_answers:
+            return self.tape.forced_answers.pop(0)
+        return ""  # nombre por defecto y "Enter para continuar"
+
+
+# -------------------------
+# Políticas
+# -------------------------
+class UniformPolicy:
+    """
+    Menús al azar y códigos al azar. A diferencia de random_policy de
+    simulate.py, en combate siempre ataca: no huye ni usa objetos.
+    """
+    name = 'uniforme'
+
+    def choices(self, prompt, choices):
+        p = 1.0 / len(choices)
+        return [(c, p) for c in choices]
+
+    def minigame(self, game):
+        tries = 5 if game == 'hack' else 4
+        return 1.0 - (999 / 1000) ** tries
+
+
+class MinigamePolicy(UniformPolicy):
+    """Menús al azar; los minijuegos con las tablas de minigame_solver."""
+    name = 'minijuegos'
+
+    def minigame(self, game):
+        from minigame_solver import load_tables
+        return load_tables()[game].success_probability()
+
+
+POLICIES = {p.name: p for p in (UniformPolicy, MinigamePolicy)}
+
+
+class ExploreGame(Game):
+    """Game con combates y minijuegos convertidos en nodos de azar."""
+    def __init__(self, io, hp_step=1):
+        super().__init__(io=io)
+        self.rng = TapeRandom()
+        self.hp_step = hp_step
+        # la partida guardada no forma parte del estado: cada turno empieza sin ella
+        self.save_backend = MemorySave()
+
+    def show_map(self):
+        pass  # sólo es salida
+
+    def encounter_enemy(self, enemy, origin=None):
+        # el HP final ya agrupado como en canonical(): una rama por grupo
+        dist = Counter()
+        for outcome, p in attack_distribution(self.player, enemy).items():
+            if outcome[0] != 'lose':
+                outcome = (outcome[0], round_hp(outcome[1], self.hp_step))
+            dist[outcome] += p
+        outcome = self.io.tape.decide(sorted(dist.items()))
+        if outcome[0] == 'win':
+            self.player.hp = outcome[1]
+            enemy.hp = 0
+            yield from Game.encounter_enemy(self, enemy, origin)  # botín y resto de la escena reales
+        elif outcome[0] == 'lose':
+            self.player.hp = 0
+        else:
+            self.player.location = "pasillo"  # nadie puede hacer daño: se retira
+
+    def _minigame(self, name, method, tries, forced):
+        won = self.io.tape.decide([(True, self.io.policy.minigame(name)),
+                                   (False, 1.0 - self.io.policy.minigame(name))])
+        self.io.tape.forced_random.extend(forced)
+        self.io.tape.forced_answers.extend(['000'] if won else ['999'] * tries)
+        yield from method(self)
+
+    def hack_minijuego(self):
+        return self._minigame('hack', Game.hack_minijuego, 5, [0, 0, 0])
+
+    def safe_minigame(self):
+        return self._minigame('safe', Game.safe_minigame, 4, [0])
+
+
+# -------------------------
+# Estados abstractos
+# -------------------------
+def round_hp(hp, hp_step):
+    """HP redondeado hacia abajo a múltiplos de hp_step, sin bajar de 1."""
+    if hp_step > 1 and hp > 0:
+        return max(1, hp - hp % hp_step)
+    return hp
+
+
+def canonical(state, hp_step=1):
+    """
+    Satura los contadores que el juego no distingue y quita lo que no influye.
+    El inventario se queda entero (forzar_puerta cuenta los objetos); lo
+    satura state_key. Con hp_step > 1 el HP se redondea hacia abajo a
+    múltiplos de hp_step (sin bajar de 1): es una aproximación pesimista que
+    reduce mucho los estados.
+    """
+    p = state['player']
+    p['hp'] = round_hp(p['hp'], hp_step)
+    p['memories'] = p['memories'][:MEMORY_CAP]
+    lo, hi = REPUTATION_RANGE
+    p['reputation'] = min(hi, max(lo - 1, p['reputation']))
+    p['credits'] = 0
+    state['visited'] = []  # sólo cambia la niebla del mapa
+    state['turn'] = 0
+    state.pop('seq', None)
+    return state
+
+
+def state_key(state):
+    """Hash estable de 64 bits de un estado canónico (nunca 0)."""
+    p = state['player']
+    flags = state['flags']
+    counts = Counter(p['inventory'])
+    items = sorted((item, min(n, ITEM_CAPS.get(item, 1))) for item, n in counts.items())
+    text = repr((p['location'], p['hp'], p['max_hp'], p['attack'], p['defense'],
+                 sorted((k, v) for k, v in flags.items() if v is not False and v is not None),
+                 items, min(len(p['inventory']), INVENTORY_CAP),
+                 len(p['memories']), p['reputation'], p['has_map']))
+    h = int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+    return h or 1
+
+
+def terminal(state):
+    """'muerte', el final alcanzado o None si la partida sigue."""
+    if state['player']['hp'] <= 0:
+        return 'muerte'
+    return state['flags'].get('ending') or None
+
+
+# -------------------------
+# Tabla de hashes compartida
+# -------------------------
+class SharedStateSet:
+    """
+    Conjunto de hashes de 64 bits en memoria compartida, de capacidad fija.
+    La tabla se reparte en franjas, cada una con su cerrojo y su sondeo
+    lineal, así que varios procesos pueden insertar a la vez.
+    """
+    def __init__(self, capacity=1 << 20, stripes=64):
+        self.stripes = stripes
+        self.size = max(16, capacity // stripes)
+        self.table = multiprocessing.Array(ctypes.c_uint64, self.size * stripes, lock=False)
+        self.counts = multiprocessing.Array(ctypes.c_uint32, stripes, lock=False)
+        self.locks = [multiprocessing.Lock() for _ in range(stripes)]
+
+    def add(self, h):
+        """True si h es nuevo (y queda insertado); False si ya estaba."""
+        stripe = h % self.stripes
+        base = stripe * self.size
+        slot = (h // self.stripes) % self.size
+        table = self.table
+        with self.locks[stripe]:
+            if self.counts[stripe] >= self.size * 3 // 4:
+                raise MemoryError("tabla de estados llena")
+            while True:
+                value = table[base + slot]
+                if value == h:
+                    return False
+                if value == 0:
+                    table[base + slot] = h
+                    self.counts[stripe] += 1
+                    return True
+                slot = (slot + 1) % self.size
+
+    def __len__(self):
+        return sum(self.counts)
+
+
+# -------------------------
+# Expansión de un estado (un turno)
+# -------------------------
+_worker = {}
+
+
+def _init_worker(seen, policy, hp_step):
+    _worker.update(seen=seen, game=ExploreGame(TapeIO(POLICIES[policy]()), hp_step), hp_step=hp_step)
+
+
+def outcomes(game, state):
+    """
+    [(probabilidad, estado siguiente)] de un turno desde `state`, recorriendo
+    todas las cintas de decisiones posibles en profundidad.
+    """
+    results = []
+    stack = [((), 1.0)]
+    while stack:
+        decisions, prob = stack.pop()
+        game.apply_state(state)
+        game.save_backend.delete()
+        game.running = True
+        tape = game.rng.tape = game.io.tape = Tape(decisions)
+        try:
+            game.play(game.step())
+        except Branch as b:
+            for i, (_, p) in enumerate(b.options):
+                stack.append((decisions + (i,), prob * p))
+            continue
+        if tape.pos < len(decisions):
+            raise RuntimeError("decisiones sin usar: el turno no es determinista")
+        new = game.save_state()
+        if not game.running and not terminal(new):
+            new['flags']['ending'] = new['flags'].get('ending') or 'salida'
+        results.append((prob, new))
+    return results
+
+
+def note_content(content, state):
+    """Apunta en content (escenas, flags, objetos, memorias) lo que toca el estado."""
+    p = state['player']
+    content[0].add(p['location'])
+    content[1].update(k for k, v in state['flags'].items() if v is not False)
+    content[2].update(p['inventory'])
+    content[3].update(p['memories'])
+
+
+def expand_chunk(chunk):
+    """Expande [(id, bytes del estado)] con la tabla compartida del proceso."""
+    seen, game, hp_step = (_worker[k] for k in ('seen', 'game', 'hp_step'))
+    expanded = []
+    content = (set(), set(), set(), set())
+    for sid, data in chunk:
+        merged = Counter()
+        fresh = {}
+        for prob, new in outcomes(game, decode_save(data)):
+            note_content(content, new)
+            new = canonical(new, hp_step)
+            h = state_key(new)
+            merged[h] += prob
+            fresh.setdefault(h, new)
+        succ = []
+        for h, prob in merged.items():
+            new = fresh[h]
+            data = CODEC.encode(new) if seen.add(h) else None
+            succ.append((h, prob, data, terminal(new)))
+        expanded.append((sid, succ))
+    return expanded, content
+
+
+# -------------------------
+# Exploración
+# -------------------------
+class Exploration:
+    """Grafo de estados explorado: ids, finales y transiciones."""
+    def __init__(self):
+        self.ids = {}            # hash -> id
+        self.kind = []           # id -> final/'muerte' o None
+        self.expanded = []       # id -> ya se conocen sus transiciones
+        self.edges = {}          # id -> (array de destinos, array de probabilidades)
+        self.content = (set(), set(), set(), set())
+        self.truncated = False   # cortada por max_states
+        self.horizon = False     # quedaron estados más allá del horizonte
+
+    def id_of(self, h):
+        sid = self.ids.get(h)
+        if sid is None:
+            sid = self.ids[h] = len(self.kind)
+            self.kind.append(None)
+            self.expanded.append(False)
+        return sid
+
+    def __len__(self):
+        return len(self.kind)
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def explore(workers=1, policy='uniforme', max_states=200000, hp_step=1, chunk_size=64,
+            progress=None, horizon=0):
+    """
+    Búsqueda en anchura por capas desde new_game (una capa por turno).
+    Devuelve una Exploration; al pasar de max_states o de `horizon` capas
+    (0 = sin límite) se deja de expandir y lo pendiente queda abierto.
+    """
+    seen = SharedStateSet(capacity=max(1 << 16, 2 * max_states))
+    game = ExploreGame(TapeIO(POLICIES[policy]()), hp_step)
+    game.rng.tape = game.io.tape = Tape()
+    game.play(game.new_game())
+    start = game.save_state()
+    result = Exploration()
+    note_content(result.content, start)
+    start = canonical(start, hp_step)
+    h = state_key(start)
+    seen.add(h)
+    result.id_of(h)
+    frontier = [(0, CODEC.encode(start))]
+    if workers > 1:
+        pool = multiprocessing.Pool(workers, initializer=_init_worker,
+                                    initargs=(seen, policy, hp_step))
+        mapper = pool.imap_unordered
+    else:
+        _init_worker(seen, policy, hp_step)
+        pool = None
+        mapper = map
+    try:
+        depth = 0
+        while frontier and not result.truncated:
+            if horizon and depth >= horizon:
+                result.horizon = True
+                break
+            depth += 1
+            next_frontier = []
+            for expanded, content in mapper(expand_chunk, _chunks(frontier, chunk_size)):
+                for part, found in zip(result.content, content):
+                    part.update(found)
+                for sid, succ in expanded:
+                    targets, probs = array('I'), array('d')
+                    for h, prob, data, kind in succ:
+                        tid = result.id_of(h)
+                        targets.append(tid)
+                        probs.append(prob)
+                        if data is not None:
+                            result.kind[tid] = kind
+                            if kind is None:
+                                next_frontier.append((tid, data))
+                            else:
+                                result.expanded[tid] = True
+                    result.edges[sid] = (targets, probs)
+                    result.expanded[sid] = True
+                if len(result) >= max_states:
+                    result.truncated = True
+                    break
+            frontier = next_frontier
+            if progress:
+                progress(depth, len(result), len(frontier))
+    except MemoryError:
+        result.truncated = True
+    finally:
+        if pool is not None:
+            if result.truncated:
+                pool.terminate()
+            else:
+                pool.close()
+            pool.join()
+    return result
+
+
+# -------------------------
+# Análisis
+# -------------------------
+def ending_probabilities(result, turns=500):
+    """
+    Probabilidad de cada final (y de morir) en `turns` turnos desde el
+    inicio; lo que queda se reparte en 'sigue' (jugando al llegar al
+    límite), 'horizonte' (estados más allá de --horizonte) y 'sin_explorar'
+    (estados fuera de --max-estados).
+    """
+    n = len(result)
+    src, dst, prob = array('I'), array('I'), array('d')
+    for sid, (targets, probs) in result.edges.items():
+        src.extend([sid] * len(targets))
+        dst.extend(targets)
+        prob.extend(probs)
+    absorbed = Counter()
+    open_ids = [i for i in range(n) if result.kind[i] is None and not result.expanded[i]]
+    if np is not None:
+        src_a, dst_a, prob_a = (np.frombuffer(a, dtype=t) for a, t in
+                                ((src, np.uint32), (dst, np.uint32), (prob, np.float64)))
+        final = np.array([result.kind[i] is not None for i in range(n)])
+        mass = np.zeros(n)
+        mass[0] = 1.0
+        for _ in range(turns):
+            moving = mass.copy()
+            moving[final] = 0.0
+            moving[open_ids] = 0.0
+            mass = mass - moving + np.bincount(dst_a, weights=moving[src_a] * prob_a, minlength=n)
+        values = mass
+    else:
+        values = [0.0] * n
+        values[0] = 1.0
+        for _ in range(turns):
+            new = [v if result.kind[i] is not None or not result.expanded[i] else 0.0
+                   for i, v in enumerate(values)]
+            for s, d, p in zip(src, dst, prob):
+                if result.kind[s] is None and values[s]:
+                    new[d] += values[s] * p
+            values = new
+    open_set = set(open_ids)
+    for i in range(n):
+        if values[i] <= 0:
+            continue
+        if result.kind[i] is not None:
+            absorbed[result.kind[i]] += float(values[i])
+        elif i in open_set:
+            absorbed['sin_explorar' if result.truncated else 'horizonte'] += float(values[i])
+        else:
+            absorbed['sigue'] += float(values[i])
+    return absorbed
+
+
+def dead_ends(result):
+    """
+    Estados alcanzables (no finales) desde los que ya no se llega a ningún
+    final. Los estados sin expandir cuentan como si pudieran llegar.
+    """
+    reverse = {}
+    for sid, (targets, _) in result.edges.items():
+        for t in set(targets):
+            reverse.setdefault(t, []).append(sid)
+    good = [i for i in range(len(result))
+            if result.kind[i] in ENDINGS or (result.kind[i] is None and not result.expanded[i])]
+    ok = set(good)
+    while good:
+        for s in reverse.get(good.pop(), ()):
+            if s not in ok:
+                ok.add(s)
+                good.append(s)
+    return [i for i in range(len(result))
+            if result.kind[i] is None and result.expanded[i] and i not in ok]
+
+
+def unreachable(result):
+    """Contenido que ningún estado explorado llega a tocar."""
+    places, flags, items, memories = result.content
+    endings = {k for k in result.kind if k}
+    return {
+        'escenas': sorted(set(SCENE_INDEX) - places),
+        'flags': sorted(set(FLAGS.names[:FLAGS.fixed]) - flags - {'ending'}),
+        'objetos': sorted(set(ITEMS.names[:ITEMS.fixed]) - items),
+        'memorias': sorted(set(MEMORIES) - memories),
+        'finales': [e for e in ENDINGS if e not in endings],
+    }
+
+
+def print_report(result, probs, turns, policy, elapsed):
+    print(f"Estados: {len(result)} en {elapsed:.2f}s"
+          f"{'  (cortado por --max-estados)' if result.truncated else ''}"
+          f"{'  (hasta --horizonte)' if result.horizon and not result.truncated else ''}")
+    print(f"Transiciones: {sum(len(t) for t, _ in result.edges.values())}")
+    endings = Counter(k for k in result.kind if k)
+    print("Finales alcanzables:")
+    for e in ENDINGS:
+        if endings[e]:
+            print(f"  {e:<20} {endings[e]:>6} estados")
+    print(f"Probabilidades en {turns} turnos (política {policy}):")
+    for name, p in sorted(probs.items(), key=lambda kv: -kv[1]):
+        print(f"  {name:<20} {100 * p:7.3f}%")
+    dead = dead_ends(result)
+    print(f"Estados sin salida (no llevan a ningún final): {len(dead)}")
+    print("Contenido inalcanzable:")
+    for kind, names in unreachable(result).items():
+        print(f"  {kind:<10} {', '.join(names) if names else '-'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Explorador exhaustivo de estados de Ecos de Halcyon")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--policy", choices=sorted(POLICIES), default='uniforme')
+    parser.add_argument("--max-estados", type=int, default=200000)
+    parser.add_argument("--turnos", type=int, default=500)
+    parser.add_argument("--hp-paso", type=int, default=10,
+                        help="agrupa el HP en múltiplos de N (1 = exacto)")
+    parser.add_argument("--horizonte", type=int, default=7,
+                        help="turnos que se expanden desde el inicio (0 = sin límite)")
+    parser.add_argument("--chunk-size", type=int, default=64)
+    args = parser.parse_args()
+
+    def progress(depth, states, frontier):
+        print(f"  capa {depth:>4}: {states:>8} estados, {frontier:>7} por expandir", flush=True)
+
+    start = time.perf_counter()
+    result = explore(args.workers, args.policy, args.max_estados, args.hp_paso, args.chunk_size,
+                     progress, args.horizonte)
+    elapsed = time.perf_counter() - start
+    probs = ending_probabilities(result, args.turnos)
+    print_report(result, probs, args.turnos, args.policy, elapsed)
+
+
+if __name__ == "__main__":
+    main()
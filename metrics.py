@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Instrumentación opcional de Ecos de Halcyon: contadores, tiempos e
+histogramas de latencia, exportados en el formato de texto de Prometheus.
+
+No cambia Game: instrument() envuelve los métodos de una partida concreta
+(step, encounter_enemy, save_game, load_game, main_loop) y su backend de
+entrada/salida. Sin instrumentar no cuesta nada.
+
+    metrics = Metrics()
+    instrument(game, metrics)
+    serve(metrics, 9100)             # http://127.0.0.1:9100/metrics
+    metrics.write("halcyon.prom")    # o a un archivo
+
+El tiempo se reparte en: compute (el juego), output (escribir en pantalla),
+sleep (pausas y efecto máquina de escribir), input (esperando al jugador) y
+save (guardar y cargar). La latencia de un turno excluye input y sleep: es
+lo que el jugador nota como lentitud.
+
+Ejecuta: python3 aventura2.py --metricas halcyon.prom [--metricas-puerto 9100]
+         python3 aventura2.py --perfil sesion.prof --memoria memoria.txt
+"""
+
+import contextlib
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# límites de los histogramas de latencia (segundos)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    'halcyon_turns_total': "Turnos jugados",
+    'halcyon_scene_entries_total': "Turnos por escena (ubicación al empezar el turno)",
+    'halcyon_fights_total': "Combates por resultado",
+    'halcyon_saves_total': "Partidas guardadas",
+    'halcyon_loads_total': "Cargas de partida por resultado",
+    'halcyon_sessions_total': "Partidas empezadas",
+    'halcyon_sessions_active': "Sesiones conectadas",
+    'halcyon_time_seconds_total': "Tiempo por tipo: compute, output, sleep, input, save",
+    'halcyon_turn_seconds': "Latencia de cada turno (sin esperas ni entrada)",
+    'halcyon_scene_seconds': "Latencia de cada turno por escena",
+    'halcyon_fight_seconds': "Latencia de cada combate (sin esperas ni entrada)",
+    'halcyon_save_seconds': "Latencia de save_game",
+    'halcyon_load_seconds': "Latencia de load_game",
+    'halcyon_advance_seconds': "Servidor: cálculo de cada respuesta de una sesión",
+}
+
+BLOCKING = ('input', 'sleep')
+
+
+class Histogram:
+    """Recuentos por intervalo de BUCKETS (el último es +Inf), suma y total."""
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other):
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.sum += other.sum
+        self.count += other.count
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())) if labels else ())
+
+
+class Metrics:
+    """
+    Contadores, medidores e histogramas con etiquetas. Es seguro leerlo
+    (exportar) desde otro hilo mientras la partida escribe.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}      # (nombre, etiquetas) -> valor (contadores y medidores)
+        self.histograms = {}  # (nombre, etiquetas) -> Histogram
+        self.types = {}
+        self.io_time = 0.0    # tiempo de E/S medido (todas las clases)
+        self.blocked = 0.0    # de él, esperando al jugador o en pausas
+        self.filename = None
+        self.write_every = 0.0
+        self.last_write = 0.0
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self.lock:
+            self.types.setdefault(name, 'counter')
+            self.values[key] = self.values.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        key = _key(name, labels)
+        with self.lock:
+            self.types.setdefault(name, 'gauge')
+            self.values[key] = value
+
+    def observe(self, name, seconds, **labels):
+        key = _key(name, labels)
+        with self.lock:
+            self.types.setdefault(name, 'histogram')
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = Histogram()
+            hist.observe(seconds)
+
+    def add_time(self, kind, seconds):
+        """Tiempo de E/S de una clase (output, sleep, input, save)."""
+        self.inc('halcyon_time_seconds_total', seconds, kind=kind)
+        self.io_time += seconds
+        if kind in BLOCKING:
+            self.blocked += seconds
+
+    def add_blocked(self, seconds):
+        """Tiempo esperando al jugador que ya se mide en otra parte (no suma a ninguna clase)."""
+        self.io_time += seconds
+        self.blocked += seconds
+
+    def merge(self, other):
+        """Suma los contadores e histogramas de otro Metrics (los medidores se copian)."""
+        with self.lock:
+            for name, kind in other.types.items():
+                self.types.setdefault(name, kind)
+            for key, value in other.values.items():
+                if other.types[key[0]] == 'gauge':
+                    self.values[key] = value
+                else:
+                    self.values[key] = self.values.get(key, 0) + value
+            for key, hist in other.histograms.items():
+                mine = self.histograms.get(key)
+                if mine is None:
+                    mine = self.histograms[key] = Histogram()
+                mine.merge(hist)
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+            self.histograms.clear()
+        self.io_time = self.blocked = 0.0
+
+    # -------------------------
+    # Exportar
+    # -------------------------
+    def to_prometheus(self):
+        """Todo en el formato de texto de Prometheus (versión 0.0.4)."""
+        with self.lock:
+            values = sorted(self.values.items())
+            histograms = sorted((k, (list(h.counts), h.sum, h.count))
+                                for k, h in self.histograms.items())
+            types = dict(self.types)
+        lines = []
+        seen = set()
+
+        def header(name):
+            if name not in seen:
+                seen.add(name)
+                if name in HELP:
+                    lines.append(f"# HELP {name} {HELP[name]}")
+                lines.append(f"# TYPE {name} {types[name]}")
+
+        for (name, labels), value in values:
+            header(name)
+            lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        for (name, labels), (counts, total, count) in histograms:
+            header(name)
+            cumulative = 0
+            for bound, n in zip(BUCKETS + ('+Inf',), counts):
+                cumulative += n
+                le = bound if isinstance(bound, str) else _number(bound)
+                lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, filename=None):
+        """Escribe el texto de Prometheus de forma atómica (temporal + renombrado)."""
+        filename = filename or self.filename
+        tmp = filename + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, filename)
+        self.last_write = time.monotonic()
+
+    def autowrite(self, filename, every=5.0):
+        """Reescribe `filename` tras un turno si han pasado `every` segundos."""
+        self.filename = filename
+        self.write_every = every
+
+    def maybe_write(self):
+        if self.filename and time.monotonic() - self.last_write >= self.write_every:
+            self.write()
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for k, v in labels:
+        v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+# -------------------------
+# Instrumentar una partida
+# -------------------------
+class TimedIO:
+    """
+    Envuelve el backend de una partida y reparte su tiempo: input (esperando
+    respuesta), sleep (pausas y slowprint con retardo, cuyo coste es casi
+    todo el efecto de escritura), output (el resto de la salida).
+    """
+    def __init__(self, io, metrics):
+        self.io = io
+        self.metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self.io, name)
+
+    def _timed(self, kind, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.metrics.add_time(kind, time.perf_counter() - start)
+
+    def print(self, *args, sep=" ", end="\n"):
+        start = time.perf_counter()
+        try:
+            self.io.print(*args, sep=sep, end=end)
+        finally:
+            self.metrics.add_time('output', time.perf_counter() - start)
+
+    def slowprint(self, text, delay=0.01, newline=True):
+        return self._timed('sleep' if delay > 0 else 'output', self.io.slowprint, text, delay, newline)
+
+    def cls(self):
+        return self._timed('output', self.io.cls)
+
+    def map_frame(self, frame):
+        return self._timed('output', self.io.map_frame, frame)
+
+    def menu(self, header, lines):
+        return self._timed('output', self.io.menu, header, lines)
+
+    def sleep(self, seconds):
+        return self._timed('sleep', self.io.sleep, seconds)
+
+    def input(self, prompt="", choices=None):
+        return self._timed('input', self.io.input, prompt, choices)
+
+    def input_choice(self, prompt, choices):
+        return self._timed('input', self.io.input_choice, prompt, choices)
+
+
+def instrument(game, metrics, io=True):
+    """
+    Mide la partida `game` en `metrics` envolviendo sus métodos en la propia
+    instancia. io=False deja el backend sin medir (p. ej. en el servidor,
+    donde la entrada nunca bloquea).
+    """
+    if io:
+        game.io = TimedIO(game.io, metrics)
+    step, encounter, save, load, main_loop = (game.step, game.encounter_enemy, game.save_game,
+                                              game.load_game, game.main_loop)
+    clock = time.perf_counter
+
+    def timed_step():
+        scene = game.player.location if game.player else None
+        start, io_time, blocked = clock(), metrics.io_time, metrics.blocked
+        try:
+            return (yield from step())
+        finally:
+            wall = clock() - start
+            latency = wall - (metrics.blocked - blocked)
+            metrics.inc('halcyon_time_seconds_total', wall - (metrics.io_time - io_time),
+                        kind='compute')
+            metrics.inc('halcyon_turns_total')
+            metrics.inc('halcyon_scene_entries_total', scene=scene)
+            metrics.observe('halcyon_turn_seconds', latency)
+            metrics.observe('halcyon_scene_seconds', latency, scene=scene)
+            metrics.maybe_write()
+
+    def timed_encounter(enemy, origin=None):
+        start, blocked = clock(), metrics.blocked
+        try:
+            return (yield from encounter(enemy, origin))
+        finally:
+            if not game.player.is_alive():
+                result = 'derrota'
+            elif enemy.is_alive():
+                result = 'huida'
+            else:
+                result = 'victoria'
+            metrics.inc('halcyon_fights_total', result=result)
+            metrics.observe('halcyon_fight_seconds', clock() - start - (metrics.blocked - blocked))
+
+    def timed_disk(fn, name):
+        # save: el tiempo propio (sin la salida ya medida); latencia: sin esperas
+        start, io_time, blocked = clock(), metrics.io_time, metrics.blocked
+        result = None
+        try:
+            result = yield from fn()
+            return result
+        finally:
+            wall = clock() - start
+            metrics.add_time('save', wall - (metrics.io_time - io_time))
+            metrics.observe(f'halcyon_{name}_seconds', wall - (metrics.blocked - blocked))
+            if name == 'save':
+                metrics.inc('halcyon_saves_total')
+            else:
+                metrics.inc('halcyon_loads_total', result='ok' if result else 'fallo')
+
+    def timed_main_loop():
+        metrics.inc('halcyon_sessions_total')
+        try:
+            return main_loop()
+        finally:
+            if metrics.filename:
+                metrics.write()
+
+    game.step = timed_step
+    game.encounter_enemy = timed_encounter
+    game.save_game = lambda: timed_disk(save, 'save')
+    game.load_game = lambda: timed_disk(load, 'load')
+    game.main_loop = timed_main_loop
+    return game
+
+
+# -------------------------
+# Endpoint HTTP y capturas de perfil
+# -------------------------
+def serve(metrics, port, host="127.0.0.1"):
+    """Sirve /metrics en un hilo de fondo. Devuelve el servidor (server.shutdown() lo para)."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = metrics.to_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # sin ruido en la terminal del juego
+
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=httpd.serve_forever, name="metricas", daemon=True).start()
+    return httpd
+
+
+@contextlib.contextmanager
+def profiled(filename):
+    """cProfile de lo que se ejecute dentro; guarda las estadísticas (pstats) en filename."""
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(filename)
+
+
+def write_memory_report(snapshot, filename, top=30):
+    """Las líneas que más memoria tienen reservada en un snapshot de tracemalloc."""
+    import tracemalloc
+    current, peak = tracemalloc.get_traced_memory()
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write(f"memoria actual {current / 1024:.1f} KiB, pico {peak / 1024:.1f} KiB\n")
+        for stat in snapshot.statistics('lineno')[:top]:
+            f.write(f"{stat}\n")
+
+
+@contextlib.contextmanager
+def traced_memory(filename, top=30):
+    """tracemalloc de lo que se ejecute dentro; escribe el informe en filename."""
+    import tracemalloc
+    tracemalloc.start()
+    try:
+        yield
+    finally:
+        write_memory_report(tracemalloc.take_snapshot(), filename, top)
+        tracemalloc.stop()
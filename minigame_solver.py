@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tablas de estrategia precalculadas para hack_minijuego y safe_minigame.
+Los dos minijuegos son finitos (1000 códigos), así que el árbol de decisión se
+construye una vez con poda por conjunto consistente y se guarda en un archivo
+binario compacto (minigames.tbl) que se carga perezosamente. Después cada
+intento es una consulta O(1).
+  - hack: pista = dígitos en la posición correcta (0-3), 5 intentos.
+    Búsqueda exacta completa: los dígitos aún no probados en una posición
+    son intercambiables, así que en cada nivel basta probar un dígito nuevo
+    o uno ya usado por posición (1, 8, 27, 64 intentos en vez de 1000), y
+    los candidatos se guardan como bits de un entero.
+  - caja fuerte: pista = suma de dígitos mayor/menor-o-igual, 4 intentos.
+    Programación dinámica exacta sobre rangos de suma de dígitos.
+Ejecuta: python3 minigame_solver.py --build
+"""
+
+import argparse
+import os
+import struct
+
+TABLE_FILENAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'minigames.tbl')
+MAGIC = b'HMG2'  # HMG1: árbol del hack voraz por encima de las dos últimas jugadas
+NONE = 0xFFFF
+CODES = range(1000)
+DIGITS = [(c // 100, c // 10 % 10, c % 10) for c in CODES]
+DIGIT_SUM = [sum(d) for d in DIGITS]
+
+# juego -> (intentos, número de pistas posibles)
+GAMES = {
+    'hack': (5, 3),   # pistas 0, 1, 2 (3 = acierto)
+    'safe': (4, 2),   # pistas 0 = "más", 1 = "menos"
+}
+
+
+def code_str(code):
+    return str(code).zfill(3)
+
+
+def hack_feedback(guess, code):
+    a, b, c = DIGITS[guess]
+    x, y, z = DIGITS[code]
+    return (a == x) + (b == y) + (c == z)
+
+
+def safe_feedback(guess, code):
+    # igual que safe_minigame: "más" si la suma del intento es menor
+    return 0 if DIGIT_SUM[guess] < DIGIT_SUM[code] else 1
+
+
+class _Builder:
+    """Acumula nodos (intento, hijos por pista) en listas planas."""
+    def __init__(self, arity):
+        self.arity = arity
+        self.guesses = []
+        self.children = []
+
+    def add(self, guess):
+        self.guesses.append(guess)
+        self.children.append([NONE] * self.arity)
+        return len(self.guesses) - 1
+
+
+def _partition(guess, cands, feedback):
+    parts = {}
+    for c in cands:
+        if c != guess:
+            parts.setdefault(feedback(guess, c), []).append(c)
+    return parts
+
+
+def _hack_masks():
+    """masks[g][f] = conjunto (bits) de códigos que dan la pista f al intento g."""
+    masks = [[0] * 4 for _ in CODES]
+    for g in CODES:
+        row = masks[g]
+        for c in CODES:
+            row[hack_feedback(g, c)] |= 1 << c
+    return masks
+
+
+def _hack_guesses(used):
+    """
+    Intentos que hace falta probar: en cada posición, los dígitos ya
+    probados ahí y un único dígito nuevo. La pista sólo compara dígitos por
+    posición, así que los dígitos aún no probados en una posición son
+    intercambiables y cualquier otro intento equivale a uno de estos.
+    """
+    options = []
+    for digits in used:
+        fresh = next((d for d in range(10) if d not in digits), None)
+        options.append(sorted(digits) + ([fresh] if fresh is not None else []))
+    return [a * 100 + b * 10 + c for a in options[0] for b in options[1] for c in options[2]]
+
+
+def _solve_hack(tries):
+    """
+    Árbol óptimo exacto del hack: búsqueda completa sobre conjuntos de
+    candidatos (bits de 1000 códigos), con memo por (conjunto, intentos).
+    Devuelve (best, masks), con best[(conjunto, intentos)] = (resueltos, intento).
+    """
+    masks = _hack_masks()
+    best = {}
+
+    def solve(cands, t, used):
+        key = (cands, t)
+        if key in best:
+            return best[key][0]
+        bound = cands.bit_count()  # no se puede resolver más de lo que hay
+        if t == 1:
+            best[key] = (1, (cands & -cands).bit_length() - 1)
+            return 1
+        top = (-1, None)
+        for g in _hack_guesses(used):
+            row = masks[g]
+            v = (cands >> g) & 1
+            after = None
+            for fb in range(3):
+                part = cands & row[fb]
+                if part:
+                    if t == 2:
+                        v += 1
+                    else:
+                        if after is None:
+                            after = tuple(u | {d} for u, d in zip(used, DIGITS[g]))
+                        v += solve(part, t - 1, after)
+            if v > top[0]:
+                top = (v, g)
+                if v == bound:
+                    break
+        best[key] = top
+        return top[0]
+
+    solve((1 << len(CODES)) - 1, tries, (frozenset(), frozenset(), frozenset()))
+    return best, masks
+
+
+def _build_hack(builder, tries):
+    """Devuelve (raíz, códigos que se resuelven) del árbol óptimo."""
+    best, masks = _solve_hack(tries)
+
+    def build(cands, t):
+        if t == 1:
+            guess = (cands & -cands).bit_length() - 1  # el último: un candidato cualquiera
+        else:
+            guess = best[(cands, t)][1]
+        node = builder.add(guess)
+        if t > 1:
+            for fb in range(3):
+                part = cands & masks[guess][fb]
+                if part:
+                    builder.children[node][fb] = build(part, t - 1)
+        return node
+
+    everything = (1 << len(CODES)) - 1
+    return build(everything, tries), best[(everything, tries)][0]
+
+
+def _build_safe(builder, tries):
+    by_sum = [[] for _ in range(28)]
+    for c in CODES:
+        by_sum[DIGIT_SUM[c]].append(c)
+    memo = {}
+
+    # estado: sumas en [lo, hi], sin los `k` primeros códigos de suma hi
+    def value(lo, hi, k, t):
+        if t == 0 or lo > hi:
+            return 0, None
+        key = (lo, hi, k, t)
+        if key in memo:
+            return memo[key]
+        best = (0, None)
+        for s in range(lo, hi + 1):
+            skip = k if s == hi else 0
+            if skip >= len(by_sum[s]):
+                continue
+            left = value(lo, s, skip + 1, t - 1)[0]          # "menos"
+            right = value(s + 1, hi, k, t - 1)[0] if s < hi else 0  # "más"
+            v = 1 + left + right
+            if v > best[0]:
+                best = (v, s)
+        memo[key] = best
+        return best
+
+    def build(lo, hi, k, t):
+        v, s = value(lo, hi, k, t)
+        if s is None:
+            return NONE
+        skip = k if s == hi else 0
+        node = builder.add(by_sum[s][skip])
+        builder.children[node][1] = build(lo, s, skip + 1, t - 1)
+        if s < hi:
+            builder.children[node][0] = build(s + 1, hi, k, t - 1)
+        return node
+
+    root = build(0, 27, 0, tries)
+    return root, value(0, 27, 0, tries)[0]
+
+
+def build_tables():
+    """Construye los dos árboles. Devuelve {juego: (builder, raíz, resueltos)}."""
+    out = {}
+    b = _Builder(GAMES['hack'][1])
+    root, solved = _build_hack(b, GAMES['hack'][0])
+    out['hack'] = (b, root, solved)
+    b = _Builder(GAMES['safe'][1])
+    root, solved = _build_safe(b, GAMES['safe'][0])
+    out['safe'] = (b, root, solved)
+    return out
+
+
+def write_tables(filename=TABLE_FILENAME):
+    """
+    Formato: MAGIC, nº de juegos; por juego: nombre (4 bytes), aridad, nodos,
+    raíz, resueltos, y luego por nodo: intento + hijos, todos uint16.
+    """
+    tables = build_tables()
+    chunks = [MAGIC, struct.pack('<H', len(tables))]
+    for name, (b, root, solved) in tables.items():
+        chunks.append(struct.pack('<4sHHHH', name.encode('ascii'), b.arity, len(b.guesses), root, solved))
+        fmt = '<' + 'H' * (1 + b.arity)
+        for guess, children in zip(b.guesses, b.children):
+            chunks.append(struct.pack(fmt, guess, *children))
+    tmp = filename + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(b''.join(chunks))
+    os.replace(tmp, filename)
+
+
+class StrategyTable:
+    """Árbol de un minijuego sobre el buffer binario (sin copiar nodos)."""
+    def __init__(self, name, buf, offset, arity, count, root, solved):
+        self.name = name
+        self.buf = buf
+        self.offset = offset
+        self.arity = arity
+        self.count = count
+        self.root = root
+        self.solved = solved
+        self.node = struct.Struct('<' + 'H' * (1 + arity))
+
+    def guess(self, node):
+        return self.node.unpack_from(self.buf, self.offset + node * self.node.size)[0]
+
+    def child(self, node, feedback):
+        child = self.node.unpack_from(self.buf, self.offset + node * self.node.size)[1 + feedback]
+        return None if child == NONE else child
+
+    def success_probability(self):
+        return self.solved / len(CODES)
+
+
+_tables = None
+
+
+def load_tables(filename=TABLE_FILENAME):
+    """Carga (y si no existe o es de otra versión, construye y guarda) las tablas la primera vez."""
+    global _tables
+    if _tables is not None:
+        return _tables
+    if not os.path.exists(filename):
+        write_tables(filename)
+    with open(filename, 'rb') as f:
+        buf = f.read()
+    if buf[:4] != MAGIC:
+        if buf[:3] != MAGIC[:3]:
+            raise ValueError(f"{filename} no es una tabla de minijuegos")
+        write_tables(filename)  # de una versión anterior: se reconstruye
+        with open(filename, 'rb') as f:
+            buf = f.read()
+    (games,) = struct.unpack_from('<H', buf, 4)
+    pos = 6
+    tables = {}
+    for _ in range(games):
+        raw, arity, count, root, solved = struct.unpack_from('<4sHHHH', buf, pos)
+        pos += 12
+        name = raw.rstrip(b'\0').decode('ascii')
+        tables[name] = StrategyTable(name, buf, pos, arity, count, root, solved)
+        pos += count * 2 * (1 + arity)
+    _tables = tables
+    return tables
+
+
+class Strategy:
+    """
+    Cursor sobre un árbol: .next_guess() da el intento, .feed(pista) avanza.
+    pista: nº de dígitos en posición (hack) o 'más'/'menos' (caja fuerte).
+    """
+    def __init__(self, game):
+        self.table = load_tables()[game]
+        self.node = self.table.root
+
+    def next_guess(self):
+        if self.node is None:
+            return None
+        return code_str(self.table.guess(self.node))
+
+    def feed(self, feedback):
+        if self.node is None:
+            return
+        if feedback == 'más':
+            feedback = 0
+        elif feedback == 'menos':
+            feedback = 1
+        self.node = self.table.child(self.node, feedback)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tablas de estrategia de los minijuegos")
+    parser.add_argument("--build", action="store_true", help="reconstruir minigames.tbl")
+    args = parser.parse_args()
+    if args.build and os.path.exists(TABLE_FILENAME):
+        os.remove(TABLE_FILENAME)
+    tables = load_tables()
+    print(f"{TABLE_FILENAME}: {os.path.getsize(TABLE_FILENAME)} bytes")
+    for name, t in tables.items():
+        print(f"  {name}: {t.count} nodos, probabilidad de éxito "
+              f"{100 * t.success_probability():.1f}% ({t.solved}/1000)")
+
+
+if __name__ == "__main__":
+    main()
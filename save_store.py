@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Almacén de partidas en SQLite para Ecos de Halcyon: muchas partidas con
+varias ranuras con nombre por jugador en un único archivo, en lugar de un
+JSON suelto por partida.
+
+Cada fila guarda el estado codificado (formato binario por defecto) y, en
+columnas indexadas, los metadatos que hacen falta para listar y reanudar sin
+decodificar nada: ubicación, turno, final y última vez jugada.
+
+    store = SaveStore("partidas.sqlite")
+    game.save_backend = store.slot("breixo", "principal")
+    store.slots("breixo")     # [{'slot': ..., 'location': ..., 'turn': ...}, ...]
+
+Ejecuta: python3 save_store.py partidas.sqlite [jugador]   (lista ranuras)
+"""
+
+import argparse
+import contextlib
+import queue
+import sqlite3
+import time
+
+from aventura2 import SAVE_CODECS, decode_save
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS saves (
+    player   TEXT NOT NULL,
+    slot     TEXT NOT NULL,
+    name     TEXT,
+    location TEXT,
+    turn     INTEGER,
+    ending   TEXT,
+    updated  REAL NOT NULL,
+    data     BLOB NOT NULL,
+    PRIMARY KEY (player, slot)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS saves_recent ON saves (player, updated DESC);
+CREATE INDEX IF NOT EXISTS saves_location ON saves (location);
+CREATE INDEX IF NOT EXISTS saves_ending ON saves (ending);
+"""
+
+META_COLUMNS = ('player', 'slot', 'name', 'location', 'turn', 'ending', 'updated')
+
+
+class SaveStore:
+    """
+    Partidas en una base SQLite, con una reserva de conexiones reutilizables
+    (modo WAL: los lectores no esperan al que escribe). Es seguro usarlo
+    desde varios hilos: cada operación toma una conexión de la reserva.
+    """
+    def __init__(self, path, codec='binario', pool_size=4, timeout=30.0):
+        self.path = path
+        self.codec = SAVE_CODECS[codec]
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        with self.connection() as con:
+            con.executescript(SCHEMA)
+
+    def _connect(self):
+        con = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                              check_same_thread=False)
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA synchronous=NORMAL")
+        return con
+
+    @contextlib.contextmanager
+    def connection(self):
+        """Presta una conexión de la reserva (o abre una si está vacía)."""
+        try:
+            con = self._pool.get_nowait()
+        except queue.Empty:
+            con = self._connect()
+        try:
+            yield con
+        finally:
+            try:
+                self._pool.put_nowait(con)
+            except queue.Full:
+                con.close()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Conexión dentro de una transacción: todo o nada."""
+        with self.connection() as con:
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                yield con
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+            con.execute("COMMIT")
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    # -------------------------
+    # Guardar y cargar
+    # -------------------------
+    def _row(self, player, slot, state, now):
+        data = dict(state)
+        data.pop('seq', None)
+        p = data['player']
+        return (player, slot, p.get('name'), p.get('location'), data.get('turn', 0),
+                data.get('flags', {}).get('ending'), now, self.codec.encode(data))
+
+    def save(self, player, slot, state):
+        self.save_many([(player, slot, state)])
+
+    def save_many(self, items):
+        """Guarda [(jugador, ranura, estado), ...] en una sola transacción."""
+        now = time.time()
+        rows = [self._row(player, slot, state, now) for player, slot, state in items]
+        with self.transaction() as con:
+            con.executemany("INSERT OR REPLACE INTO saves (player, slot, name, location, turn, "
+                            "ending, updated, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def load(self, player, slot):
+        """Estado guardado en la ranura, o None si no existe."""
+        with self.connection() as con:
+            row = con.execute("SELECT data FROM saves WHERE player = ? AND slot = ?",
+                              (player, slot)).fetchone()
+        return decode_save(row[0]) if row else None
+
+    def load_many(self, keys):
+        """{(jugador, ranura): estado} de las que existan, leídas en una transacción."""
+        keys = list(keys)
+        found = {}
+        with self.connection() as con:
+            con.execute("BEGIN")
+            try:
+                for player, slot in keys:
+                    row = con.execute("SELECT data FROM saves WHERE player = ? AND slot = ?",
+                                      (player, slot)).fetchone()
+                    if row:
+                        found[(player, slot)] = row[0]
+            finally:
+                con.execute("COMMIT")
+        return {key: decode_save(data) for key, data in found.items()}
+
+    def exists(self, player, slot):
+        with self.connection() as con:
+            return con.execute("SELECT 1 FROM saves WHERE player = ? AND slot = ?",
+                               (player, slot)).fetchone() is not None
+
+    def delete(self, player, slot):
+        with self.transaction() as con:
+            con.execute("DELETE FROM saves WHERE player = ? AND slot = ?", (player, slot))
+
+    # -------------------------
+    # Metadatos (sin decodificar estados)
+    # -------------------------
+    def _meta(self, sql, args):
+        with self.connection() as con:
+            rows = con.execute(sql, args).fetchall()
+        return [dict(zip(META_COLUMNS, row)) for row in rows]
+
+    def slots(self, player):
+        """Ranuras del jugador, la jugada más recientemente primero."""
+        return self._meta(f"SELECT {', '.join(META_COLUMNS)} FROM saves WHERE player = ? "
+                          "ORDER BY updated DESC", (player,))
+
+    def latest(self, player):
+        """Metadatos de la última ranura jugada (para reanudar), o None."""
+        rows = self._meta(f"SELECT {', '.join(META_COLUMNS)} FROM saves WHERE player = ? "
+                          "ORDER BY updated DESC LIMIT 1", (player,))
+        return rows[0] if rows else None
+
+    def at_location(self, location, limit=100):
+        return self._meta(f"SELECT {', '.join(META_COLUMNS)} FROM saves WHERE location = ? "
+                          "ORDER BY updated DESC LIMIT ?", (location, limit))
+
+    def endings(self):
+        """{final: número de partidas} de las que ya terminaron."""
+        with self.connection() as con:
+            rows = con.execute("SELECT ending, COUNT(*) FROM saves WHERE ending IS NOT NULL "
+                               "GROUP BY ending").fetchall()
+        return dict(rows)
+
+    def slot(self, player, slot):
+        return SaveSlot(self, player, slot)
+
+
+class SaveSlot:
+    """
+    Una ranura vista como el guardado de una partida: misma interfaz que
+    SaveJournal, para usarla como Game.save_backend.
+    """
+    def __init__(self, store, player, slot):
+        self.store = store
+        self.player = player
+        self.slot = slot
+        self.name = f"{player}/{slot}"
+
+    def save(self, state):
+        self.store.save(self.player, self.slot, state)
+
+    def load(self):
+        return self.store.load(self.player, self.slot)
+
+    def delete(self):
+        self.store.delete(self.player, self.slot)
+
+    def exists(self):
+        return self.store.exists(self.player, self.slot)
+
+    def close(self):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lista las partidas de un almacén SQLite")
+    parser.add_argument("db")
+    parser.add_argument("player", nargs="?")
+    args = parser.parse_args()
+    store = SaveStore(args.db)
+    if args.player is None:
+        for ending, n in sorted(store.endings().items()):
+            print(f"{ending:<20} {n}")
+        return
+    for s in store.slots(args.player):
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(s['updated']))
+        print(f"{s['slot']:<16} {s['name'] or '':<12} {s['location'] or '':<10} "
+              f"turno {s['turn']:<5} {s['ending'] or '-':<18} {when}")
+
+
+if __name__ == "__main__":
+    main()
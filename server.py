@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Servidor asyncio multi-sesión para Ecos de Halcyon (TCP/telnet).
+Todas las conexiones viven en un único bucle de eventos, sin un hilo por
+partida.
+
+Cómo funciona: las escenas son generadores que ceden cada pregunta al
+jugador (Input/Choice de aventura2). Cada sesión es una escena suspendida:
+al llegar una línea, advance() la reanuda en el propio bucle hasta que vuelve
+a preguntar algo o termina. Sólo corre una cosa a la vez y el código de las
+escenas no necesita locks. El trabajo de disco y del almacén SQLite que las
+escenas esperan (DiskWork: guardar, cargar, listar ranuras...) se hace en los
+hilos del ejecutor del bucle, así que no frena a las demás sesiones. Un turno
+nunca se repite: cada línea cuesta lo que cuesta procesarla, y guardar o
+escribir en el almacén ocurre una sola vez.
+
+Cada sesión juega con una semilla al azar (new_seed), que el servidor
+escribe en su salida al conectar ("Sesión N: semilla S") para poder repetir
+la partida.
+
+Con --db las partidas se guardan en un almacén SQLite (save_store.py): al
+conectar se pide un identificador de jugador y se elige una de sus ranuras.
+Si el cliente se desconecta a media partida se cierra su escena y se cierran
+su diario y su ranura.
+
+La salida se envía con ritmo de máquina de escribir mediante asyncio.sleep y
+drain(): un cliente lento sólo frena su propia sesión (backpressure).
+
+Con --metricas/--metricas-puerto se miden todas las sesiones (metrics.py).
+Cada sesión mide en un borrador propio (sin el tiempo que espera al jugador)
+que se suma al total al completar cada turno.
+--perfil-sesion N guarda un cProfile sólo de la sesión N.
+Con --idioma todas las sesiones juegan con el mismo catálogo de textos: el
+archivo se abre una vez con mmap y sus páginas se comparten.
+Ejecuta: python3 server.py --port 2323   (y conecta con: telnet localhost 2323)
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from aventura2 import (RESET, YELLOW, AutoSaver, Choice, DiskWork, Game, GameIO, Input,
+                       TextCatalog, new_seed)
+from metrics import Metrics, instrument, serve
+from save_store import SaveStore
+
+CLEAR = "\033[H\033[2J"
+
+
+class SessionIO(GameIO):
+    """
+    Salida a una lista de (texto, retardo por carácter). No hay entrada:
+    las preguntas las contesta Session.advance() al reanudar la escena.
+    """
+    def __init__(self):
+        self.pending = []
+
+    def _emit(self, text, delay=0.0):
+        self.pending.append((text, delay))
+
+    def print(self, *args, sep=" ", end="\n"):
+        self._emit(sep.join(str(a) for a in args) + end)
+
+    def slowprint(self, text, delay=0.01, newline=True):
+        self._emit(text + ("\n" if newline else ""), delay)
+
+    def cls(self):
+        self._emit(CLEAR)
+
+    def sleep(self, seconds):
+        self._emit("", seconds)
+
+    def ask(self, question):
+        """Muestra la pregunta igual que GameIO.input / input_choice."""
+        self._emit(question.prompt + " " if isinstance(question, Choice) else question.prompt)
+
+    def take_output(self):
+        out, self.pending = self.pending, []
+        return out
+
+
+class Session:
+    """
+    Una partida conectada: una escena suspendida en su pregunta pendiente.
+    advance() la reanuda en el bucle de eventos con la línea del jugador y
+    espera en el ejecutor el trabajo de disco que pida por el camino.
+    """
+    def __init__(self, session_id, save_dir, store=None, autosaver=None, autosave_every=0,
+                 metrics=None, texts=None):
+        self.id = session_id
+        self.io = SessionIO()
+        # semilla al azar (no el número de sesión, que se repite entre
+        # ejecuciones del servidor); handle() la apunta en el registro
+        self.game = Game(io=self.io, seed=new_seed())
+        self.game.texts = texts
+        self.game.autosaver = autosaver
+        self.game.autosave_every = autosave_every
+        self.game.save_filename = os.path.join(save_dir, f"savegame_sesion_{session_id}.json")
+        self.store = store
+        self.metrics = metrics
+        self.scratch = None
+        if metrics is not None:
+            self.scratch = Metrics()
+            instrument(self.game, self.scratch, io=False)
+        self.profiler = None
+        self.finished = False
+        self.scene = self._play()
+        self.question = None  # la pregunta que espera respuesta
+        self.asked = None     # cuándo se hizo (para no medir la espera del jugador)
+
+    def login(self):
+        """Identificador de jugador y ranura del almacén (sólo metadatos)."""
+        io = self.io
+        io.slowprint("Identificador de jugador:", 0.01, newline=False)
+        player = (yield Input(" ")).strip() or f"invitado{self.id}"
+        slots = yield DiskWork(self.store.slots, player)
+        io.slowprint(f"Ranuras de {player}:")
+        for i, s in enumerate(slots, 1):
+            when = time.strftime("%d/%m %H:%M", time.localtime(s['updated']))
+            ending = f"  final: {s['ending']}" if s['ending'] else ""
+            io.print(f"{i}) {s['slot']} - {s['name']} en {s['location']}, turno {s['turn']} ({when}){ending}")
+        io.print(f"{len(slots) + 1}) Ranura nueva")
+        choice = yield Choice("Elige ranura:", [str(i) for i in range(1, len(slots) + 2)])
+        index = int(choice) - 1
+        slot = slots[index]['slot'] if index < len(slots) else f"ranura{len(slots) + 1}"
+        self.game.save_backend = yield DiskWork(self.store.slot, player, slot)
+
+    async def advance(self, answer=None):
+        """
+        Entrega `answer` a la pregunta pendiente (la primera vez arranca la
+        partida) y ejecuta la escena hasta la siguiente pregunta o el final.
+        """
+        if self.finished:
+            return
+        value = None
+        if self.question is not None:
+            value = self.question.accept(answer)
+            if value is None:
+                self.io.print(YELLOW + "Opción no reconocida. Prueba otra vez." + RESET)
+                self.io.ask(self.question)
+                return
+            if self.scratch is not None:
+                self.scratch.add_blocked(time.perf_counter() - self.asked)
+            self.question = None
+        await self._resume(value)
+
+    async def close(self):
+        """
+        La conexión se cerró: abandona la escena (GeneratorExit en la pregunta
+        pendiente) y cierra el guardado de la partida, que game_over no cerrará.
+        """
+        if not self.finished:
+            self.finished = True
+            self.scene.close()
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.game.close_saves)
+        except Exception as e:
+            print(f"Sesión {self.id}: no se pudo cerrar el guardado: {e!r}", flush=True)
+
+    # -------------------------
+    # La escena de la partida
+    # -------------------------
+    async def _resume(self, value):
+        """Reanuda la escena; el trabajo de disco se espera en el ejecutor."""
+        loop = asyncio.get_running_loop()
+        error = None
+        while True:
+            if self.profiler is not None:
+                self.profiler.enable()
+            try:
+                wait = self.scene.throw(error) if error is not None else self.scene.send(value)
+            except StopIteration:
+                self.finished = True
+                return
+            except BaseException:
+                self.finished = True
+                raise
+            finally:
+                if self.profiler is not None:
+                    self.profiler.disable()
+            if not isinstance(wait, DiskWork):
+                break
+            try:
+                value, error = await loop.run_in_executor(None, wait.ask, self.io), None
+            except Exception as e:
+                value, error = None, e
+        self.question = wait
+        self.io.ask(wait)
+        self.asked = time.perf_counter()
+
+    def _turn_done(self):
+        if self.scratch is not None:
+            self.metrics.merge(self.scratch)
+            self.scratch.clear()
+
+    def _play(self):
+        g = self.game
+        if self.store is not None:
+            yield from self.login()
+            self._turn_done()
+        yield from g.begin()
+        self._turn_done()
+        while g.running and g.player and g.player.is_alive():
+            location = g.player.location
+            yield from g.step()
+            g.autosave(location)
+            self._turn_done()
+        yield from g.game_over()
+        self._turn_done()
+
+
+def strip_telnet(data):
+    """Quita las negociaciones IAC de telnet (0xFF ...) de una línea."""
+    out = bytearray()
+    i = 0
+    while i < len(data):
+        b = data[i]
+        if b == 0xFF and i + 1 < len(data):
+            cmd = data[i + 1]
+            i += 3 if 0xFB <= cmd <= 0xFE else 2
+            continue
+        out.append(b)
+        i += 1
+    return bytes(out)
+
+
+class GameServer:
+    def __init__(self, host="127.0.0.1", port=2323, max_sessions=5000, delay_scale=1.0,
+                 idle_timeout=900, chunk=8, save_dir="partidas_servidor", db=None,
+                 autosave_every=10, metrics=None, profile_session=None,
+                 profile_file="sesion.prof", texts=None):
+        self.host = host
+        self.port = port
+        self.max_sessions = max_sessions
+        self.delay_scale = delay_scale  # 0 = sin efecto máquina de escribir
+        self.idle_timeout = idle_timeout
+        self.chunk = chunk              # caracteres por escritura al escribir lento
+        self.save_dir = save_dir
+        self.store = SaveStore(db) if db else None
+        # un único hilo de autoguardado para todas las sesiones
+        self.autosaver = AutoSaver()
+        self.autosave_every = autosave_every
+        self.metrics = metrics
+        self.profile_session = profile_session
+        self.profile_file = profile_file
+        self.texts = texts
+        self.sessions = {}
+        self.next_id = 1
+        self.server = None
+
+    async def send(self, writer, items):
+        """Envía la salida con su ritmo. Devuelve los segundos de pausa pedidos."""
+        slept = 0.0
+        for text, delay in items:
+            delay *= self.delay_scale
+            data = text.replace("\n", "\r\n")
+            if not data:
+                if delay > 0:
+                    slept += delay
+                    await asyncio.sleep(delay)
+                continue
+            if delay <= 0:
+                writer.write(data.encode("utf-8"))
+            else:
+                for i in range(0, len(data), self.chunk):
+                    part = data[i:i + self.chunk]
+                    writer.write(part.encode("utf-8"))
+                    await writer.drain()
+                    slept += delay * len(part)
+                    await asyncio.sleep(delay * len(part))
+            await writer.drain()
+        return slept
+
+    async def advance(self, session, answer=None):
+        """session.advance(), medido si se pidió."""
+        start = time.perf_counter()
+        try:
+            await session.advance(answer)
+        finally:
+            elapsed = time.perf_counter() - start
+            if self.metrics is not None:
+                self.metrics.observe('halcyon_advance_seconds', elapsed)
+                self.metrics.maybe_write()
+
+    async def output(self, session, writer):
+        """Envía lo pendiente repartiendo su tiempo entre pausas y escritura."""
+        start = time.perf_counter()
+        slept = await self.send(writer, session.io.take_output())
+        if self.metrics is not None:
+            self.metrics.add_time('sleep', slept)
+            self.metrics.add_time('output', max(0.0, time.perf_counter() - start - slept))
+
+    async def handle(self, reader, writer):
+        if len(self.sessions) >= self.max_sessions:
+            writer.write("Servidor lleno. Inténtalo más tarde.\r\n".encode("utf-8"))
+            await self._close(writer)
+            return
+        session = Session(self.next_id, self.save_dir, self.store,
+                          self.autosaver, self.autosave_every, self.metrics, self.texts)
+        self.next_id += 1
+        self.sessions[session.id] = session
+        print(f"Sesión {session.id}: semilla {session.game.seed}", flush=True)
+        if session.id == self.profile_session:
+            import cProfile
+            session.profiler = cProfile.Profile()
+        if self.metrics is not None:
+            self.metrics.inc('halcyon_sessions_total')
+            self.metrics.set('halcyon_sessions_active', len(self.sessions))
+        try:
+            await self.advance(session)
+            while True:
+                await self.output(session, writer)
+                if session.finished:
+                    break
+                start = time.perf_counter()
+                line = await asyncio.wait_for(reader.readline(), self.idle_timeout)
+                if self.metrics is not None:
+                    self.metrics.add_time('input', time.perf_counter() - start)
+                if not line:
+                    break  # el cliente cerró la conexión
+                answer = strip_telnet(line).decode("utf-8", errors="replace").rstrip("\r\n")
+                await self.advance(session, answer)
+        except (asyncio.TimeoutError, ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            await session.close()
+            self.sessions.pop(session.id, None)
+            if self.metrics is not None:
+                self.metrics.set('halcyon_sessions_active', len(self.sessions))
+            if session.profiler is not None:
+                session.profiler.dump_stats(self.profile_file)
+            await self._close(writer)
+
+    async def _close(self, writer):
+        try:
+            writer.close()
+            await writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+
+    async def serve(self):
+        os.makedirs(self.save_dir, exist_ok=True)
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        async with self.server:
+            await self.server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor multi-sesión de Ecos de Halcyon")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2323)
+    parser.add_argument("--max-sessions", type=int, default=5000)
+    parser.add_argument("--delay-scale", type=float, default=1.0, help="0 = texto instantáneo")
+    parser.add_argument("--idle-timeout", type=float, default=900)
+    parser.add_argument("--save-dir", default="partidas_servidor")
+    parser.add_argument("--db", help="almacén SQLite de partidas (varias ranuras por jugador)")
+    parser.add_argument("--autosave", type=int, default=10, help="autoguardar cada N turnos (0 = nunca)")
+    parser.add_argument("--metricas", metavar="ARCHIVO",
+                        help="escribir las métricas de todas las sesiones (formato Prometheus)")
+    parser.add_argument("--metricas-puerto", type=int, metavar="PUERTO",
+                        help="servir las métricas en http://HOST:PUERTO/metrics")
+    parser.add_argument("--perfil-sesion", type=int, metavar="N",
+                        help="perfilar con cProfile la sesión número N")
+    parser.add_argument("--perfil-archivo", default="sesion.prof", metavar="ARCHIVO",
+                        help="dónde guardar el perfil de --perfil-sesion")
+    parser.add_argument("--idioma", metavar="CÓDIGO",
+                        help="idioma de los textos: un código (textos/<código>.cat) o un catálogo compilado")
+    args = parser.parse_args()
+    try:
+        texts = TextCatalog.find(args.idioma) if args.idioma else None
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    metrics = None
+    if args.metricas or args.metricas_puerto:
+        metrics = Metrics()
+        if args.metricas:
+            metrics.autowrite(args.metricas)
+        if args.metricas_puerto:
+            serve(metrics, args.metricas_puerto, args.host)
+    server = GameServer(args.host, args.port, args.max_sessions, args.delay_scale,
+                        args.idle_timeout, save_dir=args.save_dir, db=args.db,
+                        autosave_every=args.autosave, metrics=metrics,
+                        profile_session=args.perfil_sesion, profile_file=args.perfil_archivo,
+                        texts=texts)
+    print(f"Escuchando en {args.host}:{args.port}")
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.metricas:
+            metrics.write()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Simulador Monte Carlo de Ecos de Halcyon.
+Juega N partidas completas sin cabeza, repartidas en un pool de procesos,
+y resume finales, turnos, créditos, muertes y memorias recuperadas.
+Con --eventos cada proceso escribe además los eventos de sus partidas
+(events.py) para agregarlos con analytics.py.
+Ejecuta: python3 simulate.py --games 100000 --seed 1
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+
+from aventura2 import Game, NullIO, random_policy
+from events import EventLog, attach
+from minigame_solver import Strategy
+
+
+class MinigamePolicy:
+    """
+    Menús al azar, pero los minijuegos de código se juegan con las tablas
+    óptimas de minigame_solver (lee las pistas de la salida del juego).
+    """
+    def __init__(self, rng):
+        self.fallback = random_policy(rng)
+        self.strategy = None
+
+    def observe(self, text):
+        if text.startswith("MINIJUEGO:"):
+            self.strategy = Strategy('hack')
+        elif text.startswith("Caja fuerte:"):
+            self.strategy = Strategy('safe')
+        elif self.strategy is not None:
+            if text.startswith("Pistas: "):
+                self.strategy.feed(int(text.split()[1]))
+            elif "Pista: la suma de dígitos es " in text:
+                self.strategy.feed('más' if " es más " in text else 'menos')
+
+    def __call__(self, prompt, choices):
+        if choices is None and self.strategy is not None and (
+                prompt.startswith("Introduce 3 dígitos") or prompt.startswith("Intento (")):
+            guess = self.strategy.next_guess()
+            if guess is not None:
+                return guess
+        return self.fallback(prompt, choices)
+
+
+# políticas disponibles por nombre (fábricas que reciben un random.Random)
+POLICIES = {
+    'random': random_policy,
+    'minijuegos': MinigamePolicy,
+}
+
+
+def game_seed(seed, index):
+    """Semilla de la partida `index`: no depende del número de procesos."""
+    return seed * 1000003 + index
+
+
+def play_one(seed, policy='random', max_turns=500, save_dir=None, events=None):
+    """
+    Juega una partida completa con la semilla dada (registrando sus eventos
+    en `events`, un EventLog, si se da).
+    Devuelve (final, turnos, créditos, murió, memorias, cortada).
+    """
+    rng = random.Random(seed)
+    game = Game(io=NullIO(POLICIES[policy](rng)), seed=seed)
+    if events is not None:
+        attach(game, events)
+    game.save_filename = os.path.join(save_dir or tempfile.gettempdir(), f"sim_{os.getpid()}.json")
+    try:
+        game.play(game.new_game())
+        while game.running and game.player.is_alive() and game.turn < max_turns:
+            game.play(game.step())
+    finally:
+        game.play(game.delete_save())
+    p = game.player
+    cut = game.running and p.is_alive()
+    return (game.flags.get('ending'), game.turn, p.credits, not p.is_alive(), len(p.memories), cut)
+
+
+def _new_stats():
+    return {
+        'games': 0,
+        'endings': Counter(),
+        'turns': Counter(),
+        'credits': Counter(),
+        'memories': Counter(),
+        'deaths': 0,
+        'cut': 0,
+    }
+
+
+def _merge(total, part):
+    total['games'] += part['games']
+    total['deaths'] += part['deaths']
+    total['cut'] += part['cut']
+    for key in ('endings', 'turns', 'credits', 'memories'):
+        total[key].update(part[key])
+    return total
+
+
+def run_chunk(args):
+    """Trabajo de un proceso: juega las partidas [start, start+count)."""
+    seed, start, count, policy, max_turns, events_dir = args
+    stats = _new_stats()
+    events = EventLog(events_dir) if events_dir else None
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(start, start + count):
+            ending, turns, credits, died, memories, cut = play_one(
+                game_seed(seed, i), policy, max_turns, tmp, events)
+            stats['games'] += 1
+            stats['endings'][ending or 'sin_final'] += 1
+            stats['turns'][turns] += 1
+            stats['credits'][credits] += 1
+            stats['memories'][memories] += 1
+            stats['deaths'] += died
+            stats['cut'] += cut
+    if events is not None:
+        events.close()
+    return stats
+
+
+def simulate(games, seed=0, workers=None, policy='random', max_turns=500, chunk_size=None,
+             events_dir=None):
+    """
+    Juega `games` partidas y devuelve las distribuciones agregadas.
+    Con la misma semilla el resultado es idéntico (cada partida tiene su semilla).
+    Con events_dir, los eventos de las partidas se escriben en ese directorio.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Política desconocida: {policy}")
+    workers = workers or os.cpu_count() or 1
+    chunk_size = chunk_size or max(1, min(1000, games // (workers * 4) or 1))
+    jobs = [(seed, start, min(chunk_size, games - start), policy, max_turns, events_dir)
+            for start in range(0, games, chunk_size)]
+    total = _new_stats()
+    if workers == 1:
+        for job in jobs:
+            _merge(total, run_chunk(job))
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            for part in pool.imap_unordered(run_chunk, jobs):
+                _merge(total, part)
+    return total
+
+
+def summarize(counter):
+    """Media, mínimo, percentiles y máximo de un histograma {valor: veces}."""
+    n = sum(counter.values())
+    if n == 0:
+        return {}
+    values = sorted(counter)
+    out = {'mean': sum(v * c for v, c in counter.items()) / n, 'min': values[0], 'max': values[-1]}
+    for q in (50, 90, 99):
+        target = n * q / 100
+        acc = 0
+        for v in values:
+            acc += counter[v]
+            if acc >= target:
+                out[f'p{q}'] = v
+                break
+    return out
+
+
+def print_report(stats, elapsed=None):
+    n = stats['games']
+    print(f"Partidas: {n}" + (f" en {elapsed:.2f}s ({n / elapsed:.0f} partidas/s)" if elapsed else ""))
+    print(f"Muertes: {stats['deaths']} ({100 * stats['deaths'] / n:.1f}%)")
+    print(f"Cortadas por límite de turnos: {stats['cut']}")
+    print("Finales:")
+    for ending, count in stats['endings'].most_common():
+        print(f"  {ending:<20} {count:>9} ({100 * count / n:.2f}%)")
+    for key, label in (('turns', 'Turnos'), ('credits', 'Créditos'), ('memories', 'Memorias')):
+        s = summarize(stats[key])
+        print(f"{label}: media {s['mean']:.2f}  min {s['min']}  p50 {s['p50']}  "
+              f"p90 {s['p90']}  p99 {s['p99']}  max {s['max']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulador Monte Carlo de partidas")
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="procesos (por defecto, todos los núcleos)")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default='random')
+    parser.add_argument("--max-turns", type=int, default=500)
+    parser.add_argument("--eventos", metavar="DIRECTORIO",
+                        help="registrar los eventos de las partidas en NDJSON (ver analytics.py)")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    stats = simulate(args.games, args.seed, args.workers, args.policy, args.max_turns,
+                     events_dir=args.eventos)
+    print_report(stats, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""Utilidades comunes de las pruebas (el juego se importa desde la raíz del repositorio)."""
+
+import io
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aventura2  # noqa: E402
+from aventura2 import Game, MemorySave, NullIO, random_policy  # noqa: E402
+
+
+class Terminal(io.StringIO):
+    """stdin/stdout de prueba que dicen ser (o no) una terminal."""
+    def __init__(self, tty):
+        super().__init__()
+        self.tty = tty
+
+    def isatty(self):
+        return self.tty
+
+
+def run_main(monkeypatch, tmp_path, *argv, tty=True):
+    """Ejecuta main() hasta game.start() y devuelve la partida que iba a empezar."""
+    started = []
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, 'argv', ['aventura2.py', *argv])
+    monkeypatch.setattr(sys, 'stdin', Terminal(tty))
+    monkeypatch.setattr(sys, 'stdout', Terminal(tty))
+    monkeypatch.setattr(Game, 'start', lambda self: started.append(self))
+    aventura2.main()
+    assert len(started) == 1
+    return started[0]
+
+
+def limited_policy(seed, answers):
+    """random_policy que se corta (EOFError) tras `answers` respuestas."""
+    policy = random_policy(random.Random(seed))
+    left = [answers]
+
+    def answer(prompt, choices):
+        if left[0] <= 0:
+            raise EOFError("fin de la prueba")
+        left[0] -= 1
+        return policy(prompt, choices)
+    return answer
+
+
+def play(game, turns):
+    """Partida nueva y `turns` turnos (o hasta que acabe), sin tocar el disco."""
+    game.save_backend = game.save_backend or MemorySave()
+    game.play(game.new_game())
+    while game.running and game.player.is_alive() and game.turn < turns:
+        game.play(game.step())
+    return game
+
+
+@pytest.fixture
+def game():
+    """Partida sin cabeza con respuestas al azar repetibles y guardado en memoria."""
+    g = Game(io=NullIO(random_policy(random.Random(5))), seed=5)
+    g.save_backend = MemorySave()
+    return g
+
+
+@pytest.fixture
+def sample_state():
+    """Estado de partida con objetos, memorias y flags de todos los tipos."""
+    return {
+        'player': {'name': 'Ava', 'max_hp': 30, 'hp': 21, 'attack': 6, 'defense': 2,
+                   'inventory': ['multiherramienta', 'kit_medico', 'kit_medico'], 'credits': 15,
+                   'memories': ['registro_kessler', 'eco_raro'], 'location': 'lab',
+                   'has_map': True, 'reputation': -1},
+        'visited': ['entrada', 'lab', 'pasillo'],
+        'flags': {'prologo_done': True, 'core_locked': False, 'ending': 'paz', 'alarmas': 3,
+                  'uno': 1, 'cero': 0, 'nada': None, 'enorme': 2 ** 40, 'lista': [1, 'dos'],
+                  'ñandú': 'señal'},
+        'turn': 42,
+        'seq': 5,
+    }
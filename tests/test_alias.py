@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""Tablas de aparición de enemigos con el método alias."""
+
+import random
+
+import pytest
+
+from aventura2 import ENEMIES, ENEMY_TYPES, AliasTable
+
+
+@pytest.mark.parametrize('weights', [
+    {'a': 1},
+    {'a': 1, 'b': 1, 'c': 1},
+    {'a': 1, 'b': 2, 'c': 7},
+    {'a': 5, 'b': 0, 'c': 1, 'd': 3, 'e': 11},
+    {f"x{i}": i * i + 1 for i in range(40)},
+])
+def test_alias_probabilities_match_weights(weights):
+    table = AliasTable(weights.items())
+    total = sum(weights.values())
+    probs = table.probabilities()
+    assert set(probs) == {k for k, w in weights.items() if w > 0}
+    for item, p in probs.items():
+        assert p == pytest.approx(weights[item] / total, abs=1e-12)
+    assert sum(probs.values()) == pytest.approx(1.0)
+
+
+def test_alias_sampling_follows_probabilities():
+    table = AliasTable([('a', 1), ('b', 2), ('c', 7)])
+    rng = random.Random(1)
+    n = 20000
+    counts = {'a': 0, 'b': 0, 'c': 0}
+    for _ in range(n):
+        counts[table.sample(rng)] += 1
+    for item, p in table.probabilities().items():
+        assert counts[item] / n == pytest.approx(p, abs=0.02)
+
+
+def test_uniform_alias_table_consumes_rng_like_choice():
+    items = ['a', 'b', 'c', 'd', 'e']
+    table = AliasTable((item, 3) for item in items)
+    assert all(cut is None for cut in table.cut)
+    a, b = random.Random(9), random.Random(9)
+    assert [table.sample(a) for _ in range(50)] == [b.choice(items) for _ in range(50)]
+
+
+def test_alias_table_rejects_empty_weights():
+    with pytest.raises(ValueError):
+        AliasTable([])
+    with pytest.raises(ValueError):
+        AliasTable([('a', 0)])
+
+
+def test_enemy_tables_follow_enemy_types():
+    for (difficulty, location), table in ENEMIES.tables.items():
+        weights = {}
+        for key, data in ENEMY_TYPES.items():
+            spawn = data.get('spawn', {}).get(difficulty, {})
+            weights[key] = spawn.get(location, spawn.get('*', 0))
+        total = sum(weights.values())
+        for enemy_type, p in table.probabilities().items():
+            assert p == pytest.approx(weights[enemy_type.key] / total)
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""Autoguardado en segundo plano: cada N turnos, al cambiar de escena y por defecto cada 10."""
+
+import atexit
+
+import pytest
+
+from aventura2 import AutoSaver, MemorySave
+from conftest import play, run_main
+
+
+class _Saver:
+    """AutoSaver de prueba: apunta lo que se le entrega."""
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, target, state):
+        self.submitted.append(state['turn'])
+
+    def flush(self, target=None):
+        pass
+
+
+def test_autosave_every_n_turns_and_on_scene_change(game):
+    play(game, 0)
+    game.autosaver = _Saver()
+    game.autosave_every = 10
+    here = game.player.location
+    for turn in range(1, 31):
+        game.turn = turn
+        game.autosave(here)
+    assert game.autosaver.submitted == [10, 20, 30]
+    game.turn = 31
+    game.autosave('otra_sala')
+    assert game.autosaver.submitted[-1] == 31
+
+
+def test_autosave_off_and_after_death(game):
+    play(game, 0)
+    game.autosaver = _Saver()
+    game.autosave_every = 0
+    game.turn = 10
+    game.autosave(None)
+    game.autosave_every = 10
+    game.player.hp = 0
+    game.autosave(None)
+    assert game.autosaver.submitted == []
+
+
+def test_autosaver_writes_latest_state(game):
+    play(game, 3)
+    game.autosave_every = 1
+    game.turn = 7
+    game.autosave(None)
+    game.turn = 8
+    game.autosave(None)
+    game.flush_saves()
+    try:
+        assert game.save_backend.load()['turn'] == 8
+    finally:
+        game.autosaver.close()
+
+
+class _Broken:
+    """Destino cuya escritura falla."""
+    name = 'roto'
+
+    def save(self, state):
+        raise OSError("disco lleno")
+
+    def exists(self):
+        return False
+
+    def close(self):
+        pass
+
+
+def test_autosaver_reports_failed_writes_on_flush(caplog):
+    saver = AutoSaver()
+    broken, good = _Broken(), MemorySave()
+    saver.submit(broken, {'turn': 1})
+    saver.submit(good, {'turn': 1})
+    saver.flush(good)
+    with pytest.raises(OSError, match="disco lleno"):
+        saver.flush(broken)
+    saver.flush(broken)  # ya se informó
+    assert saver.errors == 1
+    assert "No se pudo autoguardar en roto" in caplog.text
+    saver.submit(broken, {'turn': 2})
+    with pytest.raises(OSError):
+        saver.close()
+
+
+def test_autosaver_registers_atexit_once(monkeypatch):
+    registered = []
+    monkeypatch.setattr(atexit, 'register', registered.append)
+    saver = AutoSaver()
+    for turn in range(3):
+        saver.submit(MemorySave(), {'turn': turn})
+        saver.close()
+    assert registered == [saver.close]
+
+
+def test_game_over_reports_failed_autosave(game):
+    play(game, 0)
+    game.save_backend = _Broken()
+    game.autosaver = AutoSaver()
+    game.autosaver.submit(game.saves, game.save_state())
+    game.player.hp = 0
+    game.play(game.game_over())
+    assert not game.running
+    assert game.autosaver.errors == 1
+
+
+def test_main_autosaves_every_10_turns_by_default(monkeypatch, tmp_path):
+    assert run_main(monkeypatch, tmp_path).autosave_every == 10
+    assert run_main(monkeypatch, tmp_path, '--autoguardado', '0', tty=False).autosave_every == 0
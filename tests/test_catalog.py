@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""Catálogo de textos compilado: búsqueda por hash sobre un archivo mapeado en memoria."""
+
+import pytest
+
+import aventura2
+from aventura2 import TextCatalog, text_id, translate
+
+
+def test_catalog_lookup_by_text_hash(tmp_path):
+    texts = {text_id("Hola"): "Hello", text_id("Elige 1 o 2:"): "Choose 1 or 2:",
+             text_id("Año"): "Year ñ ✓"}
+    filename = str(tmp_path / "en.cat")
+    TextCatalog.write(filename, texts, "en")
+    catalog = TextCatalog(filename)
+    assert catalog.language == "en" and len(catalog) == 3
+    assert catalog.get(text_id("Hola")) == "Hello"
+    assert catalog.get(text_id("Año")) == "Year ñ ✓"
+    assert catalog.get(text_id("No está")) is None
+    assert catalog.get(text_id("No está"), "x") == "x"
+    assert translate(catalog, "Elige 1 o 2:") == "Choose 1 or 2:"
+    assert translate(catalog, "Sin traducir") == "Sin traducir"
+    assert translate(None, "Hola") == "Hola"
+
+
+def test_catalog_linear_probing_on_collisions(tmp_path):
+    # con 3 textos la tabla tiene 8 ranuras: estos IDs caen todos en la 5
+    keys = [5, 5 + 8, 5 + 64, 7]
+    texts = {key: f"texto {key}" for key in keys}
+    filename = str(tmp_path / "choques.cat")
+    TextCatalog.write(filename, texts)
+    catalog = TextCatalog(filename)
+    assert catalog.mask == 7
+    for key in keys:
+        assert catalog.get(key) == f"texto {key}"
+    assert catalog.get(5 + 16) is None
+    assert catalog.get(6) is None
+
+
+def test_catalog_open_is_shared_and_checks_the_header(tmp_path, monkeypatch):
+    filename = str(tmp_path / "es.cat")
+    TextCatalog.write(filename, {text_id("Hola"): "Hola"})
+    assert TextCatalog.open(filename) is TextCatalog.open(filename)
+    bad = tmp_path / "roto.cat"
+    bad.write_bytes(b"no es un catalogo".ljust(64, b"\0"))
+    with pytest.raises(ValueError):
+        TextCatalog(str(bad))
+    # el español es el texto original: sin catálogo compilado no hace falta ninguno
+    monkeypatch.setattr(aventura2, 'TEXTS_DIR', str(tmp_path / "textos"))
+    assert TextCatalog.find("es") is None
+    assert TextCatalog.find(filename).get(text_id("Hola")) == "Hola"
+    with pytest.raises(FileNotFoundError):
+        TextCatalog.find("idioma_que_no_existe")
+
+
+def test_text_id_is_stable_and_never_zero():
+    assert text_id("Hola") == text_id("Hola")
+    assert text_id("Hola") != text_id("hola")
+    assert text_id("") != 0
+    assert text_id("Hola") < 2 ** 64
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""Formatos de guardado: JSON y binario versionado con migraciones."""
+
+import pytest
+
+import aventura2
+from aventura2 import BinaryCodec, JsonCodec, decode_save
+
+# checkpoint escrito por la versión 1 del formato binario (flags campo a campo)
+BINARY_V1 = bytes.fromhex(
+    "4853560130000400190000004176610065636f5f7261726f00616c61726d6173006e6164611e00150006000200"
+    "ffff0f0000002a0000000500000001300002000300000008000a000a0002000000130031000300000000000200"
+    "010005001c00011d00002900032b0032000203000000330004"
+)
+BINARY_V1_STATE = {
+    'player': {'name': 'Ava', 'max_hp': 30, 'hp': 21, 'attack': 6, 'defense': 2,
+               'inventory': ['multiherramienta', 'kit_medico', 'kit_medico'], 'credits': 15,
+               'memories': ['registro_kessler', 'eco_raro'], 'location': 'lab', 'has_map': True,
+               'reputation': -1},
+    'visited': ['entrada', 'lab', 'pasillo'],
+    'flags': {'prologo_done': True, 'core_locked': False, 'ending': 'paz', 'alarmas': 3, 'nada': None},
+    'turn': 42,
+    'seq': 5,
+}
+
+
+@pytest.mark.parametrize('codec', [JsonCodec(), BinaryCodec()], ids=lambda c: c.name)
+def test_codec_round_trip(codec, sample_state):
+    data = codec.encode(sample_state)
+    assert codec.decode(data) == sample_state
+    assert decode_save(data) == sample_state
+
+
+def test_binary_keeps_value_types(sample_state):
+    flags = BinaryCodec().decode(BinaryCodec().encode(sample_state))['flags']
+    assert flags['uno'] == 1 and flags['uno'] is not True
+    assert flags['cero'] == 0 and flags['cero'] is not False
+    assert flags['core_locked'] is False and flags['nada'] is None
+    assert list(flags) == list(sample_state['flags'])
+
+
+def test_binary_empty_state():
+    state = {'player': {'name': '', 'max_hp': 1, 'hp': 0, 'attack': 0, 'defense': 0, 'inventory': [],
+                        'credits': 0, 'memories': [], 'location': 'entrada', 'has_map': False,
+                        'reputation': 0},
+             'visited': [], 'flags': {}, 'turn': 0, 'seq': 0}
+    assert BinaryCodec().decode(BinaryCodec().encode(state)) == state
+
+
+def test_binary_is_smaller_than_json(sample_state):
+    assert len(BinaryCodec().encode(sample_state)) < len(JsonCodec().encode(sample_state))
+
+
+def test_binary_reads_version_1():
+    assert BINARY_V1[3] == 1
+    assert BinaryCodec().decode(BINARY_V1) == BINARY_V1_STATE
+    assert decode_save(BINARY_V1) == BINARY_V1_STATE
+
+
+def test_binary_applies_migrations_in_order(monkeypatch, sample_state):
+    data = BinaryCodec().encode(sample_state)
+    version = BinaryCodec.VERSION
+
+    def migrate(state):
+        state = dict(state)
+        state['turn'] += 1000
+        return state
+    monkeypatch.setattr(BinaryCodec, 'VERSION', version + 1)
+    monkeypatch.setitem(aventura2.BINARY_MIGRATIONS, version, migrate)
+    assert BinaryCodec().decode(data)['turn'] == sample_state['turn'] + 1000
+    assert BinaryCodec().decode(BINARY_V1)['turn'] == BINARY_V1_STATE['turn'] + 1000
+
+
+def test_binary_rejects_unknown_versions(sample_state):
+    data = bytearray(BinaryCodec().encode(sample_state))
+    data[3] = BinaryCodec.VERSION + 1
+    with pytest.raises(ValueError):
+        BinaryCodec().decode(bytes(data))
+    data[3] = 0
+    with pytest.raises(ValueError):
+        BinaryCodec().decode(bytes(data))
+    with pytest.raises(ValueError):
+        BinaryCodec().decode(b'{"player": {}}')
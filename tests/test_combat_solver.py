@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""Tablas de combate: capas guardadas, consultas por índice y el relleno por filas de reserva."""
+
+from combat_solver import ACTIONS, CombatTable
+
+
+def _table(**kwargs):
+    return CombatTable(30, 6, 2, 8, 3, ACTIONS, **kwargs)
+
+
+def test_stored_layers_match_rolling_fill():
+    table = _table()
+    items = (1, 1, 0, 1)
+    for php, ehp in ((30, 40), (12, 7), (1, 1), (25, 33)):
+        stored = table.solve(php, ehp, items)
+        rolling = _table()._fill(php, ehp, items)
+        assert (stored.action, stored.win, stored.lose, stored.hp) == \
+               (rolling.action, rolling.win, rolling.lose, rolling.hp)
+
+
+def test_later_queries_are_lookups(monkeypatch):
+    table = _table()
+    table.solve(30, 40, (2, 1, 0, 0))
+    assert len(table.layers) == 6
+    calls = []
+    monkeypatch.setattr(table, '_fill', lambda *args, **kw: calls.append(args))
+    table.solve(17, 23, (2, 1, 0, 0))
+    table.solve(5, 40, (1, 0, 0, 0))
+    assert not calls
+
+
+def test_more_items_reuse_stored_layers():
+    table = _table()
+    table.solve(30, 40, (1, 0, 0, 0))
+    kept = table.layers[(1, 0, 0, 0)]
+    table.solve(30, 40, (1, 1, 0, 0))
+    assert table.layers[(1, 0, 0, 0)] is kept
+    assert len(table.layers) == 4
+
+
+def test_huge_tables_are_not_stored():
+    table = _table(max_cells=1000)
+    result = table.solve(30, 200, (0, 0, 0, 0))
+    assert not table.layers and table.cells == 0
+    assert 0.0 <= result.win <= 1.0
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""Registro de eventos: el origen de cada combate llega explícito desde quien lo empieza."""
+
+import json
+
+import events
+from aventura2 import ENEMIES, NullIO
+from conftest import play
+
+
+def _attach(game, tmp_path):
+    log = events.EventLog(str(tmp_path))
+    events.attach(game, log)
+    return log
+
+
+def _read(log):
+    log.close()
+    with open(log.filename, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_combat_origin_is_passed_explicitly(game, tmp_path):
+    log = _attach(game, tmp_path)
+    play(game, 0)
+    game.play(game.encounter_enemy(ENEMIES.spawn('dron_hostil'), origin='combat_core'))
+    game.play(game.random_encounter(origin='forzar_puerta'))
+    scene = game.player.location  # sin origin cuenta la escena donde empezó
+    game.play(game.random_encounter())
+    origins = [e['origin'] for e in _read(log) if e['type'] == 'combat_end']
+    assert origins == ['combat_core', 'forzar_puerta', scene]
+
+
+def test_death_cause_is_the_fight_origin(game, tmp_path):
+    game.io = NullIO(lambda prompt, choices: "1")  # siempre ataca
+    _attach(game, tmp_path)
+    play(game, 0)
+    game.player.hp, game.player.defense = 1, 0
+    game.play(game.encounter_enemy(ENEMIES.spawn('nucleo'), origin='combat_core'))
+    assert not game.player.is_alive()
+    # traced_step emite la muerte al acabar el turno con esta causa
+    assert game.events.cause == 'combat_core'
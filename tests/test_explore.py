@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""Explorador de estados: la clave del inventario y el horizonte de turnos."""
+
+import copy
+
+from explore import INVENTORY_CAP, canonical, ending_probabilities, explore, state_key
+
+
+def _with_inventory(state, items):
+    state = copy.deepcopy(state)
+    state['player']['inventory'] = list(items)
+    return canonical(state)
+
+
+def test_key_counts_items_for_forcing_the_door(sample_state):
+    one = _with_inventory(sample_state, ['kit_medico'])
+    two = _with_inventory(sample_state, ['kit_medico', 'kit_medico'])
+    assert two['player']['inventory'] == ['kit_medico', 'kit_medico']
+    assert state_key(one) != state_key(two)
+    full = _with_inventory(sample_state, ['kit_medico'] * INVENTORY_CAP)
+    more = _with_inventory(sample_state, ['kit_medico'] * (INVENTORY_CAP + 3))
+    assert state_key(full) == state_key(more)
+
+
+def test_horizon_leaves_the_rest_open():
+    result = explore(workers=1, max_states=10000, hp_step=10, horizon=2)
+    assert result.horizon and not result.truncated
+    probs = ending_probabilities(result, turns=10)
+    assert 'sin_explorar' not in probs
+    assert abs(sum(probs.values()) - 1.0) < 1e-9
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""Grafo de salas: rutas más cortas, puertas y caché de tablas de distancias."""
+
+from aventura2 import Game, NullIO, RoomGraph, StationMap
+from conftest import run_main
+
+
+def _graph(precompute_limit=0):
+    #   a -> b -(puerta)-> c       camino largo: a -> d -> e -> c
+    edges = [('a', 'b'), ('b', 'c', 'puerta'), ('a', 'd'), ('d', 'e'), ('e', 'c'), ('c', 'f')]
+    return RoomGraph('abcdef', edges, precompute_limit=precompute_limit)
+
+
+def test_graph_gate_changes_routes():
+    g = _graph()
+    assert g.path('a', 'c') == ['a', 'd', 'e', 'c']
+    g.set_gate('puerta', True)
+    assert g.path('a', 'c') == ['a', 'b', 'c']
+    assert g.distance('a', 'f') == 3
+    g.set_gate('puerta', False)
+    assert g.distance('a', 'c') == 3
+    assert g.path('b', 'c') is None
+    assert g.distance('b', 'f') is None
+
+
+def test_graph_gate_only_drops_affected_tables():
+    g = _graph()
+    idx = g.index
+    for room in 'abdef':
+        g.distance(room, 'c')
+    kept = {room: g.tables[idx[room]] for room in 'def'}
+    g.set_gate('puerta', True)
+    # a y b llegan al origen de la puerta; d, e y f no
+    assert idx['a'] not in g.tables and idx['b'] not in g.tables
+    assert all(g.tables[idx[room]] is table for room, table in kept.items())
+    for room in 'ab':
+        g.distance(room, 'c')
+    kept = {room: g.tables[idx[room]] for room in 'def'}
+    g.set_gate('puerta', False)
+    # cerrar sólo rompe las rutas que pasaban por la puerta (a y b)
+    assert idx['a'] not in g.tables and idx['b'] not in g.tables
+    assert all(g.tables[idx[room]] is table for room, table in kept.items())
+    assert g.path('a', 'c') == ['a', 'd', 'e', 'c']
+
+
+def test_graph_sync_with_flags():
+    g = _graph(precompute_limit=512)
+    assert len(g.tables) == 6
+    g.sync({'puerta': True})
+    assert g.open == {'puerta'} and g.distance('a', 'c') == 2
+    g.sync({'puerta': False})
+    assert not g.open and g.distance('a', 'c') == 3
+    g.sync({})
+    assert g.distance('a', 'c') == 3
+
+
+def test_graph_cache_is_bounded():
+    rooms = [f"r{i}" for i in range(50)]
+    edges = [(rooms[i], rooms[i + 1]) for i in range(49)]
+    g = RoomGraph(rooms, edges, precompute_limit=0, cache_size=8)
+    for room in rooms:
+        g.distance(room, rooms[-1])
+    assert len(g.tables) == 8
+    assert g.distance(rooms[0], rooms[-1]) == 49
+    assert [r for r, _ in g.reachable(rooms[45])] == rooms[46:]
+
+
+def test_generated_station_keeps_the_story_rooms():
+    classic = Game(io=NullIO(), seed=1).station
+    station = StationMap.generate(200, seed=7, around=classic)
+    assert len(station) == 200
+    assert all(room in station for room in classic.ids)
+    graph = RoomGraph.for_game(station)
+    graph.sync({'puerta_forzada': True, 'panel_open': True, 'nucleo_access': True})
+    assert graph.path('entrada', 'nucleo') is not None
+    # las salas generadas se alcanzan desde la historia (viaje rápido) y al revés
+    sectors = [r for r in station.ids if r.startswith('sector_')]
+    assert all(graph.distance('entrada', r) is not None for r in sectors)
+    assert all(graph.distance(r, 'entrada') is not None for r in sectors)
+
+
+def test_generar_starts_at_the_entrance(monkeypatch, tmp_path):
+    game = run_main(monkeypatch, tmp_path, '--generar', '60', '--semilla', '3')
+    assert len(game.station) == 60 and 'entrada' in game.station
+    game.io = NullIO(lambda prompt, choices: choices[0] if choices else "")
+    game.play(game.new_game())
+    assert game.player.location == 'entrada'
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""Diario de guardado: deltas con número de secuencia sobre un checkpoint atómico."""
+
+import json
+
+import pytest
+
+from aventura2 import SaveJournal
+
+
+def _states(sample_state, n):
+    """n estados sucesivos: cada uno añade una memoria y avanza un turno."""
+    state = json.loads(json.dumps(sample_state))
+    state.pop('seq', None)
+    out = []
+    for i in range(n):
+        state['turn'] += 1
+        state['player']['memories'].append(f"memoria_{i}")
+        out.append(json.loads(json.dumps(state)))
+    return out
+
+
+@pytest.fixture(params=['json', 'binario'])
+def journal_path(request, tmp_path):
+    return str(tmp_path / 'partida.json'), request.param
+
+
+def test_journal_appends_deltas_and_loads(journal_path, sample_state):
+    filename, codec = journal_path
+    journal = SaveJournal(filename, codec, compact_every=100)
+    states = _states(sample_state, 5)
+    for state in states:
+        journal.save(state)
+    journal.close()
+    with open(filename + '.journal', encoding='utf-8') as f:
+        lines = [json.loads(line) for line in f]
+    assert [d['seq'] for d in lines] == [1, 2, 3, 4]
+    assert lines[0]['pa'] == {'memories': ['memoria_1']}
+    assert SaveJournal(filename, codec).load() == states[-1]
+
+
+def test_journal_compacts_into_checkpoint(journal_path, sample_state):
+    filename, codec = journal_path
+    journal = SaveJournal(filename, codec, compact_every=4)
+    states = _states(sample_state, 9)
+    for state in states[:5]:
+        journal.save(state)
+    # el 1.º es el checkpoint inicial; el 5.º llena el diario y compacta
+    assert journal.entries == 0
+    with open(filename + '.journal', encoding='utf-8') as f:
+        assert f.read() == ""
+    for state in states[5:]:
+        journal.save(state)
+    journal.close()
+    reopened = SaveJournal(filename, codec, compact_every=4)
+    assert reopened.load() == states[-1]
+    assert (reopened.seq, reopened.entries) == (journal.seq, journal.entries)
+    # se puede seguir guardando sobre lo cargado
+    more = _states(states[-1], 2)
+    for state in more:
+        reopened.save(state)
+    reopened.close()
+    assert SaveJournal(filename, codec).load() == more[-1]
+
+
+def test_journal_skips_deltas_already_in_checkpoint(journal_path, sample_state):
+    # corte entre renombrar el checkpoint nuevo y vaciar el diario: las
+    # deltas viejas siguen ahí, pero su seq ya está incluida en el checkpoint
+    filename, codec = journal_path
+    journal = SaveJournal(filename, codec, compact_every=100)
+    states = _states(sample_state, 4)
+    for state in states:
+        journal.save(state)
+    journal.close()
+    with open(filename + '.journal', encoding='utf-8') as f:
+        stale = f.read()
+    journal.checkpoint(states[-1])
+    with open(filename + '.journal', 'w', encoding='utf-8') as f:
+        f.write(stale)
+    loaded = SaveJournal(filename, codec).load()
+    assert loaded == states[-1]
+    assert loaded['player']['memories'].count('memoria_3') == 1
+
+
+def test_journal_ignores_torn_last_line(journal_path, sample_state):
+    filename, codec = journal_path
+    journal = SaveJournal(filename, codec, compact_every=100)
+    states = _states(sample_state, 4)
+    for state in states:
+        journal.save(state)
+    journal.close()
+    with open(filename + '.journal', 'a', encoding='utf-8') as f:
+        f.write('{"seq":5,"pa":{"memor')
+    reopened = SaveJournal(filename, codec, compact_every=100)
+    assert reopened.load() == states[-1]
+    assert reopened.seq == 3
+
+
+def test_journal_without_changes_writes_nothing(journal_path, sample_state):
+    filename, codec = journal_path
+    journal = SaveJournal(filename, codec)
+    state = _states(sample_state, 1)[0]
+    journal.save(state)
+    journal.save(json.loads(json.dumps(state)))
+    journal.close()
+    assert journal.seq == 0
+    with open(filename + '.journal', encoding='utf-8') as f:
+        assert f.read() == ""
+
+
+def test_journal_delete(journal_path, sample_state):
+    filename, codec = journal_path
+    journal = SaveJournal(filename, codec)
+    for state in _states(sample_state, 3):
+        journal.save(state)
+    assert journal.exists()
+    journal.delete()
+    assert not journal.exists()
+    assert SaveJournal(filename, codec).load() is None
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""Grabación de sesiones (semilla y respuestas) y repetición sin pantalla."""
+
+import random
+
+import pytest
+
+import aventura2
+from aventura2 import Game, MemorySave, NullIO, Recording, RecordingIO, ScriptedIO, random_policy, replay
+from conftest import limited_policy, play
+
+
+def _record(seed=21, answers=300):
+    recording = Recording(seed, {'rebobinar': 20, 'autoguardado': 10})
+    g = Game(io=RecordingIO(ScriptedIO(limited_policy(seed, answers), capture=False), recording),
+             seed=seed)
+    g.save_backend = MemorySave()
+    g.rewind_turns, g.autosave_every = 20, 10
+    try:
+        g.start()
+    except EOFError:
+        pass
+    finally:
+        if g.autosaver is not None:
+            g.autosaver.close()
+    recording.finish(g)
+    return recording, g
+
+
+def test_replay_reaches_the_recorded_state():
+    recording, played = _record()
+    assert played.turn > 10
+    again = replay(Recording.from_dict(recording.to_dict()))
+    assert again.turn == recording.turns
+    assert again.state_hash() == recording.state_hash == played.state_hash()
+
+
+def test_recording_file_round_trip(tmp_path):
+    recording, _ = _record(answers=60)
+    filename = str(tmp_path / 'sesion.rec')
+    recording.dump(filename)
+    loaded = Recording.load(filename)
+    assert loaded.to_dict() == recording.to_dict()
+
+
+def test_replay_detects_a_changed_choice():
+    recording, _ = _record()
+    data = recording.to_dict()
+    # la primera respuesta de menú es "1) Empezar partida nueva"; con un
+    # índice fuera de las dos opciones la repetición tiene que quejarse
+    assert data['choices'][0] == '0'
+    data['choices'] = 'z' + data['choices'][1:]
+    with pytest.raises(ValueError, match="no coincide"):
+        replay(Recording.from_dict(data))
+
+
+def test_replay_detects_a_free_answer_where_a_choice_was_recorded():
+    recording, _ = _record()
+    data = recording.to_dict()
+    # el nombre del jugador es una respuesta libre: cambiarla por una opción falla
+    free = data['choices'].index(Recording.FREE)
+    data['choices'] = data['choices'][:free] + '0' + data['choices'][free + 1:]
+    with pytest.raises(ValueError, match="no coincide"):
+        replay(Recording.from_dict(data))
+
+
+def test_replay_with_a_different_seed_diverges():
+    recording, _ = _record()
+    data = recording.to_dict()
+    data['seed'] += 1
+    try:
+        other = replay(Recording.from_dict(data))
+    except ValueError:
+        return  # también vale: la partida pidió otra cosa que la grabada
+    assert (other.turn, other.state_hash()) != (recording.turns, recording.state_hash)
+
+
+def test_recording_rejects_other_versions():
+    recording, _ = _record(answers=10)
+    data = recording.to_dict()
+    data['version'] = Recording.VERSION + 1
+    with pytest.raises(ValueError):
+        Recording.from_dict(data)
+
+
+def test_scripted_policy_game_is_repeatable():
+    def run():
+        g = Game(io=NullIO(random_policy(random.Random(3))), seed=3)
+        return play(g, 40).state_hash()
+    assert run() == run()
+    assert aventura2.Game(io=NullIO()).seed != aventura2.Game(io=NullIO()).seed
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+"""Compositor de pantalla: paneles por defecto en una terminal, --clasico sin ellos."""
+
+from aventura2 import ScreenIO
+from conftest import run_main
+
+
+def test_main_uses_panels_on_a_terminal(monkeypatch, tmp_path):
+    g = run_main(monkeypatch, tmp_path)
+    assert isinstance(g.io, ScreenIO)
+    assert g.io.out is None  # main() cierra la pantalla al salir
+
+
+def test_main_without_panels(monkeypatch, tmp_path):
+    assert not isinstance(run_main(monkeypatch, tmp_path, '--clasico').io, ScreenIO)
+    assert not isinstance(run_main(monkeypatch, tmp_path, tty=False).io, ScreenIO)
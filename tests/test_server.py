@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""Sesiones del servidor: escenas suspendidas en el bucle, disco en el ejecutor y cierre al desconectar."""
+
+import asyncio
+import random
+
+from aventura2 import Choice
+from save_store import SaveSlot, SaveStore
+from server import Session
+
+
+class _Backend:
+    """Guardado de prueba: sólo apunta si se cerró."""
+    def __init__(self):
+        self.closed = False
+
+    def exists(self):
+        return False
+
+    def close(self):
+        self.closed = True
+
+
+def _text(session):
+    return "".join(text for text, _ in session.io.take_output())
+
+
+def test_session_logs_in_and_plays_on_the_loop(tmp_path):
+    store = SaveStore(str(tmp_path / "partidas.db"))
+    session = Session(1, str(tmp_path), store)
+    rng = random.Random(3)
+
+    async def run():
+        await session.advance()
+        assert "Identificador de jugador" in _text(session)
+        await session.advance("ana")
+        assert "Ranura nueva" in _text(session)
+        await session.advance("x")
+        assert "Opción no reconocida" in _text(session)
+        assert isinstance(session.question, Choice)
+        await session.advance("1")
+        assert isinstance(session.game.save_backend, SaveSlot)
+        await session.advance("2")  # partida nueva
+        await session.advance("Ana")
+        for _ in range(300):
+            if session.finished:
+                break
+            question = session.question
+            await session.advance(rng.choice(question.choices) if isinstance(question, Choice) else "")
+        await session.close()
+
+    asyncio.run(run())
+    assert session.game.turn > 0
+    store.close()
+
+
+def test_disconnect_closes_scene_and_saves(tmp_path):
+    session = Session(2, str(tmp_path))
+    backend = session.game.save_backend = _Backend()
+
+    async def run():
+        await session.advance()
+        await session.advance("2")
+        await session.close()
+
+    asyncio.run(run())
+    assert session.finished
+    assert session.scene.gi_frame is None
+    assert backend.closed
+
+
+def test_sessions_get_random_seeds(tmp_path):
+    seeds = {Session(1, str(tmp_path)).game.seed for _ in range(8)}
+    assert len(seeds) == 8 and 1 not in seeds
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""Instantáneas con estructura compartida: restaurar, rebobinar y ramificar."""
+
+import pytest
+
+from aventura2 import Game, MemorySave, NullIO
+from conftest import limited_policy, play, run_main
+
+
+def test_snapshot_is_not_affected_by_later_changes(game):
+    play(game, 5)
+    snap = game.snapshot()
+    state, digest = game.save_state(), game.state_hash()
+    game.player.inventory.append('prueba_extra_a')
+    game.player.memories.append('memoria_nueva')
+    game.player.hp -= 1
+    game.flags['ending'] = 'paz'
+    game.visited.add('nucleo')
+    game.turn += 3
+    game.restore(snap)
+    assert game.save_state() == state
+    assert game.state_hash() == digest
+    # la instantánea se puede volver a usar
+    game.player.hp = 1
+    game.restore(snap)
+    assert game.state_hash() == digest
+
+
+def test_restored_turn_repeats_the_same_rolls(game):
+    play(game, 3)
+    snap = game.snapshot()
+    game.restore(snap)
+    first = [game.rng.random() for _ in range(5)]
+    game.restore(snap)
+    assert [game.rng.random() for _ in range(5)] == first
+
+
+def test_rewind_goes_back_n_turns(game):
+    play(game, 2)
+    game.rewind_turns = 20
+    hashes = []
+    for _ in range(6):
+        game.history.append(game.snapshot())
+        hashes.append(game.state_hash())
+        game.play(game.step())
+    assert game.rewind(3)
+    assert game.state_hash() == hashes[-3]
+    assert len(game.history) == 3
+    assert game.rewind(1)
+    assert game.state_hash() == hashes[2]
+    assert not game.rewind(5)
+    assert not game.rewind(0)
+
+
+def test_fork_does_not_share_state(game):
+    play(game, 4)
+    other = game.fork()
+    other.player.inventory.append('kit_medico')
+    other.flags['ending'] = 'paz'
+    assert 'ending' not in game.flags
+    assert game.player.inventory.count('kit_medico') != other.player.inventory.count('kit_medico')
+    assert other.save_backend is None and not other.history
+
+
+def test_main_loop_keeps_last_20_turns():
+    g = Game(io=NullIO(limited_policy(11, 400)), seed=11)
+    g.save_backend = MemorySave()
+    g.rewind_turns = 20
+    g.play(g.new_game())
+    with pytest.raises(EOFError):
+        g.main_loop()
+    assert g.turn > 20
+    assert len(g.history) == 20
+    turns = [snap.turn for snap in g.history]
+    assert turns == list(range(g.turn - 20, g.turn))
+
+
+def test_main_keeps_20_turns_to_rewind_by_default(monkeypatch, tmp_path):
+    assert run_main(monkeypatch, tmp_path).rewind_turns == 20
+    assert run_main(monkeypatch, tmp_path, '--rebobinar', '0', tty=False).rewind_turns == 0
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""Inventory, NameSet, Flags y Memories: semántica de lista/conjunto/dict y claves estables."""
+
+import copy
+
+import pytest
+
+from aventura2 import (FLAGS, ITEMS, PLACES, SCENE_INDEX, SCENE_TABLE, Flags, Game, Inventory, Memories,
+                       NameSet, NullIO)
+
+
+# -------------------------
+# Inventory
+# -------------------------
+def test_inventory_behaves_like_a_list_grouped_by_id():
+    inv = Inventory(['kit_medico', 'multiherramienta', 'kit_medico'])
+    assert len(inv) == 3
+    assert inv.count('kit_medico') == 2
+    assert 'multiherramienta' in inv and 'mapa' not in inv
+    assert list(inv) == ['multiherramienta', 'kit_medico', 'kit_medico']
+    assert inv == ['multiherramienta', 'kit_medico', 'kit_medico']
+    inv.remove('kit_medico')
+    assert inv.count('kit_medico') == 1
+    assert inv.pop(0) == 'multiherramienta'
+    assert inv.pop() == 'kit_medico'
+    assert not inv and len(inv) == 0
+
+
+def test_inventory_remove_missing_item_raises():
+    inv = Inventory(['mapa'])
+    with pytest.raises(ValueError):
+        inv.remove('kit_medico')
+    with pytest.raises(ValueError):
+        inv.remove('objeto_que_nunca_existio')
+
+
+def test_inventory_copy_is_independent():
+    inv = Inventory(['municion'])
+    other = copy.deepcopy(inv)
+    other.append('municion')
+    assert inv.count('municion') == 1 and other.count('municion') == 2
+    assert inv != other
+
+
+def test_inventory_key_tells_apart_different_extra_items():
+    # regresión: la cola de objetos no fijos se tomaba por posición entre los
+    # presentes, así que dos inventarios distintos daban la misma clave
+    a = Inventory(['kit_medico', 'prueba_extra_a'])
+    b = Inventory(['kit_medico', 'prueba_extra_b'])
+    assert ITEMS.ids['prueba_extra_a'] >= ITEMS.fixed
+    assert a != b
+    assert a.key() != b.key()
+    assert a.key() == Inventory(['prueba_extra_a', 'kit_medico']).key()
+
+
+def test_inventory_key_counts_extra_items():
+    one = Inventory(['prueba_extra_a'])
+    two = Inventory(['prueba_extra_a', 'prueba_extra_a'])
+    assert one.key() != two.key()
+    assert one.key() != Inventory().key()
+
+
+# -------------------------
+# NameSet
+# -------------------------
+def test_nameset_set_semantics():
+    s = NameSet(PLACES, ['lab', 'entrada'])
+    s.add('lab')
+    assert len(s) == 2 and 'lab' in s and 'nucleo' not in s
+    assert sorted(s) == ['entrada', 'lab']
+    s.discard('lab')
+    s.discard('sala_inexistente')
+    assert set(s) == {'entrada'}
+    assert s == {'entrada'}
+
+
+def test_nameset_key_is_stable_for_extra_names():
+    a = NameSet(PLACES, ['entrada', 'S_prueba_1', 'S_prueba_2'])
+    b = NameSet(PLACES, ['S_prueba_2', 'entrada', 'S_prueba_1'])
+    c = NameSet(PLACES, ['entrada', 'S_prueba_1'])
+    assert a.key() == b.key()
+    assert a.key() != c.key()
+    copied = a.copy()
+    copied.add('lab')
+    assert 'lab' not in a
+
+
+# -------------------------
+# Flags
+# -------------------------
+def test_flags_behave_like_a_dict():
+    f = Flags({'prologo_done': True, 'core_locked': False, 'ending': 'paz', 'contador': 0})
+    assert f['prologo_done'] is True and f['core_locked'] is False
+    assert f['ending'] == 'paz' and f['contador'] == 0
+    assert f.get('no_existe') is None and 'no_existe' not in f
+    with pytest.raises(KeyError):
+        f['no_existe']
+    assert f.to_dict() == {'prologo_done': True, 'core_locked': False, 'ending': 'paz', 'contador': 0}
+    assert f == {'prologo_done': True, 'core_locked': False, 'ending': 'paz', 'contador': 0}
+    del f['ending']
+    assert 'ending' not in f and len(f) == 3
+    with pytest.raises(KeyError):
+        del f['ending']
+
+
+def test_flags_keep_ints_apart_from_bools():
+    f = Flags({'uno': 1, 'cero': 0, 'si': True, 'no': False})
+    assert f['uno'] == 1 and f['uno'] is not True
+    assert f['cero'] == 0 and f['cero'] is not False
+    assert f['si'] is True and f['no'] is False
+    assert f.is_set(FLAGS.ids['uno']) and not f.is_set(FLAGS.ids['cero'])
+
+
+def test_flags_equal_after_last_value_is_overwritten():
+    # regresión: values quedaba como {} y copy() ponía None, así que f != f.copy()
+    f = Flags({'ending': 'paz'})
+    f['ending'] = True
+    assert f.values is None
+    assert f == f.copy()
+    assert f == Flags({'ending': True})
+    assert f.key() == Flags({'ending': True}).key()
+
+
+def test_flags_equal_after_last_value_is_deleted():
+    f = Flags({'prologo_done': True, 'alarmas': 3})
+    del f['alarmas']
+    assert f == f.copy() == Flags({'prologo_done': True})
+
+
+def test_flags_equal_with_empty_values_dict():
+    a = Flags({'prologo_done': True})
+    b = Flags({'prologo_done': True})
+    b.values = {}
+    assert a == b and b == a
+
+
+def test_flags_copy_is_independent():
+    f = Flags({'ending': ['lista', 1]})
+    deep = copy.deepcopy(f)
+    deep['ending'].append(2)
+    shallow = f.copy()
+    shallow['ending'] = 'otro'
+    assert f['ending'] == ['lista', 1]
+
+
+def test_flags_key_depends_on_values():
+    assert Flags({'ending': 'paz'}).key() != Flags({'ending': 'destruccion'}).key()
+    assert Flags({'prologo_done': True}).key() != Flags({'prologo_done': False}).key()
+    assert Flags({'flag_prueba_x': True}).key() != Flags({'flag_prueba_x': False}).key()
+
+
+# -------------------------
+# Memories
+# -------------------------
+def test_memories_share_their_tuple_between_copies():
+    m = Memories(['a'])
+    c = m.copy()
+    m.append('b')
+    assert list(c) == ['a'] and list(m) == ['a', 'b']
+    assert m == ['a', 'b'] and 'b' in m and len(m) == 2
+
+
+# -------------------------
+# Estado de la partida completo
+# -------------------------
+def test_save_state_round_trip(sample_state):
+    g = Game(io=NullIO())
+    g.apply_state(sample_state)
+    state = g.save_state()
+    expected = dict(sample_state)
+    del expected['seq']
+    assert state == expected
+    again = Game(io=NullIO())
+    again.apply_state(state)
+    assert again.save_state() == state
+    assert again.state_hash() == g.state_hash()
+
+
+def test_state_hash_changes_with_extra_items(sample_state):
+    g = Game(io=NullIO())
+    g.apply_state(sample_state)
+    h = g.state_hash()
+    g.player.inventory.append('prueba_extra_a')
+    ha = g.state_hash()
+    g.player.inventory.remove('prueba_extra_a')
+    assert g.state_hash() == h
+    g.player.inventory.append('prueba_extra_b')
+    assert g.state_hash() not in (h, ha)
+
+
+def test_only_scenes_with_a_first_visit_mark_visited(sample_state):
+    game = Game(io=NullIO(lambda prompt, choices: choices[0] if choices else ""), seed=1)
+    game.apply_state(dict(sample_state, visited=[]))
+    for name in ('entrada', 'sala_com'):
+        game.player.location = name
+        game.play(SCENE_TABLE[SCENE_INDEX[name]].run(game))
+    assert 'entrada' in game.visited
+    assert 'sala_com' not in game.visited